@@ -3,10 +3,15 @@ import streamlit as st
 from PIL import Image
 import numpy as np
 import time
+from concurrent.futures import CancelledError
 from models.image_generator import ImageGenerator
 from models.image_filter import ImageFilter
 from models.image_editor import ImageEditor
+from models.image_pipeline import ImagePipeline
+from models.edit_document import EditDocument
+from models.edit_executor import get_edit_executor, QueueFull
 from utils.file_handler import FileHandler
+from utils.config import PREVIEW_MAX_SIZE
 
 # Set page configuration
 st.set_page_config(
@@ -190,15 +195,51 @@ if 'current_image' not in st.session_state:
     st.session_state.current_image = None
 if 'filter_applied' not in st.session_state:
     st.session_state.filter_applied = None
-if 'edited_image' not in st.session_state:
-    st.session_state.edited_image = None
+if 'edit_document' not in st.session_state:
+    st.session_state.edit_document = None
 
 # Initialize components
 image_generator = ImageGenerator()
 image_filter = ImageFilter()
 image_editor = ImageEditor()
+image_pipeline = ImagePipeline(image_filter, image_editor)
+edit_executor = get_edit_executor()
 file_handler = FileHandler()
 
+def report_edit_error(error):
+    """
+    Show why a full-resolution filter or edit run by the edit executor did not finish.
+
+    Args:
+        error (Exception): Error raised by the executor
+    """
+    if isinstance(error, CancelledError):
+        # The executor is shutting down with the app
+        st.stop()
+    elif isinstance(error, QueueFull):
+        st.warning("⏳ The editor is busy. Please try again in a moment.")
+    elif isinstance(error, TimeoutError):
+        st.error("⌛ The edit took too long and was stopped.")
+    else:
+        st.error(f"❌ The edit failed: {error}")
+
+def render_edits(edit_document):
+    """
+    Render an edit document at full resolution, reporting failures.
+
+    Args:
+        edit_document (EditDocument): Document to render
+
+    Returns:
+        PIL.Image: Edited image, or None if the render did not finish
+    """
+    with st.spinner("Rendering edits at full resolution..."):
+        try:
+            return edit_document.render()
+        except Exception as e:
+            report_edit_error(e)
+            return None
+
 # App title with modern styling
 st.markdown("<h1 style='text-align: center; margin-bottom: 1.5rem;'>Leonardo AI Clone</h1>", unsafe_allow_html=True)
 
@@ -239,6 +280,8 @@ with st.sidebar:
         st.markdown("<p style='margin-bottom: 0.5rem; margin-top: 1rem; font-weight: 600;'>Seed</p>", unsafe_allow_html=True)
         seed = st.number_input("", value=-1, label_visibility="collapsed", help="Set to -1 for random seed")
 
+        use_cache = st.checkbox("Reuse cached results", value=True, help="Serve identical requests from the generation cache")
+
     # Upgrade banner
     st.markdown("""
     <div class="upgrade-banner">
@@ -294,14 +337,15 @@ with main_cols[0]:
                     height=height,
                     steps=steps,
                     guidance_scale=guidance_scale,
-                    seed=seed if seed != -1 else None
+                    seed=seed if seed != -1 else None,
+                    use_cache=use_cache
                 )
 
                 st.session_state.generated_images = images
                 if images:
                     st.session_state.current_image = images[0]
                     st.session_state.filter_applied = None
-                    st.session_state.edited_image = None
+                    st.session_state.edit_document = None
         else:
             st.error("Please enter a prompt first.")
 
@@ -330,7 +374,7 @@ with main_cols[1]:
                 if st.button(f"✅ Select", key=f"select_{i}", use_container_width=True):
                     st.session_state.current_image = img
                     st.session_state.filter_applied = None
-                    st.session_state.edited_image = None
+                    st.session_state.edit_document = None
     else:
         # Empty state with better styling
         st.markdown("""
@@ -363,20 +407,36 @@ if st.session_state.current_image is not None:
             if st.button("✨ Apply Filter", use_container_width=True):
                 with st.spinner("Applying artistic touch..."):
                     if filter_type != "None":
-                        filtered_image = image_filter.apply_filter(
-                            st.session_state.current_image,
-                            filter_type,
-                            intensity
-                        )
-                        st.session_state.filter_applied = filtered_image
+                        try:
+                            # Runs in a worker process, which is stopped if it passes the timeout.
+                            # Streamlit only acts on a newer Apply once this call returns, so
+                            # there is nothing for it to supersede.
+                            filtered_image = edit_executor.run(
+                                st.session_state.current_image,
+                                [{'type': 'filter', 'filter_type': filter_type, 'intensity': intensity}]
+                            )
+                            st.session_state.filter_applied = filtered_image
+                            st.session_state.filter_settings = (filter_type, intensity)
+                        except Exception as e:
+                            report_edit_error(e)
                     else:
                         st.session_state.filter_applied = None
+                        st.session_state.filter_settings = (filter_type, intensity)
 
         with filter_cols[1]:
             # Image display with better styling
             st.markdown("<div style='background-color: var(--card-bg); padding: 1rem; border-radius: 10px; border: 1px solid var(--border-color);'>", unsafe_allow_html=True)
 
-            if st.session_state.filter_applied is not None:
+            if filter_type != "None" and st.session_state.get('filter_settings') != (filter_type, intensity):
+                # Live preview on a cached low-resolution proxy; Apply renders at full resolution
+                st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Preview</p>", unsafe_allow_html=True)
+                st.image(image_filter.apply_filter(
+                    st.session_state.current_image,
+                    filter_type,
+                    intensity,
+                    preview_size=PREVIEW_MAX_SIZE
+                ), use_column_width=True)
+            elif st.session_state.filter_applied is not None:
                 st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Filtered Image</p>", unsafe_allow_html=True)
                 st.image(st.session_state.filter_applied, use_column_width=True)
             else:
@@ -389,6 +449,20 @@ if st.session_state.current_image is not None:
     with tabs[1]:
         edit_cols = st.columns([1, 2])
 
+        # Edits are recorded on a non-destructive document over the (filtered) image and
+        # rendered only when needed; geometric edits then share a single resample
+        edit_source = st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied
+        if st.session_state.edit_document is None:
+            st.session_state.edit_document = EditDocument(edit_source, pipeline=image_pipeline, executor=edit_executor)
+        else:
+            st.session_state.edit_document.set_source(edit_source)
+        edit_document = st.session_state.edit_document
+
+        # Current settings as an operation, shown on a live proxy preview until applied
+        edit_settings = None
+        edit_operation = None
+        edit_preview = False
+
         with edit_cols[0]:
             st.markdown("<p style='font-weight: 600; margin-bottom: 0.5rem;'>Edit Operation</p>", unsafe_allow_html=True)
             edit_options = ["Crop", "Rotate", "Resize", "Color Correction", "Background Removal"]
@@ -417,13 +491,13 @@ if st.session_state.current_image is not None:
 
                 st.markdown("</div>", unsafe_allow_html=True)
 
+                edit_settings = (edit_type, crop_left, crop_top, crop_right, crop_bottom)
+                edit_operation = {'type': 'crop', 'left': crop_left, 'top': crop_top, 'right': crop_right, 'bottom': crop_bottom}
+                edit_preview = True
+
                 if st.button("✂️ Apply Crop", use_container_width=True):
-                    with st.spinner("Cropping image..."):
-                        edited_image = image_editor.crop(
-                            st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied,
-                            crop_left, crop_top, crop_right, crop_bottom
-                        )
-                        st.session_state.edited_image = edited_image
+                    edit_document.add(edit_operation)
+                    st.session_state.edit_settings = edit_settings
 
             elif edit_type == "Rotate":
                 st.markdown("<p style='font-weight: 600; margin-top: 1rem; margin-bottom: 0.5rem;'>Rotation Angle</p>", unsafe_allow_html=True)
@@ -433,13 +507,13 @@ if st.session_state.current_image is not None:
 
                 st.markdown("<p style='text-align: center; font-size: 0.9rem; margin-top: 0.5rem;'>{}°</p>".format(angle), unsafe_allow_html=True)
 
+                edit_settings = (edit_type, angle)
+                edit_operation = {'type': 'rotate', 'angle': angle}
+                edit_preview = True
+
                 if st.button("🔄 Apply Rotation", use_container_width=True):
-                    with st.spinner("Rotating image..."):
-                        edited_image = image_editor.rotate(
-                            st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied,
-                            angle
-                        )
-                        st.session_state.edited_image = edited_image
+                    edit_document.add(edit_operation)
+                    st.session_state.edit_settings = edit_settings
 
             elif edit_type == "Resize":
                 st.markdown("<div style='background-color: var(--input-bg); padding: 0.8rem; border-radius: 8px; margin-top: 1rem;'>", unsafe_allow_html=True)
@@ -454,13 +528,13 @@ if st.session_state.current_image is not None:
 
                 st.markdown("</div>", unsafe_allow_html=True)
 
+                edit_settings = (edit_type, resize_width, resize_height)
+                edit_operation = {'type': 'resize', 'width': resize_width, 'height': resize_height}
+                edit_preview = True
+
                 if st.button("📐 Apply Resize", use_container_width=True):
-                    with st.spinner("Resizing image..."):
-                        edited_image = image_editor.resize(
-                            st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied,
-                            resize_width, resize_height
-                        )
-                        st.session_state.edited_image = edited_image
+                    edit_document.add(edit_operation)
+                    st.session_state.edit_settings = edit_settings
 
             elif edit_type == "Color Correction":
                 st.markdown("<div style='background-color: var(--input-bg); padding: 0.8rem; border-radius: 8px; margin-top: 1rem;'>", unsafe_allow_html=True)
@@ -478,31 +552,58 @@ if st.session_state.current_image is not None:
 
                 st.markdown("</div>", unsafe_allow_html=True)
 
+                edit_settings = (edit_type, brightness, contrast, saturation)
+                edit_operation = {'type': 'adjust_colors', 'brightness': brightness, 'contrast': contrast, 'saturation': saturation}
+                edit_preview = True
+
                 if st.button("🎨 Apply Color Correction", use_container_width=True):
-                    with st.spinner("Adjusting colors..."):
-                        edited_image = image_editor.adjust_colors(
-                            st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied,
-                            brightness, contrast, saturation
-                        )
-                        st.session_state.edited_image = edited_image
+                    edit_document.add(edit_operation)
+                    st.session_state.edit_settings = edit_settings
 
             elif edit_type == "Background Removal":
                 st.markdown("<p style='margin-top: 1rem; margin-bottom: 1rem; font-size: 0.9rem; color: var(--secondary-text);'>Remove the background from your image with AI.</p>", unsafe_allow_html=True)
 
+                feather = st.slider("Edge Softness", 0, 10, 0, 1, label_visibility="collapsed")
+                st.markdown("<p style='font-size: 0.8rem; color: var(--secondary-text); margin: -0.5rem 0 0.5rem 0;'>Edge Softness: {}px</p>".format(feather), unsafe_allow_html=True)
+
+                edit_settings = (edit_type, feather)
+                edit_operation = {'type': 'remove_background', 'feather': feather}
+
                 if st.button("✂️ Remove Background", use_container_width=True):
                     with st.spinner("AI is working its magic..."):
-                        edited_image = image_editor.remove_background(
-                            st.session_state.current_image if st.session_state.filter_applied is None else st.session_state.filter_applied
-                        )
-                        st.session_state.edited_image = edited_image
+                        edit_document.add(edit_operation)
+                        edit_document.preview()
+                        st.session_state.edit_settings = edit_settings
+
+            # Undo and redo only move through the recorded edits; renders come from the
+            # nearest kept checkpoint
+            history_cols = st.columns(3)
+            with history_cols[0]:
+                if st.button("↩️ Undo", use_container_width=True, disabled=not edit_document.can_undo):
+                    edit_document.undo()
+                    st.session_state.edit_settings = edit_settings
+            with history_cols[1]:
+                if st.button("↪️ Redo", use_container_width=True, disabled=not edit_document.can_redo):
+                    edit_document.redo()
+                    st.session_state.edit_settings = edit_settings
+            with history_cols[2]:
+                if st.button("🗑️ Reset", use_container_width=True, disabled=not edit_document.operations):
+                    edit_document.clear()
+                    st.session_state.edit_settings = None
 
         with edit_cols[1]:
             # Image display with better styling
             st.markdown("<div style='background-color: var(--card-bg); padding: 1rem; border-radius: 10px; border: 1px solid var(--border-color);'>", unsafe_allow_html=True)
 
-            if st.session_state.edited_image is not None:
+            if edit_preview and st.session_state.get('edit_settings') != edit_settings:
+                # Live preview of the applied edits plus the current settings on a cached
+                # low-resolution proxy
+                st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Preview</p>", unsafe_allow_html=True)
+                st.image(edit_document.preview(edit_operation), use_column_width=True)
+            elif len(edit_document) > 0:
+                # The full-resolution render waits for export
                 st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Edited Image</p>", unsafe_allow_html=True)
-                st.image(st.session_state.edited_image, use_column_width=True)
+                st.image(edit_document.preview(), use_column_width=True)
             elif st.session_state.filter_applied is not None:
                 st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Filtered Image</p>", unsafe_allow_html=True)
                 st.image(st.session_state.filter_applied, use_column_width=True)
@@ -516,6 +617,16 @@ if st.session_state.current_image is not None:
     with tabs[2]:
         export_cols = st.columns([1, 2])
 
+        # Streamlit runs every tab on every rerun, so the full-resolution render of the
+        # edits only happens on an explicit Export or Render click; until then the
+        # tab shows the preview. A finished render is kept until the edits change.
+        edit_document = st.session_state.edit_document
+        if edit_document is not None:
+            final_image = edit_document.rendered()
+        else:
+            final_image = (st.session_state.filter_applied if st.session_state.filter_applied is not None
+                           else st.session_state.current_image)
+
         with export_cols[0]:
             st.markdown("<div style='background-color: var(--input-bg); padding: 1rem; border-radius: 8px; margin-bottom: 1rem;'>", unsafe_allow_html=True)
 
@@ -533,21 +644,21 @@ if st.session_state.current_image is not None:
 
             # Export button with modern styling
             if st.button("💾 Export Image", use_container_width=True, type="primary"):
-                image_to_export = (st.session_state.edited_image if st.session_state.edited_image is not None
-                                  else st.session_state.filter_applied if st.session_state.filter_applied is not None
-                                  else st.session_state.current_image)
-
-                export_path = file_handler.save_image(
-                    image_to_export,
-                    export_filename,
-                    export_format.lower(),
-                    export_quality
-                )
-
-                if export_path:
-                    st.success(f"✅ Image exported successfully to {export_path}")
-                else:
-                    st.error("❌ Failed to export image")
+                if final_image is None:
+                    final_image = render_edits(edit_document)
+
+                if final_image is not None:
+                    export_path = file_handler.save_image(
+                        final_image,
+                        export_filename,
+                        export_format.lower(),
+                        export_quality
+                    )
+
+                    if export_path:
+                        st.success(f"✅ Image exported successfully to {export_path}")
+                    else:
+                        st.error("❌ Failed to export image")
 
             # Add format info
             st.markdown("""
@@ -565,20 +676,22 @@ if st.session_state.current_image is not None:
             # Image display with better styling
             st.markdown("<div style='background-color: var(--card-bg); padding: 1rem; border-radius: 10px; border: 1px solid var(--border-color);'>", unsafe_allow_html=True)
 
-            image_to_display = (st.session_state.edited_image if st.session_state.edited_image is not None
-                              else st.session_state.filter_applied if st.session_state.filter_applied is not None
-                              else st.session_state.current_image)
+            image_to_display = final_image if final_image is not None else edit_document.preview()
 
             st.markdown("<p style='text-align: center; font-size: 0.9rem; color: var(--secondary-text); margin-bottom: 0.5rem;'>Image Preview</p>", unsafe_allow_html=True)
             st.image(image_to_display, use_column_width=True)
 
             st.markdown("</div>", unsafe_allow_html=True)
 
+            # The download needs the full-resolution image up front
+            if final_image is None and st.button("🎬 Render for Download", use_container_width=True):
+                final_image = render_edits(edit_document)
+
             # Download button with modern styling
-            if image_to_display is not None:
+            if final_image is not None:
                 # Convert image to bytes for download
                 img_bytes = file_handler.image_to_bytes(
-                    image_to_display,
+                    final_image,
                     format=export_format.lower(),
                     quality=export_quality
                 )
@@ -0,0 +1,181 @@
+"""
+Micro-benchmark of the PIL, OpenCV and NumPy filter/edit backends.
+
+Times every backend of every operation on a synthetic image of each size
+class, skips backends whose output differs visibly from PIL's, and writes the
+fastest backend per operation and size class to a JSON config that the app
+loads at startup (COMPUTE_BACKENDS_FILE). The file also records the timings
+and the machine they were measured on, so a choice can be reproduced or
+re-checked later.
+
+Usage:
+    python benchmark_backends.py --output compute_backends.json --repeats 5
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime, timezone
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+from models.compute_backends import BACKENDS, DEFAULT_BACKEND, ComputeBackends
+from utils.config import COMPUTE_BACKENDS_FILE
+
+# Representative image size per size class
+SIZES = {"small": (640, 480), "medium": (1600, 1200), "large": (3200, 2400)}
+
+# Representative blur radius per radius class
+RADII = {"r2": 2, "r8": 6, "r32": 16}
+
+# Largest mean absolute difference from the PIL result that still counts as the same output
+MAX_MEAN_DIFF = 1.0
+
+def make_test_image(size, seed=0):
+    """
+    Build a photo-like test image: smooth gradients, edges and some noise.
+
+    Args:
+        size (tuple): Image size (width, height)
+        seed (int): Random seed
+
+    Returns:
+        PIL.Image: RGB image
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    r = 128 + 100 * np.sin(x / width * 6.0) * np.cos(y / height * 4.0)
+    g = 255 * x / width
+    b = np.where((x // 64 + y // 64) % 2 == 0, 200, 60)
+
+    pixels = np.stack([r, g, b], axis=-1) + rng.normal(0, 12, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+def benchmark_cases():
+    """
+    List the operation variants to time.
+
+    Yields:
+        tuple: (operation, variant or None, argument)
+    """
+    for variant, radius in RADII.items():
+        yield 'blur', variant, radius
+
+    yield 'sharpen', None, 2.0
+
+    # The vintage filter's color chain, already resolved (contrast carries its mean level)
+    yield 'color', None, (('sepia', 0.5), ('contrast', 0.8, 118.0), ('brightness', 0.9))
+
+    yield 'resize', None, 0.5
+    yield 'rotate', None, 30
+
+def time_backend(func, image, argument, repeats):
+    """
+    Time one backend on one image.
+
+    Args:
+        func (callable): Backend implementation
+        image (PIL.Image): Input image
+        argument: Operation argument
+        repeats (int): Number of timed runs
+
+    Returns:
+        tuple: (best time in milliseconds, result image)
+    """
+    result = func(image, argument)
+    best = float('inf')
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(image, argument)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000, result
+
+def run_benchmark(repeats=5, sizes=SIZES):
+    """
+    Time every backend and pick the fastest accurate one per operation and size class.
+
+    Args:
+        repeats (int): Number of timed runs per backend (the best one counts)
+        sizes (dict): Image size per size class
+
+    Returns:
+        dict: Config with 'choices', 'timings_ms', 'rejected' and 'machine' entries
+    """
+    choices, timings, rejected = {}, {}, {}
+
+    for size_name, size in sizes.items():
+        image = make_test_image(size)
+        pixels = size[0] * size[1]
+
+        for op, variant, argument in benchmark_cases():
+            if op == 'resize':
+                argument = (int(size[0] * argument), int(size[1] * argument))
+
+            key = ComputeBackends.selection_key(op, pixels, variant)
+            timings[key] = {}
+            reference = None
+
+            # PIL first: it is both the default and the accuracy reference
+            for backend in sorted(BACKENDS[op], key=lambda name: name != DEFAULT_BACKEND):
+                func = BACKENDS[op][backend][0]
+                try:
+                    elapsed, result = time_backend(func, image, argument, repeats)
+                except Exception as e:
+                    print(f"Error benchmarking {backend} for {key}: {e}")
+                    continue
+
+                if reference is None:
+                    reference = np.asarray(result, dtype=np.int16)
+                else:
+                    diff = float(np.abs(np.asarray(result, dtype=np.int16) - reference).mean())
+                    if diff > MAX_MEAN_DIFF:
+                        rejected.setdefault(key, {})[backend] = round(diff, 3)
+                        continue
+
+                timings[key][backend] = round(elapsed, 2)
+
+            choices[key] = min(timings[key], key=timings[key].get) if timings[key] else DEFAULT_BACKEND
+            print(f"{key:24} {choices[key]:8} " + "  ".join(f"{name}={ms:.1f}ms" for name, ms in timings[key].items()))
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'opencv_threads': cv2.getNumThreads()
+        },
+        'repeats': repeats,
+        'max_mean_diff': MAX_MEAN_DIFF,
+        'sizes': {name: list(size) for name, size in sizes.items()},
+        'choices': choices,
+        'timings_ms': timings,
+        'rejected': rejected
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PIL, OpenCV and NumPy filter backends")
+    parser.add_argument("--output", default=COMPUTE_BACKENDS_FILE, help="Config file to write the chosen backends to")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per backend (the best one counts)")
+    parser.add_argument("--sizes", nargs="*", choices=sorted(SIZES), default=sorted(SIZES), help="Size classes to benchmark")
+    options = parser.parse_args()
+
+    config = run_benchmark(max(1, options.repeats), {name: SIZES[name] for name in options.sizes})
+
+    try:
+        with open(options.output, 'w') as f:
+            json.dump(config, f, indent=2)
+    except OSError as e:
+        print(f"Error writing {options.output}: {e}")
+        sys.exit(1)
+
+    print(f"Wrote backend choices to {options.output}")
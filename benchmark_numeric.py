@@ -0,0 +1,191 @@
+"""
+Time and peak-memory benchmark of the NumPy image operations.
+
+Covers the NumPy compute backends (color chain, blur, sharpen), the vignette
+mask and the color LUT helpers. Peak memory is measured with tracemalloc,
+which sees NumPy buffers but not PIL's own allocations, so it is the working
+memory of the NumPy math alone.
+
+Each operation is measured twice: "before" is the float64 implementation
+that allocates a new array per step, kept below as a baseline, and "after"
+is the current float32, in-place one from models/.
+
+Usage:
+    python benchmark_numeric.py --size 3200x2400 --repeats 3
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from PIL import Image
+from models.compute_backends import BACKENDS, SMOOTH_KERNEL
+from models.color_lut import compile_lut, _mean_level, LUMA_WEIGHTS, SEPIA_MATRIX, LUT_SIZE, MEAN_SAMPLE_SIZE
+from models.image_filter import _compute_vignette_mask
+from utils.config import TILE_MEMORY_BUDGET_MB
+from benchmark_backends import make_test_image
+
+# The vintage filter's color chain, already resolved (contrast carries its mean level)
+VINTAGE_OPS = (('sepia', 0.5), ('contrast', 0.8, 118.0), ('brightness', 0.9))
+
+# Baseline: the float64 implementations, each step allocating new arrays
+
+def _baseline_luma(rgb):
+    return np.rint(rgb @ LUMA_WEIGHTS.astype(np.float64))[:, np.newaxis]
+
+BASELINE_POINT_OPS = {
+    'sepia': lambda rgb, t: rgb + (np.trunc(np.clip(rgb @ SEPIA_MATRIX.T.astype(np.float64), 0, 255)) - rgb) * t,
+    'grayscale': lambda rgb, t: rgb + (_baseline_luma(rgb) - rgb) * t,
+    'brightness': lambda rgb, factor: rgb * factor,
+    'contrast': lambda rgb, factor, mean: mean + (rgb - mean) * factor,
+    'saturation': lambda rgb, factor: _baseline_luma(rgb) + (rgb - _baseline_luma(rgb)) * factor
+}
+
+def _baseline_run_ops(rgb, ops):
+    for name, *params in ops:
+        rgb = np.clip(np.rint(BASELINE_POINT_OPS[name](rgb, *params)), 0, 255)
+    return rgb
+
+def _baseline_color(image, ops):
+    array = np.asarray(image)
+    rgb = _baseline_run_ops(array[..., :3].reshape(-1, 3).astype(np.float64), ops)
+
+    result = array.copy()
+    result[..., :3] = rgb.reshape(array.shape[:2] + (3,))
+    return Image.fromarray(result, mode=image.mode)
+
+def _baseline_blur(image, radius):
+    box = max(1, int(round((np.sqrt(4 * radius * radius + 1) - 1) / 2)))
+    array = np.asarray(image, dtype=np.float32)
+
+    for axis in (0, 1):
+        for _ in range(3):
+            pad = [(0, 0)] * array.ndim
+            pad[axis] = (box + 1, box)
+            summed = np.cumsum(np.pad(array, pad, mode='edge'), axis=axis)
+            array = (np.take(summed, range(2 * box + 1, summed.shape[axis]), axis=axis)
+                     - np.take(summed, range(0, summed.shape[axis] - 2 * box - 1), axis=axis)) / (2 * box + 1)
+
+    return Image.fromarray(np.clip(np.rint(array), 0, 255).astype(np.uint8), mode=image.mode)
+
+def _baseline_sharpen(image, factor):
+    array = np.asarray(image, dtype=np.float32)
+
+    smooth = array.copy()
+    inner = np.zeros_like(array[1:-1, 1:-1])
+    for dy in range(3):
+        for dx in range(3):
+            inner += SMOOTH_KERNEL[dy, dx] * array[dy:dy + array.shape[0] - 2, dx:dx + array.shape[1] - 2]
+    smooth[1:-1, 1:-1] = np.rint(inner)
+
+    result = smooth + (array - smooth) * factor
+    return Image.fromarray(np.clip(np.rint(result), 0, 255).astype(np.uint8), mode=image.mode)
+
+def _baseline_vignette_mask(width, height, intensity):
+    center_x, center_y = width // 2, height // 2
+    radius = max(1, min(width, height) // 2)
+
+    dx2 = (np.arange(width, dtype=np.float64) - center_x) ** 2
+    dy2 = (np.arange(height, dtype=np.float64) - center_y) ** 2
+    band = max(1, int(TILE_MEMORY_BUDGET_MB * 1024 * 1024 // (24 * width)))
+
+    mask = np.empty((height, width), dtype=np.uint8)
+    for top in range(0, height, band):
+        distance = np.sqrt(dy2[top:top + band, np.newaxis] + dx2[np.newaxis, :])
+        falloff = 255 * (distance / radius) ** 2 * intensity
+        mask[top:top + band] = np.clip(255 - np.trunc(falloff), 0, 255)
+
+    return Image.fromarray(mask, mode='L')
+
+def _baseline_compile_lut(ops, size=LUT_SIZE):
+    levels = np.linspace(0, 255, size)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+    rgb = np.stack([r, g, b], axis=-1).reshape(-1, 3)
+    return _baseline_run_ops(rgb, ops) / 255.0
+
+def _baseline_mean_level(image, ops):
+    sample = image.convert('RGB').resize(MEAN_SAMPLE_SIZE, Image.BOX)
+    rgb = _baseline_run_ops(np.asarray(sample, dtype=np.float64).reshape(-1, 3), ops)
+    return int(_baseline_luma(rgb).mean() + 0.5)
+
+def benchmark_cases(image):
+    """
+    List the operations to measure.
+
+    Args:
+        image (PIL.Image): Input image
+
+    Returns:
+        list: (name, baseline callable, current callable) tuples
+    """
+    return [
+        ('color (numpy backend)', lambda: _baseline_color(image, VINTAGE_OPS),
+         lambda: BACKENDS['color']['numpy'][0](image, VINTAGE_OPS)),
+        ('blur r6 (numpy backend)', lambda: _baseline_blur(image, 6),
+         lambda: BACKENDS['blur']['numpy'][0](image, 6)),
+        ('sharpen (numpy backend)', lambda: _baseline_sharpen(image, 3.0),
+         lambda: BACKENDS['sharpen']['numpy'][0](image, 3.0)),
+        ('vignette mask', lambda: _baseline_vignette_mask(image.width, image.height, 0.5),
+         lambda: _compute_vignette_mask(image.width, image.height, 0.5)),
+        ('compile LUT', lambda: _baseline_compile_lut(VINTAGE_OPS),
+         lambda: compile_lut.__wrapped__(VINTAGE_OPS)),
+        ('mean level', lambda: _baseline_mean_level(image, VINTAGE_OPS),
+         lambda: _mean_level(image, VINTAGE_OPS))
+    ]
+
+def measure(func, repeats):
+    """
+    Measure the best run time and the peak traced memory of a call.
+
+    Args:
+        func (callable): Operation to measure
+        repeats (int): Number of timed runs
+
+    Returns:
+        tuple: (best time in milliseconds, peak memory in megabytes)
+    """
+    func()
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    # Memory is traced in a separate run; tracing slows allocations down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best * 1000, peak / (1024 * 1024)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time and memory of the NumPy image operations")
+    parser.add_argument("--size", default="3200x2400", help="Test image size, WIDTHxHEIGHT")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per operation (the best one counts)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    options = parser.parse_args()
+
+    width, height = (int(value) for value in options.size.lower().split("x"))
+    image = make_test_image((width, height))
+    megapixels = width * height / 1e6
+
+    results = {}
+    print(f"{'operation':26} {'time before':>12} {'time after':>12} {'peak before':>12} {'peak after':>12} {'after/MP':>10}")
+    for name, baseline, current in benchmark_cases(image):
+        before_time, before_peak = measure(baseline, max(1, options.repeats))
+        after_time, after_peak = measure(current, max(1, options.repeats))
+        results[name] = {
+            'before': {'time_ms': round(before_time, 2), 'peak_mb': round(before_peak, 2)},
+            'after': {'time_ms': round(after_time, 2), 'peak_mb': round(after_peak, 2)}
+        }
+        print(f"{name:26} {before_time:10.1f}ms {after_time:10.1f}ms "
+              f"{before_peak:10.1f}MB {after_peak:10.1f}MB {after_peak / megapixels:8.1f}MB")
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'size': [width, height], 'results': results}, f, indent=2)
@@ -0,0 +1,162 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageSequence
+from utils.config import ANIMATION_WORKERS
+
+# Pixels sampled across all frames to build the shared palette
+PALETTE_SAMPLE_PIXELS = 256 * 1024
+
+# Palette index reserved for transparent pixels
+TRANSPARENT_INDEX = 255
+
+def is_animated(image):
+    """
+    Check whether an image has more than one frame.
+
+    Args:
+        image (PIL.Image): Image to check
+
+    Returns:
+        bool: True for animated GIFs (and other multi-frame images)
+    """
+    return getattr(image, 'is_animated', False) and getattr(image, 'n_frames', 1) > 1
+
+def split_frames(image):
+    """
+    Decode every frame of an animation as a full RGB or RGBA image.
+
+    Args:
+        image (PIL.Image): Animated image
+
+    Returns:
+        tuple: (list of frames, list of durations in milliseconds, info dict with
+            the 'loop' count)
+    """
+    frames, durations = [], []
+    transparent = False
+
+    for frame in ImageSequence.Iterator(image):
+        transparent = transparent or 'transparency' in frame.info or frame.mode in ('RGBA', 'LA', 'PA')
+        frames.append(frame.copy())
+        durations.append(frame.info.get('duration', image.info.get('duration', 100)))
+
+    mode = 'RGBA' if transparent else 'RGB'
+    frames = [frame.convert(mode) for frame in frames]
+
+    return frames, durations, {'loop': image.info.get('loop')}
+
+def build_palette(frames, colors=256):
+    """
+    Quantize one palette for all frames from a sample of each of them.
+
+    A shared palette keeps colors stable from frame to frame and costs a
+    single quantization step instead of one per frame.
+
+    Args:
+        frames (list): Frames as RGB or RGBA images
+        colors (int): Number of palette entries
+
+    Returns:
+        PIL.Image: P-mode image carrying the palette
+    """
+    # Every frame contributes a thumbnail of the same area to one mosaic
+    width, height = frames[0].size
+    scale = min(1.0, (PALETTE_SAMPLE_PIXELS / (len(frames) * width * height)) ** 0.5)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    mosaic = Image.new('RGB', (size[0], size[1] * len(frames)))
+    for i, frame in enumerate(frames):
+        mosaic.paste(frame.convert('RGB').resize(size, Image.BOX), (0, i * size[1]))
+
+    return mosaic.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+
+def apply_palette(frame, palette):
+    """
+    Map a frame onto a shared palette.
+
+    Args:
+        frame (PIL.Image): Frame, with or without an alpha channel
+        palette (PIL.Image): P-mode image carrying the palette
+
+    Returns:
+        PIL.Image: P-mode frame; transparent pixels use TRANSPARENT_INDEX
+    """
+    # No dithering: dither noise differs between frames and makes static areas shimmer
+    indexed = frame.convert('RGB').quantize(palette=palette, dither=Image.Dither.NONE)
+
+    if 'A' in frame.getbands():
+        transparent = frame.getchannel('A').point(lambda alpha: 255 if alpha < 128 else 0)
+        indexed.paste(TRANSPARENT_INDEX, mask=transparent)
+
+    return indexed
+
+def join_frames(frames, durations, info, workers=ANIMATION_WORKERS):
+    """
+    Encode frames as an animated GIF with one shared palette.
+
+    Args:
+        frames (list): Frames, all the same size; alpha channels become GIF transparency
+        durations (list): Display time of each frame in milliseconds
+        info (dict): Animation info from split_frames
+        workers (int): Number of threads mapping frames onto the palette
+
+    Returns:
+        PIL.Image: Animated GIF image, opened from the encoded data
+    """
+    transparent = any('A' in frame.getbands() for frame in frames)
+    palette = build_palette(frames, 255 if transparent else 256)
+
+    indexed = _map(lambda frame: apply_palette(frame, palette), frames, workers)
+
+    options = {'save_all': True, 'append_images': indexed[1:], 'duration': durations}
+    if info.get('loop') is not None:
+        options['loop'] = info['loop']
+    if transparent:
+        # Clear each frame before the next so transparent areas don't show old frames
+        options.update(transparency=TRANSPARENT_INDEX, disposal=2)
+
+    output = io.BytesIO()
+    indexed[0].save(output, format='GIF', **options)
+    output.seek(0)
+
+    return Image.open(output)
+
+def process_frames(image, func, workers=ANIMATION_WORKERS):
+    """
+    Apply an image operation to every frame of an animation in parallel.
+
+    Frames are processed on a thread pool (PIL and NumPy release the GIL
+    while they work), then reassembled with the original frame durations and
+    loop count. Frame sizes may change, but must change the same way for every
+    frame.
+
+    Args:
+        image (PIL.Image): Animated image
+        func (callable): Operation taking and returning a PIL image
+        workers (int): Number of frames processed at once (0 uses one per CPU core)
+
+    Returns:
+        PIL.Image: Animated GIF image with the processed frames
+    """
+    frames, durations, info = split_frames(image)
+    return join_frames(_map(func, frames, workers), durations, info, workers)
+
+def _map(func, items, workers):
+    """
+    Map a function over items on a thread pool, in order.
+
+    Args:
+        func (callable): Function to call
+        items (list): Arguments, one per call
+        workers (int): Number of threads (0 uses one per CPU core)
+
+    Returns:
+        list: Results of func, in the order of items
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    if workers == 1 or len(items) == 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-frame") as executor:
+        return list(executor.map(func, items))
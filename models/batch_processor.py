@@ -0,0 +1,159 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+from models.animation import is_animated
+from models.image_pipeline import ImagePipeline
+from utils.config import BATCH_WORKERS
+
+# Pipeline of the current worker process, built once by the pool initializer
+_worker_pipeline = None
+
+def _init_worker():
+    """
+    Build the image pipeline of a worker process.
+    """
+    global _worker_pipeline
+    _worker_pipeline = ImagePipeline()
+
+def _process_file(source_path, operations, output_path):
+    """
+    Run an operation chain on an image file in a worker process.
+
+    Only paths cross the process boundary; the worker reads and writes the
+    pixels itself.
+
+    Args:
+        source_path (str): Path of the input image
+        operations (list): ImagePipeline operation dicts
+        output_path (str): Path to save the result to
+
+    Returns:
+        str: Output path
+
+    Raises:
+        Exception: If an operation fails; nothing is written then
+    """
+    pipeline = _worker_pipeline if _worker_pipeline is not None else ImagePipeline()
+
+    with Image.open(source_path) as image:
+        # A failure is reported for this file rather than saved as an unedited copy
+        result = pipeline.run(image, operations, raise_errors=True)
+        result.save(output_path, save_all=is_animated(result))
+
+    return output_path
+
+class BatchProcessor:
+    def __init__(self, max_workers=BATCH_WORKERS):
+        """
+        Initialize a process pool that applies operation chains to many images.
+
+        Filters and edits are CPU-bound PIL/NumPy work, so separate processes
+        let a batch use every core instead of contending for the GIL.
+
+        Args:
+            max_workers (int): Number of worker processes (0 uses one per core)
+        """
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def run(self, tasks):
+        """
+        Process a batch of images in parallel and wait for all of them.
+
+        Args:
+            tasks (list): Tuples of (source path, operations, output path)
+
+        Returns:
+            list: One (output path, error) tuple per task, in order; output path is
+                None and error is a message when the task failed
+        """
+        executor = self._get_executor()
+        try:
+            futures = [executor.submit(_process_file, source, operations, output) for source, operations, output in tasks]
+        except BrokenProcessPool as e:
+            self._reset(executor)
+            print(f"Error processing batch: {e}")
+            return [(None, str(e))] * len(tasks)
+
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool for the next batch
+                self._reset(executor)
+                print(f"Error processing batch image: {e}")
+                results.append((None, str(e)))
+            except Exception as e:
+                print(f"Error processing batch image: {e}")
+                results.append((None, str(e)))
+
+        return results
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _reset(self, executor):
+        """
+        Drop a broken pool so the next batch starts a new one.
+
+        Args:
+            executor (ProcessPoolExecutor): Pool that broke
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+        executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        """
+        Get the process pool, starting it on first use.
+
+        Returns:
+            ProcessPoolExecutor: Worker pool
+        """
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the web server's threads and locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+
+            return self._executor
+
+_shared_processor = None
+_shared_processor_lock = threading.Lock()
+
+def get_batch_processor():
+    """
+    Get the process-wide batch processor.
+
+    The worker processes start on the first batch and are shut down at interpreter exit.
+
+    Returns:
+        BatchProcessor: Shared batch processor
+    """
+    global _shared_processor
+
+    with _shared_processor_lock:
+        if _shared_processor is None:
+            _shared_processor = BatchProcessor()
+            atexit.register(_shared_processor.close)
+
+        return _shared_processor
@@ -0,0 +1,127 @@
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from together import Together
+from utils.config import TOGETHER_API_KEY, TOGETHER_CLIENT_POOL_SIZE
+
+class TogetherClientPool:
+    def __init__(self, api_key=TOGETHER_API_KEY, pool_size=TOGETHER_CLIENT_POOL_SIZE):
+        """
+        Initialize a pool of long-lived Together clients.
+
+        Clients are created lazily and handed out to one thread at a time, so
+        each client keeps its HTTP connections alive between requests instead
+        of paying client setup and a new TLS handshake on every call.
+
+        Args:
+            api_key (str): Together API key
+            pool_size (int): Maximum number of clients (and concurrent users)
+        """
+        self.api_key = api_key
+        self.pool_size = max(1, int(pool_size))
+
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @contextmanager
+    def client(self):
+        """
+        Borrow a client from the pool for the duration of a with-block.
+
+        Blocks while all clients are in use by other threads.
+
+        Yields:
+            Together: Together API client
+        """
+        client = self._checkout()
+        try:
+            yield client
+        finally:
+            self._checkin(client)
+
+    def _checkout(self):
+        """
+        Take an idle client, creating one if the pool is not full yet.
+
+        Returns:
+            Together: Together API client
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                # The shared rate limiter retries 429s, server errors and connection
+                # errors; SDK retries on top would multiply the attempts
+                return Together(api_key=self.api_key, max_retries=0)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get()
+
+    def _checkin(self, client):
+        """
+        Return a borrowed client to the pool.
+
+        Args:
+            client (Together): Client previously obtained from the pool
+        """
+        self._idle.put(client)
+
+    def close(self):
+        """
+        Close all idle clients and their connections.
+
+        Clients still borrowed by other threads are returned to the pool as
+        usual; the pool stays usable and recreates clients on demand.
+        """
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            with self._lock:
+                self._created -= 1
+
+            close = getattr(client, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"Error closing Together client: {e}")
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_client_pool():
+    """
+    Get the process-wide Together client pool.
+
+    The pool is created on first use and closed automatically at interpreter exit.
+
+    Returns:
+        TogetherClientPool: Shared client pool
+    """
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = TogetherClientPool()
+            atexit.register(_shared_pool.close)
+
+        return _shared_pool
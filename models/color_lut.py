@@ -0,0 +1,262 @@
+import numpy as np
+from functools import lru_cache
+from PIL import Image, ImageFilter
+from models.compute_backends import get_compute_backends
+from models.numeric import WORK_DTYPE, lerp, round_clip, to_work
+from models.tiling import process_tiled
+
+# Grid points per axis of a compiled LUT; 33 keeps interpolation error within a level or two
+LUT_SIZE = 33
+
+# Size of the thumbnail used to estimate the image mean for contrast steps
+MEAN_SAMPLE_SIZE = (64, 64)
+
+# Weights PIL uses for RGB -> L conversion
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=WORK_DTYPE)
+
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131]
+], dtype=WORK_DTYPE)
+
+# The operations below work on WORK_DTYPE colors in place, so a chain needs
+# at most one extra color-sized buffer (sepia) on top of its input
+
+def _luma(rgb):
+    """
+    Compute the grayscale value of RGB colors the way PIL's convert('L') does.
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3)
+
+    Returns:
+        numpy.ndarray: Gray levels with shape (N, 1)
+    """
+    gray = rgb @ LUMA_WEIGHTS
+    return np.rint(gray, out=gray)[:, np.newaxis]
+
+def _sepia(rgb, intensity):
+    """
+    Sepia tone blended with the original (ImageFilter.sepia_filter).
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3), transformed in place
+        intensity (float): Blend factor towards sepia
+
+    Returns:
+        numpy.ndarray: Transformed colors
+    """
+    sepia = rgb @ SEPIA_MATRIX.T
+    np.clip(sepia, 0, 255, out=sepia)
+    np.trunc(sepia, out=sepia)
+    return lerp(rgb, sepia, intensity)
+
+def _grayscale(rgb, intensity):
+    """
+    Grayscale blended with the original (ImageFilter.grayscale_filter).
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3), transformed in place
+        intensity (float): Blend factor towards gray
+
+    Returns:
+        numpy.ndarray: Transformed colors
+    """
+    return lerp(rgb, _luma(rgb), intensity)
+
+def _brightness(rgb, factor):
+    """
+    Blend with black, like ImageEnhance.Brightness.
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3), transformed in place
+        factor (float): Brightness factor
+
+    Returns:
+        numpy.ndarray: Transformed colors
+    """
+    rgb *= factor
+    return rgb
+
+def _contrast(rgb, factor, mean):
+    """
+    Blend with the image's mean gray level, like ImageEnhance.Contrast.
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3), transformed in place
+        factor (float): Contrast factor
+        mean (int): Mean gray level of the image
+
+    Returns:
+        numpy.ndarray: Transformed colors
+    """
+    rgb -= mean
+    rgb *= factor
+    rgb += mean
+    return rgb
+
+def _saturation(rgb, factor):
+    """
+    Blend with the grayscale version, like ImageEnhance.Color.
+
+    Args:
+        rgb (numpy.ndarray): Colors with shape (N, 3), transformed in place
+        factor (float): Saturation factor
+
+    Returns:
+        numpy.ndarray: Transformed colors
+    """
+    return lerp(rgb, _luma(rgb), 1.0 - factor)
+
+# Point-wise color operations by name; each maps float RGB colors (N, 3) to new colors
+POINT_OPS = {
+    'sepia': _sepia,
+    'grayscale': _grayscale,
+    'brightness': _brightness,
+    'contrast': _contrast,
+    'saturation': _saturation
+}
+
+# Parameter value at which each operation leaves colors unchanged
+IDENTITY_VALUES = {
+    'sepia': 0.0,
+    'grayscale': 0.0,
+    'brightness': 1.0,
+    'contrast': 1.0,
+    'saturation': 1.0
+}
+
+def _run_ops(rgb, ops):
+    """
+    Run a resolved chain of operations on an array of colors, in place.
+
+    Each step is rounded and clipped to 0-255 like the 8-bit image it replaces.
+
+    Args:
+        rgb (numpy.ndarray): WORK_DTYPE colors with shape (N, 3); overwritten
+        ops (tuple): Resolved operations, each (name, *params)
+
+    Returns:
+        numpy.ndarray: Transformed colors with shape (N, 3)
+    """
+    for name, *params in ops:
+        rgb = round_clip(POINT_OPS[name](rgb, *params))
+
+    return rgb
+
+@lru_cache(maxsize=64)
+def compile_lut(ops, size=LUT_SIZE):
+    """
+    Compile a resolved chain of point-wise color operations into a 3D LUT.
+
+    Compiled LUTs are cached, so a chain is only evaluated once per set of
+    parameters.
+
+    Args:
+        ops (tuple): Resolved operations, each (name, *params)
+        size (int): Grid points per axis
+
+    Returns:
+        PIL.ImageFilter.Color3DLUT: LUT applying the whole chain in one pass
+    """
+    # PIL expects the red index to change fastest, then green, then blue
+    levels = np.linspace(0, 255, size, dtype=WORK_DTYPE)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+    rgb = np.stack([r, g, b], axis=-1).reshape(-1, 3)
+
+    table = _run_ops(rgb, ops)
+    table /= 255.0
+    return ImageFilter.Color3DLUT(size, table)
+
+def _mean_level(image, ops):
+    """
+    Estimate the mean gray level of an image after a chain of operations.
+
+    Args:
+        image (PIL.Image): Input image
+        ops (tuple): Resolved operations to run first
+
+    Returns:
+        int: Mean gray level (0-255), rounded like ImageEnhance.Contrast
+    """
+    sample = image.convert('RGB').resize(MEAN_SAMPLE_SIZE, Image.BOX)
+    rgb = _run_ops(to_work(sample).reshape(-1, 3), ops)
+
+    return int(_luma(rgb).mean() + 0.5)
+
+def resolve_ops(image, ops):
+    """
+    Quantize the parameters of a chain and fill in image-dependent values.
+
+    Parameters are rounded to 0.01 so nearby slider values share a LUT, and
+    steps that would leave colors unchanged are dropped. Contrast steps also
+    receive the mean gray level of the image at that point in the chain.
+
+    Args:
+        image (PIL.Image): Input image
+        ops (list): Operations, each (name, value)
+
+    Returns:
+        tuple: Resolved operations, usable as a compile_lut() cache key
+    """
+    resolved = []
+    for name, value in ops:
+        if name not in POINT_OPS:
+            raise ValueError(f"Unknown color operation: {name}")
+
+        step = (name, round(float(value), 2))
+        if step[1] == IDENTITY_VALUES[name]:
+            continue
+
+        if name == 'contrast':
+            step += (_mean_level(image, tuple(resolved)),)
+        resolved.append(step)
+
+    return tuple(resolved)
+
+def _blend_grayscale(image, intensity):
+    """
+    Blend an image with its grayscale version using PIL's native operations.
+
+    Args:
+        image (PIL.Image): RGB or RGBA image
+        intensity (float): Weight of the grayscale version (0.0 to 1.0)
+
+    Returns:
+        PIL.Image: Blended image, with the input's alpha channel if it had one
+    """
+    rgb = image.convert('RGB') if image.mode == 'RGBA' else image
+    result = Image.blend(rgb, rgb.convert('L').convert('RGB'), intensity)
+
+    if image.mode == 'RGBA':
+        result.putalpha(image.getchannel('A'))
+    return result
+
+def apply_color_ops(image, ops):
+    """
+    Apply a chain of point-wise color operations in a single pass.
+
+    Large images are processed tile by tile within the tiling memory budget;
+    image-dependent parameters are still resolved on the whole image.
+
+    Args:
+        image (PIL.Image): Input image
+        ops (list): Operations, each (name, value), e.g. [('sepia', 0.5), ('contrast', 0.8)]
+
+    Returns:
+        PIL.Image: Transformed image
+    """
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    resolved = resolve_ops(image, ops)
+    if not resolved:
+        return image.copy()
+
+    # On its own, grayscale is faster as PIL's native conversion and blend than as a LUT
+    if len(resolved) == 1 and resolved[0][0] == 'grayscale':
+        return _blend_grayscale(image, resolved[0][1])
+
+    color, copies = get_compute_backends().get('color', image)
+    return process_tiled(image, lambda tile: color(tile, resolved), copies=copies)
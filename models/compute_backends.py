@@ -0,0 +1,326 @@
+import os
+import json
+import threading
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+from PIL import ImageFilter as PILImageFilter
+from models.numeric import WORK_DTYPE, lerp, to_uint8, to_work
+from utils.config import COMPUTE_BACKENDS_FILE
+
+# Backend used when nothing else was chosen; matches the original behavior
+DEFAULT_BACKEND = "pil"
+
+# Image size classes by pixel count; the last one is open-ended
+SIZE_CLASSES = (("small", 512 * 1024), ("medium", 4 * 1024 * 1024), ("large", None))
+
+# Blur radius classes; which backend wins depends on the radius as well as the size
+RADIUS_CLASSES = (("r2", 2), ("r8", 8), ("r32", None))
+
+# PIL's SMOOTH kernel, used by ImageEnhance.Sharpness
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=WORK_DTYPE) / 13
+
+# Modes the OpenCV and NumPy implementations handle; anything else uses PIL
+ARRAY_MODES = ('L', 'RGB', 'RGBA')
+
+def size_class(pixels):
+    """
+    Get the size class of an image.
+
+    Args:
+        pixels (int): Number of pixels
+
+    Returns:
+        str: Size class name
+    """
+    for name, limit in SIZE_CLASSES:
+        if limit is None or pixels <= limit:
+            return name
+
+def radius_class(radius):
+    """
+    Get the radius class of a blur.
+
+    Args:
+        radius (float): Blur radius in pixels
+
+    Returns:
+        str: Radius class name
+    """
+    for name, limit in RADIUS_CLASSES:
+        if limit is None or radius <= limit:
+            return name
+
+def _from_array(array, mode):
+    """
+    Wrap a uint8 array as a PIL image.
+
+    Args:
+        array (numpy.ndarray): Pixel array
+        mode (str): PIL mode of the array
+
+    Returns:
+        PIL.Image: Image
+    """
+    return Image.fromarray(np.ascontiguousarray(array), mode=mode)
+
+# Blur: Gaussian blur with PIL's radius (standard deviation) semantics
+
+def _blur_pil(image, radius):
+    return image.filter(PILImageFilter.GaussianBlur(radius=radius))
+
+def _blur_opencv(image, radius):
+    array = cv2.GaussianBlur(np.asarray(image), (0, 0), sigmaX=radius, borderType=cv2.BORDER_REPLICATE)
+    return _from_array(array, image.mode)
+
+def _box_blur_columns(work, box):
+    # Three box blurs down the first axis, via running sums in one edge-padded
+    # buffer reused by every pass
+    width = 2 * box + 1
+    padded = np.empty((len(work) + width,) + work.shape[1:], dtype=WORK_DTYPE)
+
+    for _ in range(3):
+        padded[box + 1:box + 1 + len(work)] = work
+        padded[:box + 1] = work[0]
+        padded[box + 1 + len(work):] = work[-1]
+
+        np.cumsum(padded, axis=0, out=padded)
+        np.subtract(padded[width:], padded[:-width], out=work)
+        work *= 1.0 / width
+
+def _blur_numpy(image, radius):
+    # Three box blurs per axis approximate a Gaussian, the same way PIL does
+    box = max(1, int(round((np.sqrt(4 * radius * radius + 1) - 1) / 2)))
+
+    work = to_work(np.asarray(image))
+    _box_blur_columns(work, box)
+
+    # Rows are blurred as the columns of the transposed image, so every pass runs on contiguous memory
+    work = np.ascontiguousarray(np.swapaxes(work, 0, 1))
+    _box_blur_columns(work, box)
+
+    return _from_array(np.swapaxes(to_uint8(work), 0, 1), image.mode)
+
+# Sharpen: blend away from PIL's SMOOTH filter, like ImageEnhance.Sharpness
+
+def _sharpen_pil(image, factor):
+    return ImageEnhance.Sharpness(image).enhance(factor)
+
+def _sharpen_opencv(image, factor):
+    array = np.asarray(image)
+    smooth = cv2.filter2D(array, -1, SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+
+    # PIL leaves the outermost pixels unfiltered
+    smooth[0], smooth[-1], smooth[:, 0], smooth[:, -1] = array[0], array[-1], array[:, 0], array[:, -1]
+
+    return _from_array(cv2.addWeighted(array, factor, smooth, 1.0 - factor, 0), image.mode)
+
+def _sharpen_numpy(image, factor):
+    work = to_work(np.asarray(image))
+
+    # SMOOTH kernel (weight 5 in the center, 1 around it, over 13) summed in place;
+    # PIL leaves the outermost pixels unfiltered
+    smooth = work.copy()
+    inner = smooth[1:-1, 1:-1]
+    np.multiply(work[1:-1, 1:-1], 5, out=inner)
+    for dy in range(3):
+        for dx in range(3):
+            if (dy, dx) != (1, 1):
+                inner += work[dy:dy + inner.shape[0], dx:dx + inner.shape[1]]
+    inner /= 13
+    np.rint(inner, out=inner)
+
+    return _from_array(to_uint8(lerp(smooth, work, factor)), image.mode)
+
+# Color: a resolved color_lut operation chain
+
+def _color_pil(image, ops):
+    from models.color_lut import compile_lut
+    return image.filter(compile_lut(ops))
+
+def _color_numpy(image, ops):
+    # Exact per-pixel evaluation, no LUT interpolation
+    from models.color_lut import _run_ops
+    array = np.asarray(image)
+    rgb = _run_ops(to_work(array[..., :3]).reshape(-1, 3), ops)
+
+    result = array.copy()
+    np.copyto(result[..., :3], rgb.reshape(array.shape[:2] + (3,)), casting='unsafe')
+    return _from_array(result, image.mode)
+
+def _color_opencv(image, ops):
+    from models.color_lut import SEPIA_MATRIX
+    array = np.asarray(image)
+    rgb = np.ascontiguousarray(array[..., :3])
+
+    def gray_of(pixels):
+        return cv2.cvtColor(cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+
+    for name, *params in ops:
+        value = params[0]
+        if name == 'sepia':
+            rgb = cv2.addWeighted(rgb, 1.0 - value, cv2.transform(rgb, SEPIA_MATRIX), value, 0)
+        elif name == 'grayscale':
+            rgb = cv2.addWeighted(rgb, 1.0 - value, gray_of(rgb), value, 0)
+        elif name == 'brightness':
+            rgb = cv2.convertScaleAbs(rgb, alpha=value)
+        elif name == 'contrast':
+            mean = params[1]
+            rgb = cv2.addWeighted(rgb, value, np.full_like(rgb, mean), 1.0 - value, 0)
+        elif name == 'saturation':
+            rgb = cv2.addWeighted(rgb, value, gray_of(rgb), 1.0 - value, 0)
+
+    if array.shape[-1] == 4:
+        rgb = np.dstack([rgb, array[..., 3]])
+
+    return _from_array(rgb, image.mode)
+
+# Resize: PIL LANCZOS semantics (antialiased when shrinking)
+
+def _resize_pil(image, size):
+    return image.resize(size, Image.LANCZOS)
+
+def _resize_opencv(image, size):
+    shrinking = size[0] < image.width or size[1] < image.height
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+    return _from_array(cv2.resize(np.asarray(image), size, interpolation=interpolation), image.mode)
+
+# Rotate: expanding bicubic rotation with black corners, like ImageEditor.rotate
+
+def _rotate_pil(image, angle):
+    return image.rotate(angle, expand=True, resample=Image.BICUBIC)
+
+def _rotate_opencv(image, angle):
+    if angle % 90 == 0:
+        # PIL turns these into lossless transposes
+        return _rotate_pil(image, angle)
+
+    from models.image_pipeline import rotation_matrix
+    matrix, size = rotation_matrix(image.size, angle)
+
+    # PIL samples at pixel centers (x + 0.5); OpenCV at integer coordinates
+    matrix[:2, 2] = matrix[:2, :2] @ [0.5, 0.5] + matrix[:2, 2] - 0.5
+
+    array = cv2.warpAffine(np.asarray(image), matrix[:2], size,
+                           flags=cv2.INTER_CUBIC | cv2.WARP_INVERSE_MAP,
+                           borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    return _from_array(array, image.mode)
+
+# Implementations per operation and backend, with the number of tile-sized
+# buffers per band each one allocates (used for tiling memory budgets)
+BACKENDS = {
+    'blur': {'pil': (_blur_pil, 3), 'opencv': (_blur_opencv, 3), 'numpy': (_blur_numpy, 9)},
+    'sharpen': {'pil': (_sharpen_pil, 3), 'opencv': (_sharpen_opencv, 4), 'numpy': (_sharpen_numpy, 10)},
+    'color': {'pil': (_color_pil, 2), 'opencv': (_color_opencv, 5), 'numpy': (_color_numpy, 10)},
+    'resize': {'pil': (_resize_pil, 2), 'opencv': (_resize_opencv, 2)},
+    'rotate': {'pil': (_rotate_pil, 2), 'opencv': (_rotate_opencv, 2)}
+}
+
+# Image modes a backend is limited to for an operation, where it only matches PIL
+# for some of ARRAY_MODES: OpenCV's bicubic rotation filters alpha and
+# single-band edges differently from PIL's, by up to half the value range
+BACKEND_MODES = {
+    ('rotate', 'opencv'): ('RGB',)
+}
+
+class ComputeBackends:
+    def __init__(self, choices=None):
+        """
+        Initialize the backend selection for filter and editor operations.
+
+        Args:
+            choices (dict, optional): Backend name per selection key, e.g.
+                {"blur:large:r8": "opencv"}, as written by benchmark_backends.py.
+                Operations without a choice use PIL.
+        """
+        self.choices = dict(choices or {})
+
+    @classmethod
+    def load(cls, path=COMPUTE_BACKENDS_FILE):
+        """
+        Load backend choices from a JSON file written by benchmark_backends.py.
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            ComputeBackends: Backend selection (PIL everywhere if the file is missing or invalid)
+        """
+        if not path or not os.path.exists(path):
+            return cls()
+
+        try:
+            with open(path) as f:
+                return cls(json.load(f).get('choices', {}))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error loading compute backends from {path}: {e}")
+            return cls()
+
+    @staticmethod
+    def selection_key(op, pixels, variant=None):
+        """
+        Build the key a backend choice is stored under.
+
+        Args:
+            op (str): Operation name
+            pixels (int): Number of pixels of the input image
+            variant (str, optional): Operation-specific class, e.g. the blur radius class
+
+        Returns:
+            str: Selection key
+        """
+        key = f"{op}:{size_class(pixels)}"
+        return f"{key}:{variant}" if variant else key
+
+    def choose(self, op, image, variant=None):
+        """
+        Pick the backend for an operation on an image.
+
+        Args:
+            op (str): Operation name
+            image (PIL.Image): Input image
+            variant (str, optional): Operation-specific class
+
+        Returns:
+            str: Backend name
+        """
+        if image.mode not in ARRAY_MODES:
+            return DEFAULT_BACKEND
+
+        backend = self.choices.get(self.selection_key(op, image.width * image.height, variant), DEFAULT_BACKEND)
+        if backend not in BACKENDS[op] or image.mode not in BACKEND_MODES.get((op, backend), ARRAY_MODES):
+            return DEFAULT_BACKEND
+
+        return backend
+
+    def get(self, op, image, variant=None):
+        """
+        Get the implementation chosen for an operation on an image.
+
+        Args:
+            op (str): Operation name
+            image (PIL.Image): Input image
+            variant (str, optional): Operation-specific class
+
+        Returns:
+            tuple: (function, working copies per band)
+        """
+        return BACKENDS[op][self.choose(op, image, variant)]
+
+_shared_backends = None
+_shared_backends_lock = threading.Lock()
+
+def get_compute_backends():
+    """
+    Get the process-wide backend selection, loaded from COMPUTE_BACKENDS_FILE.
+
+    Returns:
+        ComputeBackends: Shared backend selection
+    """
+    global _shared_backends
+
+    with _shared_backends_lock:
+        if _shared_backends is None:
+            _shared_backends = ComputeBackends.load()
+
+        return _shared_backends
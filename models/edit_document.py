@@ -0,0 +1,336 @@
+from collections import OrderedDict
+from models.image_pipeline import ImagePipeline, FUSED_STAGES
+from utils.config import PREVIEW_MAX_SIZE, EDIT_CHECKPOINT_MB, EDIT_PREVIEW_ITEMS
+
+# Stage kinds worth a checkpoint after them: replaying them costs far more
+# than keeping their output (color LUTs and resamples are cheap to redo)
+CHECKPOINT_AFTER = ('filter', 'edit')
+
+class EditDocument:
+    def __init__(self, source, operations=None, pipeline=None, executor=None,
+                 checkpoint_mb=EDIT_CHECKPOINT_MB, preview_items=EDIT_PREVIEW_ITEMS):
+        """
+        Initialize a non-destructive edit document: a source image plus an
+        ordered list of ImagePipeline operations, rendered only on demand.
+
+        Adding an edit only records it. The chain is evaluated when a render
+        or preview is requested, so consecutive crop / rotate / resize edits
+        share one resample (quarter turns are lossless transposes) and
+        consecutive color edits share one LUT pass.
+
+        The operation list doubles as the undo/redo history: undo and redo
+        only move the current position. Full-resolution renders after
+        expensive operations are kept as checkpoints under a memory budget
+        (least recently used first out), and a render replays the operations
+        after the nearest checkpoint, so stepping through history rarely
+        redoes a blur or a background removal.
+
+        Args:
+            source (PIL.Image): Image the edits apply to; never modified
+            operations (list, optional): Initial operation dicts
+            pipeline (ImagePipeline, optional): Pipeline that evaluates the chain
+            executor (EditExecutor, optional): Runs full-resolution renders in worker
+                processes, with timeouts and cancellation; previews always run in-process
+            checkpoint_mb (int): Memory budget of the checkpoint renders in megabytes
+            preview_items (int): Number of preview renders kept
+        """
+        self.pipeline = pipeline if pipeline is not None else ImagePipeline()
+        self.executor = executor
+        self.source = source
+        self.operations = []
+        self.position = 0
+        self.checkpoint_bytes = max(0, int(checkpoint_mb)) * 1024 * 1024
+        self.preview_items = max(1, int(preview_items))
+
+        self._render = None
+        self._checkpoints = OrderedDict()
+        self._checkpoint_total = 0
+        self._previews = OrderedDict()
+
+        for operation in operations or []:
+            self.add(operation)
+
+    def __len__(self):
+        return self.position
+
+    @property
+    def can_undo(self):
+        return self.position > 0
+
+    @property
+    def can_redo(self):
+        return self.position < len(self.operations)
+
+    def set_source(self, source):
+        """
+        Replace the source image, keeping the edits and their history.
+
+        Args:
+            source (PIL.Image): New source image
+        """
+        if source is not self.source:
+            self.source = source
+            self._drop_renders()
+
+    def add(self, operation):
+        """
+        Apply an edit after the current position, discarding the redo history.
+
+        Args:
+            operation (dict): ImagePipeline operation dict, e.g.
+                {'type': 'rotate', 'angle': 90}
+
+        Raises:
+            ValueError: If the operation is not supported by the pipeline
+        """
+        # Reject unknown operations now rather than at render time
+        self.pipeline.plan([operation])
+
+        # Renders past the current position show edits that are about to be discarded
+        del self.operations[self.position:]
+        for count in [count for count in self._checkpoints if count > self.position]:
+            self._drop_checkpoint(count)
+        if self._render is not None and self._render[0] > self.position:
+            self._render = None
+
+        self.operations.append(dict(operation))
+        self.position += 1
+
+    def undo(self):
+        """
+        Step back one edit.
+
+        Returns:
+            bool: False if there was nothing to undo
+        """
+        if not self.can_undo:
+            return False
+
+        self.position -= 1
+        return True
+
+    def redo(self):
+        """
+        Step forward one undone edit.
+
+        Returns:
+            bool: False if there was nothing to redo
+        """
+        if not self.can_redo:
+            return False
+
+        self.position += 1
+        return True
+
+    def clear(self):
+        """
+        Remove all edits and their history.
+        """
+        self.operations = []
+        self.position = 0
+        self._drop_renders()
+
+    def render(self):
+        """
+        Render the document at full resolution.
+
+        The render is kept until the source or the position changes.
+
+        Returns:
+            PIL.Image: Edited image (the source itself when there are no edits)
+
+        Raises:
+            QueueFull, TimeoutError, concurrent.futures.CancelledError: From the
+                executor, when one is set
+        """
+        count = self.position
+        if count == 0:
+            return self.source
+
+        if self._render is not None and self._render[0] == count:
+            return self._render[1]
+
+        start, image = self._nearest_checkpoint(count)
+
+        # Render up to each checkpoint-worthy boundary, then to the end
+        for end in self._segment_ends(start, count):
+            if self.executor is not None:
+                # A newer render of this document supersedes one still running
+                image = self.executor.run(image, self.operations[start:end], key=('edit_document', id(self)))
+            else:
+                image = self.pipeline.run(image, self.operations[start:end])
+            self._put_checkpoint(end, image)
+            start = end
+
+        self._render = (count, image)
+        return image
+
+    def rendered(self):
+        """
+        Get the full-resolution render if it exists already, without rendering.
+
+        Returns:
+            PIL.Image: Edited image, or None if render() has not run since the last change
+        """
+        if self.position == 0:
+            return self.source
+
+        if self._render is not None and self._render[0] == self.position:
+            return self._render[1]
+
+        return None
+
+    def preview(self, pending=None, preview_size=PREVIEW_MAX_SIZE):
+        """
+        Render the document on a low-resolution proxy of the source.
+
+        Args:
+            pending (dict, optional): Operation shown after the current edits
+                without being added, e.g. the current settings of an edit control
+            preview_size (int): Longest side of the proxy in pixels
+
+        Returns:
+            PIL.Image: Preview image
+        """
+        operations = self.operations[:self.position] + ([pending] if pending else [])
+        key = (preview_size, repr(operations))
+
+        # Interactive front ends ask for the same previews on every refresh and
+        # when stepping back and forth through history
+        preview = self._previews.get(key)
+        if preview is None:
+            preview = self.pipeline.run(self.source, operations, preview_size=preview_size)
+            self._previews[key] = preview
+            while len(self._previews) > self.preview_items:
+                self._previews.popitem(last=False)
+        else:
+            self._previews.move_to_end(key)
+
+        return preview
+
+    def checkpoint_usage(self):
+        """
+        Get the memory used by checkpoint renders.
+
+        Returns:
+            dict: Number of checkpoints, their size and the budget in bytes
+        """
+        return {
+            'checkpoints': len(self._checkpoints),
+            'bytes': self._checkpoint_total,
+            'budget_bytes': self.checkpoint_bytes
+        }
+
+    def _fuses(self, before, after):
+        """
+        Check whether the pipeline merges two consecutive operations into one stage.
+
+        Args:
+            before (dict): Earlier operation
+            after (dict): Later operation
+
+        Returns:
+            bool: True if rendering them separately would change the result
+        """
+        stages_before = self.pipeline.plan([before])
+        stages_after = self.pipeline.plan([after])
+        if not stages_before or not stages_after:
+            return False
+
+        kind = stages_before[-1][0]
+        return kind == stages_after[0][0] and kind in FUSED_STAGES
+
+    def _nearest_checkpoint(self, count):
+        """
+        Find the latest checkpoint a render of the first `count` operations can resume from.
+
+        Checkpoints in the middle of a fused stage are skipped: resuming there
+        would resample or re-quantize twice where a full render does it once.
+
+        Args:
+            count (int): Number of operations to render
+
+        Returns:
+            tuple: (number of operations already applied, image to continue from)
+        """
+        for start in sorted(self._checkpoints, reverse=True):
+            if start > count:
+                continue
+            if start < count and self._fuses(self.operations[start - 1], self.operations[start]):
+                continue
+
+            self._checkpoints.move_to_end(start)
+            return start, self._checkpoints[start]
+
+        return 0, self.source
+
+    def _segment_ends(self, start, count):
+        """
+        Split the operations still to render at boundaries worth a checkpoint.
+
+        Args:
+            start (int): Number of operations already applied
+            count (int): Number of operations to render
+
+        Returns:
+            list: Operation counts to render up to, in order, ending with count
+        """
+        ends = []
+        for index in range(start, count - 1):
+            stages = self.pipeline.plan([self.operations[index]])
+            if stages and stages[-1][0] in CHECKPOINT_AFTER:
+                ends.append(index + 1)
+
+        return ends + [count]
+
+    def _put_checkpoint(self, count, image):
+        """
+        Keep a render as a checkpoint, evicting the least recently used ones
+        to stay within the memory budget.
+
+        Args:
+            count (int): Number of operations applied in the render
+            image (PIL.Image): Render
+        """
+        size = _image_bytes(image)
+        if size > self.checkpoint_bytes:
+            return
+
+        self._drop_checkpoint(count)
+        while self._checkpoints and self._checkpoint_total + size > self.checkpoint_bytes:
+            self._drop_checkpoint(next(iter(self._checkpoints)))
+
+        self._checkpoints[count] = image
+        self._checkpoint_total += size
+
+    def _drop_checkpoint(self, count):
+        """
+        Forget one checkpoint, if it exists.
+
+        Args:
+            count (int): Number of operations applied in the checkpoint render
+        """
+        image = self._checkpoints.pop(count, None)
+        if image is not None:
+            self._checkpoint_total -= _image_bytes(image)
+
+    def _drop_renders(self):
+        """
+        Forget every render after the source changed or the history was cleared.
+        """
+        self._render = None
+        self._checkpoints.clear()
+        self._checkpoint_total = 0
+        self._previews.clear()
+
+def _image_bytes(image):
+    """
+    Estimate the memory held by a decoded image.
+
+    Args:
+        image (PIL.Image): Image, possibly animated
+
+    Returns:
+        int: Size in bytes
+    """
+    return image.width * image.height * len(image.getbands()) * getattr(image, 'n_frames', 1)
@@ -0,0 +1,451 @@
+import io
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import CancelledError
+from PIL import Image
+from models.animation import is_animated
+from models.image_pipeline import ImagePipeline
+from models.job_queue import QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+from utils.config import EDIT_WORKERS, EDIT_MAX_QUEUED, EDIT_TIMEOUT_SECONDS
+
+# How often waiting threads check for cancellation, timeouts and dead workers, in seconds
+POLL_INTERVAL = 0.05
+
+class QueueFull(Exception):
+    """
+    Raised when an edit is submitted while the executor already holds its
+    maximum number of queued and running edits.
+    """
+
+def _pack(image):
+    """
+    Prepare an image for the pipe between the executor and a worker process.
+
+    Args:
+        image (PIL.Image): Image, possibly animated
+
+    Returns:
+        tuple: (kind, data); animations travel as encoded GIF bytes so every
+            frame survives, other images as decoded pixels
+    """
+    if is_animated(image):
+        output = io.BytesIO()
+        image.save(output, format='GIF', save_all=True)
+        return 'gif', output.getvalue()
+
+    image.load()
+    return 'image', image
+
+def _unpack(packed):
+    """
+    Restore an image prepared by _pack.
+
+    Args:
+        packed (tuple): (kind, data) from _pack
+
+    Returns:
+        PIL.Image: Image
+    """
+    kind, data = packed
+    return Image.open(io.BytesIO(data)) if kind == 'gif' else data
+
+def _worker_main(conn):
+    """
+    Worker process loop: run operation chains received over a pipe until
+    the pipe closes or a None message arrives.
+
+    Args:
+        conn (multiprocessing.connection.Connection): Worker end of the pipe
+    """
+    pipeline = ImagePipeline()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+
+        packed, operations = message
+        try:
+            # Failures go back to the caller instead of an unedited image
+            conn.send((_pack(pipeline.run(_unpack(packed), operations, raise_errors=True)), None))
+        except Exception as e:
+            conn.send((None, str(e)))
+
+class _Task:
+    def __init__(self, packed, operations, key, timeout):
+        """
+        Initialize an edit waiting for a worker.
+
+        Args:
+            packed (tuple): Input image from _pack
+            operations (list): ImagePipeline operation dicts
+            key (hashable): Supersede key, or None
+            timeout (float): Seconds the edit may run, or None for no limit
+        """
+        self.packed = packed
+        self.operations = operations
+        self.key = key
+        self.timeout = timeout
+
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_reason = None
+        self.done = threading.Event()
+
+class EditExecutor:
+    def __init__(self, max_workers=EDIT_WORKERS, max_queued=EDIT_MAX_QUEUED, timeout=EDIT_TIMEOUT_SECONDS):
+        """
+        Initialize an executor that runs filter and edit chains in worker processes.
+
+        Unlike the batch processor's ProcessPoolExecutor, each worker is a
+        process of its own that the executor can terminate. A runaway edit
+        (a GrabCut that takes too long, or one nobody waits for anymore) is
+        stopped by killing its worker and starting a fresh one, instead of
+        tying the worker up until it finishes.
+
+        Edits can be given a key, e.g. a session and image ID. A new edit with
+        the same key supersedes the older one: it is dropped from the queue,
+        or its worker is stopped. Callers can also pass a cancellation check
+        that is polled while they wait, e.g. whether the client is still there.
+
+        Args:
+            max_workers (int): Number of worker processes (0 uses one per core)
+            max_queued (int): Maximum number of queued and running edits;
+                submissions beyond it raise QueueFull
+            timeout (float): Default seconds an edit may run (0 for no limit)
+        """
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self.max_queued = max(1, int(max_queued))
+        self.timeout = timeout
+
+        self._lock = threading.Condition()
+        self._queue = deque()
+        self._latest = {}
+        self._pending = 0
+        self._runners = []
+        self._closed = False
+
+    def run(self, image, operations, key=None, timeout=None, is_cancelled=None):
+        """
+        Run an operation chain on an image in a worker process and wait for it.
+
+        Args:
+            image (PIL.Image): Input image, left unmodified
+            operations (list): ImagePipeline operation dicts
+            key (hashable, optional): Supersede key; a newer edit with the same key
+                cancels this one
+            timeout (float, optional): Seconds the edit may run once started
+                (defaults to the executor's timeout)
+            is_cancelled (callable, optional): Polled while waiting; returning True
+                cancels the edit
+
+        Returns:
+            PIL.Image: Processed image
+
+        Raises:
+            QueueFull: If too many edits are queued or running
+            TimeoutError: If the edit ran longer than its timeout
+            concurrent.futures.CancelledError: If the edit was cancelled or superseded
+            RuntimeError: If the worker failed
+        """
+        task = self.submit(image, operations, key, timeout)
+        return self.wait(task, is_cancelled)
+
+    def submit(self, image, operations, key=None, timeout=None):
+        """
+        Queue an operation chain without waiting for it.
+
+        Args:
+            image (PIL.Image): Input image, left unmodified
+            operations (list): ImagePipeline operation dicts
+            key (hashable, optional): Supersede key
+            timeout (float, optional): Seconds the edit may run once started
+
+        Returns:
+            _Task: Handle for wait and cancel
+
+        Raises:
+            QueueFull: If too many edits are queued or running
+        """
+        timeout = self.timeout if timeout is None else timeout
+        task = _Task(_pack(image), list(operations), key, timeout or None)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Edit executor is closed")
+            self._start()
+
+            # The newer edit wins; cancelling first frees the older one's queue slot
+            previous = self._latest.get(key) if key is not None else None
+            if previous is not None:
+                self._cancel(previous, "Superseded by a newer edit")
+
+            if self._pending >= self.max_queued:
+                raise QueueFull(f"{self._pending} edits already queued or running")
+
+            self._queue.append(task)
+            self._pending += 1
+            if key is not None:
+                self._latest[key] = task
+            self._lock.notify()
+
+        return task
+
+    def wait(self, task, is_cancelled=None):
+        """
+        Wait for a submitted edit.
+
+        Args:
+            task (_Task): Handle from submit
+            is_cancelled (callable, optional): Polled while waiting; returning True
+                cancels the edit
+
+        Returns:
+            PIL.Image: Processed image
+
+        Raises:
+            TimeoutError, concurrent.futures.CancelledError, RuntimeError: As in run
+        """
+        while not task.done.wait(POLL_INTERVAL):
+            if is_cancelled is not None and is_cancelled():
+                self.cancel(task)
+                is_cancelled = None
+
+        if task.state == SUCCEEDED:
+            return _unpack(task.result)
+
+        raise task.error
+
+    def cancel(self, task, reason="Cancelled"):
+        """
+        Cancel an edit: drop it if queued, stop its worker if running.
+
+        Args:
+            task (_Task): Handle from submit
+            reason (str): Message of the CancelledError its waiter gets
+
+        Returns:
+            bool: True if the edit had not finished yet
+        """
+        with self._lock:
+            return self._cancel(task, reason)
+
+    def pending_count(self):
+        """
+        Get the number of queued and running edits.
+
+        Returns:
+            int: Pending edits
+        """
+        with self._lock:
+            return self._pending
+
+    def close(self):
+        """
+        Cancel queued edits and shut down the worker processes.
+        """
+        with self._lock:
+            self._closed = True
+            while self._queue:
+                self._cancel(self._queue[0], "Edit executor closed")
+            self._lock.notify_all()
+            runners = list(self._runners)
+
+        for runner in runners:
+            runner.join()
+
+    def _cancel(self, task, reason):
+        """
+        Cancel an edit; the caller holds the lock.
+
+        Args:
+            task (_Task): Edit to cancel
+            reason (str): Cancellation message
+
+        Returns:
+            bool: True if the edit had not finished yet
+        """
+        if task.state == QUEUED:
+            self._queue.remove(task)
+            self._pending -= 1
+            self._finish(task, CANCELLED, error=CancelledError(reason))
+            return True
+
+        if task.state == RUNNING:
+            # The runner thread notices within POLL_INTERVAL and stops the worker
+            task.cancel_reason = reason
+            return True
+
+        return False
+
+    def _finish(self, task, state, result=None, error=None):
+        """
+        Record the outcome of an edit and wake its waiter; the caller holds the lock.
+
+        Args:
+            task (_Task): Finished edit
+            state (str): SUCCEEDED, FAILED or CANCELLED
+            result (tuple, optional): Packed output image
+            error (Exception, optional): Error raised to the waiter
+        """
+        task.state, task.result, task.error = state, result, error
+        task.packed = None
+
+        if task.key is not None and self._latest.get(task.key) is task:
+            del self._latest[task.key]
+
+        task.done.set()
+
+    def _start(self):
+        """
+        Start one runner thread per worker process on first use; the caller holds the lock.
+        """
+        if self._runners:
+            return
+
+        for i in range(self.max_workers):
+            runner = threading.Thread(target=self._run_worker, name=f"edit-runner-{i}", daemon=True)
+            runner.start()
+            self._runners.append(runner)
+
+    def _run_worker(self):
+        """
+        Runner loop: keep one worker process alive and feed it queued edits.
+        """
+        process, conn = None, None
+
+        while True:
+            # Start (or restart) the worker while idle, so its imports don't count
+            # against the next edit's timeout
+            if process is None:
+                process, conn = self._spawn()
+
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    break
+
+                task = self._queue.popleft()
+                task.state = RUNNING
+
+            state, result, error = self._execute(process, conn, task)
+            # A timed-out or cancelled worker is still busy with the edit; a dead one
+            # is gone. Either way the next edit gets a fresh process.
+            if isinstance(error, (TimeoutError, CancelledError)) or not process.is_alive():
+                self._stop(process, conn, force=True)
+                process, conn = None, None
+
+            with self._lock:
+                self._pending -= 1
+                self._finish(task, state, result, error)
+
+        if process is not None:
+            self._stop(process, conn, force=False)
+
+    def _execute(self, process, conn, task):
+        """
+        Run one edit on a worker process, watching for cancellation and timeout.
+
+        Args:
+            process (multiprocessing.Process): Worker process
+            conn (multiprocessing.connection.Connection): Executor end of its pipe
+            task (_Task): Edit to run
+
+        Returns:
+            tuple: (state, packed result or None, error or None)
+        """
+        try:
+            conn.send((task.packed, task.operations))
+        except (OSError, EOFError) as e:
+            return FAILED, None, RuntimeError(f"Edit worker unavailable: {e}")
+
+        deadline = time.monotonic() + task.timeout if task.timeout else None
+
+        while True:
+            if conn.poll(POLL_INTERVAL):
+                try:
+                    result, message = conn.recv()
+                except (OSError, EOFError):
+                    return FAILED, None, RuntimeError("Edit worker exited unexpectedly")
+
+                if message is not None:
+                    return FAILED, None, RuntimeError(message)
+                return SUCCEEDED, result, None
+
+            if task.cancel_reason is not None:
+                return CANCELLED, None, CancelledError(task.cancel_reason)
+            if deadline is not None and time.monotonic() > deadline:
+                return FAILED, None, TimeoutError(f"Edit took longer than {task.timeout:g} seconds")
+            if not process.is_alive():
+                return FAILED, None, RuntimeError("Edit worker exited unexpectedly")
+
+    def _spawn(self):
+        """
+        Start a worker process.
+
+        Returns:
+            tuple: (process, executor end of its pipe)
+        """
+        # Spawned workers don't inherit the server's threads and locks
+        context = multiprocessing.get_context("spawn")
+        conn, child_conn = context.Pipe()
+
+        process = context.Process(target=_worker_main, args=(child_conn,), name="edit-worker", daemon=True)
+        process.start()
+        child_conn.close()
+
+        return process, conn
+
+    def _stop(self, process, conn, force):
+        """
+        Stop a worker process.
+
+        Args:
+            process (multiprocessing.Process): Worker process
+            conn (multiprocessing.connection.Connection): Executor end of its pipe
+            force (bool): Terminate at once instead of asking the worker to exit
+        """
+        if not force:
+            try:
+                conn.send(None)
+            except (OSError, EOFError):
+                force = True
+
+        if force:
+            process.terminate()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+        conn.close()
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def get_edit_executor():
+    """
+    Get the process-wide edit executor.
+
+    The worker processes start on the first edit and are shut down at interpreter exit.
+
+    Returns:
+        EditExecutor: Shared edit executor
+    """
+    global _shared_executor
+
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = EditExecutor()
+            atexit.register(_shared_executor.close)
+
+        return _shared_executor
@@ -0,0 +1,297 @@
+import io
+import json
+import base64
+import threading
+import http.client
+from urllib.parse import urlsplit
+from PIL import Image
+from models.client_pool import get_client_pool
+from utils.timing import span
+from utils.config import TOGETHER_API_KEY, TOGETHER_MODEL, GENERATION_BACKEND, GENERATION_BACKEND_URL
+
+def decode_b64_image(data):
+    """
+    Decode a base64-encoded image returned by an images endpoint.
+
+    Args:
+        data (str): Base64-encoded image bytes
+
+    Returns:
+        PIL.Image: Decoded image
+    """
+    with span('decode'):
+        image_data = base64.b64decode(data)
+
+    with span('open'):
+        image = Image.open(io.BytesIO(image_data))
+
+        # Decode the pixels here so the work happens on the calling thread
+        image.load()
+
+    return image
+
+class GenerationBackend:
+    # Name used to select the backend in the GENERATION_BACKEND setting
+    name = None
+
+    def __init__(self, model=TOGETHER_MODEL):
+        """
+        Initialize the backend.
+
+        Args:
+            model (str): Model name sent to the images endpoint
+        """
+        self.model = model
+
+    def is_configured(self):
+        """
+        Check whether the backend has everything it needs to make requests.
+
+        Returns:
+            bool: True if the backend can be used
+        """
+        return True
+
+    def generate(self, prompt, width, height, steps, n=1):
+        """
+        Generate images with a single upstream request.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+            n (int): Number of images to generate
+
+        Returns:
+            list: List of generated PIL images
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release connections held by the backend.
+        """
+        pass
+
+class TogetherBackend(GenerationBackend):
+    name = "together"
+
+    def __init__(self, model=TOGETHER_MODEL, api_key=TOGETHER_API_KEY, client_pool=None):
+        """
+        Initialize the Together API backend.
+
+        Args:
+            model (str): Together model name
+            api_key (str): Together API key
+            client_pool (TogetherClientPool, optional): Pool of Together clients to use.
+                Defaults to the process-wide shared pool.
+        """
+        super().__init__(model)
+        self.api_key = api_key
+        self.client_pool = client_pool if client_pool is not None else get_client_pool()
+
+    def is_configured(self):
+        """
+        Check whether a Together API key is available.
+
+        Returns:
+            bool: True if an API key is set
+        """
+        return bool(self.api_key)
+
+    def generate(self, prompt, width, height, steps, n=1):
+        """
+        Generate images with one Together API call using a pooled client.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+            n (int): Number of images to generate
+
+        Returns:
+            list: List of generated PIL images
+        """
+        with self.client_pool.client() as client, span('api'):
+            response = client.images.generate(
+                prompt=prompt,
+                model=self.model,
+                width=width,
+                height=height,
+                steps=steps,
+                n=n,
+                response_format="b64_json",
+                stop=[]
+            )
+
+        return [decode_b64_image(item.b64_json) for item in response.data]
+
+    def close(self):
+        """
+        Close the pooled Together clients.
+        """
+        self.client_pool.close()
+
+class BackendHTTPError(Exception):
+    def __init__(self, status_code, message, headers=None):
+        """
+        Initialize an error for a non-2xx response from an images endpoint.
+
+        Args:
+            status_code (int): HTTP status code
+            message (str): Error message
+            headers (dict, optional): Response headers
+        """
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class HTTPBackend(GenerationBackend):
+    name = "http"
+
+    def __init__(self, model=TOGETHER_MODEL, base_url=GENERATION_BACKEND_URL, api_key=None, timeout=120):
+        """
+        Initialize a backend for any server speaking the Together images protocol,
+        such as the local stand-in server (standin_server.py).
+
+        Each thread keeps one persistent (keep-alive) connection to the server.
+
+        Args:
+            model (str): Model name sent to the server
+            base_url (str): Base URL of the API, e.g. http://127.0.0.1:8008/v1
+            api_key (str, optional): Bearer token sent with each request
+            timeout (float): Socket timeout in seconds
+        """
+        super().__init__(model)
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+
+        url = urlsplit(base_url)
+        self._scheme = url.scheme
+        self._netloc = url.netloc
+        self._path = url.path.rstrip("/") + "/images/generations"
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, width, height, steps, n=1):
+        """
+        Generate images with one POST to the server's images endpoint.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+            n (int): Number of images to generate
+
+        Returns:
+            list: List of generated PIL images
+        """
+        body = json.dumps({
+            'prompt': prompt,
+            'model': self.model,
+            'width': width,
+            'height': height,
+            'steps': steps,
+            'n': n,
+            'response_format': 'b64_json'
+        })
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        with span('api'):
+            status, response_headers, payload = self._post(body, headers)
+        if status >= 400:
+            raise BackendHTTPError(status, payload.decode("utf-8", "replace")[:200], response_headers)
+
+        data = json.loads(payload)
+        return [decode_b64_image(item['b64_json']) for item in data['data']]
+
+    def _post(self, body, headers):
+        """
+        Send a POST over this thread's persistent connection, reconnecting once
+        if the server closed it.
+
+        Args:
+            body (str): JSON request body
+            headers (dict): Request headers
+
+        Returns:
+            tuple: (status code, response headers, response body)
+        """
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", self._path, body=body, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+                return response.status, {k.lower(): v for k, v in response.getheaders()}, payload
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                with self._lock:
+                    if conn in self._connections:
+                        self._connections.remove(conn)
+                if attempt:
+                    raise
+
+    def _connection(self):
+        """
+        Get this thread's connection, opening it on first use.
+
+        Returns:
+            http.client.HTTPConnection: Persistent connection to the server
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._scheme == "https":
+                conn = http.client.HTTPSConnection(self._netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self._netloc, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Close all connections opened by this backend.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+
+        for conn in connections:
+            conn.close()
+
+# Available backends by name
+BACKENDS = {
+    TogetherBackend.name: TogetherBackend,
+    HTTPBackend.name: HTTPBackend
+}
+
+_shared_backends = {}
+_shared_backends_lock = threading.Lock()
+
+def get_backend(name=GENERATION_BACKEND):
+    """
+    Get the process-wide generation backend selected by name.
+
+    Args:
+        name (str): Backend name ("together" or "http")
+
+    Returns:
+        GenerationBackend: Shared backend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown generation backend: {name}")
+
+    with _shared_backends_lock:
+        if name not in _shared_backends:
+            _shared_backends[name] = BACKENDS[name]()
+
+        return _shared_backends[name]
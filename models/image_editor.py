@@ -1,6 +1,11 @@
 import numpy as np
-from PIL import Image, ImageEnhance, ImageOps
+from PIL import Image
 import cv2
+from models.animation import is_animated, process_frames
+from models.color_lut import apply_color_ops
+from models.compute_backends import get_compute_backends
+from models.preview import get_preview_source
+from models.segmentation import segment_foreground
 
 class ImageEditor:
     def __init__(self):
@@ -9,7 +14,7 @@ class ImageEditor:
         """
         pass
     
-    def crop(self, image, left, top, right, bottom):
+    def crop(self, image, left, top, right, bottom, preview_size=None):
         """
         Crop the image based on percentage values.
         
@@ -19,11 +24,20 @@ class ImageEditor:
             top (int): Top crop percentage (0-100)
             right (int): Right crop percentage (0-100)
             bottom (int): Bottom crop percentage (0-100)
+            preview_size (int, optional): When set, work on a cached proxy whose longest
+                side is at most this many pixels instead of the full image
             
         Returns:
             PIL.Image: Cropped image
         """
         try:
+            # Animations are edited frame by frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.crop(frame, left, top, right, bottom))
+            
+            # Previews run on the cached proxy
+            image, scale = get_preview_source(image, preview_size)
+            
             width, height = image.size
             
             # Convert percentages to pixel values
@@ -44,27 +58,37 @@ class ImageEditor:
             print(f"Error cropping image: {e}")
             return image
     
-    def rotate(self, image, angle):
+    def rotate(self, image, angle, preview_size=None):
         """
         Rotate the image by the specified angle.
         
         Args:
             image (PIL.Image): Input image
             angle (float): Rotation angle in degrees
+            preview_size (int, optional): When set, work on a cached proxy whose longest
+                side is at most this many pixels instead of the full image
             
         Returns:
             PIL.Image: Rotated image
         """
         try:
-            # Rotate the image
-            rotated_image = image.rotate(angle, expand=True, resample=Image.BICUBIC)
+            # Animations are edited frame by frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.rotate(frame, angle))
+            
+            # Previews run on the cached proxy
+            image, scale = get_preview_source(image, preview_size)
+            
+            # Rotate the image with the backend benchmarked fastest for its size
+            rotate, copies = get_compute_backends().get('rotate', image)
+            rotated_image = rotate(image, angle)
             
             return rotated_image
         except Exception as e:
             print(f"Error rotating image: {e}")
             return image
     
-    def resize(self, image, width, height):
+    def resize(self, image, width, height, preview_size=None):
         """
         Resize the image to the specified dimensions.
         
@@ -72,20 +96,33 @@ class ImageEditor:
             image (PIL.Image): Input image
             width (int): Target width
             height (int): Target height
+            preview_size (int, optional): When set, work on a cached proxy whose longest
+                side is at most this many pixels instead of the full image
             
         Returns:
             PIL.Image: Resized image
         """
         try:
-            # Resize the image
-            resized_image = image.resize((width, height), Image.LANCZOS)
+            # Animations are edited frame by frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.resize(frame, width, height))
+            
+            # Previews run on the cached proxy
+            image, scale = get_preview_source(image, preview_size)
+            
+            # Previews resize by the same relative amount
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+            
+            # Resize the image with the backend benchmarked fastest for its size
+            resize, copies = get_compute_backends().get('resize', image)
+            resized_image = resize(image, (width, height))
             
             return resized_image
         except Exception as e:
             print(f"Error resizing image: {e}")
             return image
     
-    def adjust_colors(self, image, brightness=1.0, contrast=1.0, saturation=1.0):
+    def adjust_colors(self, image, brightness=1.0, contrast=1.0, saturation=1.0, preview_size=None):
         """
         Adjust color properties of the image.
         
@@ -94,80 +131,86 @@ class ImageEditor:
             brightness (float): Brightness adjustment factor
             contrast (float): Contrast adjustment factor
             saturation (float): Saturation adjustment factor
+            preview_size (int, optional): When set, work on a cached proxy whose longest
+                side is at most this many pixels instead of the full image
             
         Returns:
             PIL.Image: Color-adjusted image
         """
         try:
-            # Adjust brightness
-            brightness_enhancer = ImageEnhance.Brightness(image)
-            img = brightness_enhancer.enhance(brightness)
+            # Animations are edited frame by frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.adjust_colors(frame, brightness, contrast, saturation))
             
-            # Adjust contrast
-            contrast_enhancer = ImageEnhance.Contrast(img)
-            img = contrast_enhancer.enhance(contrast)
+            # Previews run on the cached proxy
+            image, scale = get_preview_source(image, preview_size)
             
-            # Adjust saturation
-            saturation_enhancer = ImageEnhance.Color(img)
-            img = saturation_enhancer.enhance(saturation)
+            # Brightness, contrast and saturation compile into a single LUT pass
+            img = apply_color_ops(image, [
+                ('brightness', brightness),
+                ('contrast', contrast),
+                ('saturation', saturation)
+            ])
             
             return img
         except Exception as e:
             print(f"Error adjusting colors: {e}")
             return image
     
-    def remove_background(self, image):
+    def remove_background(self, image, feather=0, preset=None, preview_size=None, raise_errors=False):
         """
         Remove the background from the image.
         
         Args:
             image (PIL.Image): Input image
+            feather (float): Softness of the cut-out edge in pixels (0 for a hard edge)
+            preset (str, optional): Quality/speed preset from models.segmentation
+                (defaults to BACKGROUND_REMOVAL_PRESET)
+            preview_size (int, optional): When set, work on a cached proxy whose longest
+                side is at most this many pixels instead of the full image
+            raise_errors (bool): Raise errors instead of returning the input image
             
         Returns:
-            PIL.Image: Image with background removed
+            PIL.Image: RGBA image whose alpha channel is the foreground mask
         """
         try:
-            # Convert PIL image to OpenCV format
-            img_cv = np.array(image)
-            img_cv = cv2.cvtColor(img_cv, cv2.COLOR_RGB2BGR)
+            # Animations are edited frame by frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.remove_background(frame, feather, preset,
+                                                                                  raise_errors=raise_errors))
             
-            # Create a simple mask using GrabCut algorithm
-            mask = np.zeros(img_cv.shape[:2], np.uint8)
-            bgd_model = np.zeros((1, 65), np.float64)
-            fgd_model = np.zeros((1, 65), np.float64)
+            # Previews run on the cached proxy
+            image, scale = get_preview_source(image, preview_size)
             
-            # Define rectangle for initial segmentation
-            height, width = img_cv.shape[:2]
-            rect = (width//10, height//10, width*8//10, height*8//10)
-            
-            # Apply GrabCut
-            cv2.grabCut(img_cv, mask, rect, bgd_model, fgd_model, 5, cv2.GC_INIT_WITH_RECT)
+            # Convert PIL image to OpenCV format
+            rgb = np.array(image.convert("RGB"))
+            img_cv = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
             
-            # Create mask where sure and probable foreground are set to 1, else 0
-            mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+            # GrabCut from the central 80%, coarse to fine unless the preset says otherwise
+            mask = segment_foreground(img_cv, preset)
             
-            # Multiply image with the mask to keep foreground only
-            img_cv = img_cv * mask2[:, :, np.newaxis]
+            # Sure and probable foreground (1 and 3) have the low bit set; turn the
+            # mask into the alpha channel in place
+            alpha = np.bitwise_and(mask, 1, out=mask)
+            alpha *= 255
             
-            # Convert back to PIL
-            img_cv = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-            result = Image.fromarray(img_cv)
+            # Soften the edge; previews scale it with the proxy
+            if feather > 0:
+                alpha = cv2.GaussianBlur(alpha, (0, 0), sigmaX=feather * scale)
             
-            # Create a transparent background
-            result = result.convert("RGBA")
-            data = result.getdata()
+            # Keep any transparency the input already had
+            if 'A' in image.getbands():
+                np.minimum(alpha, np.asarray(image.getchannel('A')), out=alpha)
             
-            new_data = []
-            for item in data:
-                # Change all black (or near black) pixels to transparent
-                if item[0] < 5 and item[1] < 5 and item[2] < 5:
-                    new_data.append((0, 0, 0, 0))
-                else:
-                    new_data.append(item)
+            # Fully transparent pixels become (0, 0, 0, 0), so exports without alpha show black
+            rgb[alpha == 0] = 0
             
-            result.putdata(new_data)
+            result = Image.fromarray(rgb)
+            result.putalpha(Image.fromarray(alpha))
             
             return result
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error removing background: {e}")
             return image
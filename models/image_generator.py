@@ -1,22 +1,112 @@
 import os
 import numpy as np
 from PIL import Image
-import base64
-import io
-from together import Together
-import time
-from utils.config import TOGETHER_API_KEY, TOGETHER_MODEL
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import threading
+from models.generation_backend import get_backend
+from models.rate_limiter import get_rate_limiter
+from models.single_flight import SingleFlight
+from models.request_batcher import RequestBatcher, get_request_batcher
+from utils.image_cache import ImageCache
+from utils.timing import span
+from utils.config import (
+    GENERATION_MAX_IN_FLIGHT, GENERATION_BATCH_WINDOW_MS, GENERATION_CACHE_ENABLED,
+    GENERATION_CACHE_MEMORY_ITEMS, GENERATION_CACHE_DIR, GENERATION_CACHE_DISK_MB
+)
+
+@lru_cache(maxsize=8)
+def _placeholder_gradient(width, height):
+    """
+    Build the placeholder gradient for a given size.
+
+    The result is memoized per (width, height), so repeated fallbacks for the
+    same size cost a copy instead of a full render.
+
+    Args:
+        width (int): Width of the image
+        height (int): Height of the image
+
+    Returns:
+        PIL.Image: A placeholder image
+    """
+    # Integer broadcasting over the pixel grid instead of a per-pixel loop
+    x = np.arange(width, dtype=np.int64)[np.newaxis, :]
+    y = np.arange(height, dtype=np.int64)[:, np.newaxis]
+
+    array = np.empty((height, width, 3), dtype=np.uint8)
+    array[..., 0] = 255 * x // width
+    array[..., 1] = 255 * y // height
+    array[..., 2] = 255 * (x + y) // (width + height)
+
+    return Image.fromarray(array)
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+# Coalesces identical generation requests across all generators in the process
+_single_flight = SingleFlight()
+
+def get_generation_cache():
+    """
+    Get the process-wide generation result cache.
+
+    Returns:
+        ImageCache: Shared cache, or None if caching is disabled
+    """
+    global _shared_cache
+
+    if not GENERATION_CACHE_ENABLED:
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ImageCache(
+                memory_items=GENERATION_CACHE_MEMORY_ITEMS,
+                disk_dir=GENERATION_CACHE_DIR,
+                disk_max_bytes=GENERATION_CACHE_DISK_MB * 1024 * 1024
+            )
+
+        return _shared_cache
 
 class ImageGenerator:
-    def __init__(self):
+    def __init__(self, max_in_flight=GENERATION_MAX_IN_FLIGHT, backend=None, cache=None, rate_limiter=None, batcher=None):
         """
         Initialize the ImageGenerator class.
+
+        Args:
+            max_in_flight (int): Maximum number of concurrent API calls per request.
+                A value of 1 generates the images one after another.
+            backend (GenerationBackend, optional): Backend that serves generation requests.
+                Defaults to the backend selected by the GENERATION_BACKEND setting.
+            cache (ImageCache, optional): Generation result cache to use.
+                Defaults to the process-wide shared cache.
+            rate_limiter (RateLimiter, optional): Rate limiter for API calls.
+                Defaults to the process-wide shared limiter.
+            batcher (RequestBatcher, optional): Micro-batcher merging compatible requests.
+                Defaults to the process-wide batcher when GENERATION_BATCH_WINDOW_MS is set.
         """
-        pass
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.backend = backend if backend is not None else get_backend()
+        self.cache = cache if cache is not None else get_generation_cache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+
+        # Only a batcher created here is this generator's to shut down
+        self._owns_batcher = False
+        if batcher is not None:
+            self.batcher = batcher
+        elif backend is None and rate_limiter is None:
+            self.batcher = get_request_batcher()
+        elif GENERATION_BATCH_WINDOW_MS > 0:
+            self.batcher = RequestBatcher(self.backend, self.rate_limiter)
+            self._owns_batcher = True
+        else:
+            self.batcher = None
 
-    def generate(self, prompt, num_images=1, width=1024, height=768, steps=4, guidance_scale=7.5, seed=None):
+    def generate(self, prompt, num_images=1, width=1024, height=768, steps=4, guidance_scale=7.5, seed=None, use_cache=True):
         """
-        Generate images based on the provided prompt using the Together API.
+        Generate images based on the provided prompt using the configured backend.
 
         Args:
             prompt (str): Text prompt for image generation
@@ -24,21 +114,37 @@ class ImageGenerator:
             width (int): Width of the generated images
             height (int): Height of the generated images
             steps (int): Number of denoising steps
-            guidance_scale (float): Guidance scale for the model (not used by Together API)
-            seed (int, optional): Random seed for reproducibility (not used by Together API)
+            guidance_scale (float): Guidance scale for the model (not used by the backends)
+            seed (int, optional): Random seed for reproducibility (not used by the backends)
+            use_cache (bool): Serve and store results in the generation cache
 
         Returns:
             list: List of generated PIL images
         """
         try:
-            if TOGETHER_API_KEY:
-                return self._generate_with_together_api(
+            if self.backend.is_configured():
+                # Identical requests already in flight share one upstream call
+                key = ImageCache.make_key(
+                    self.backend.name, self.backend.model, prompt, width, height, steps, seed, num_images, use_cache
+                )
+                images, shared = _single_flight.do(
+                    key,
+                    self._generate_with_backend,
                     prompt=prompt,
                     num_images=num_images,
                     width=width,
                     height=height,
-                    steps=steps
+                    steps=steps,
+                    seed=seed,
+                    use_cache=use_cache
                 )
+
+                if shared:
+                    # Give each waiter its own copies of the decoded images
+                    print(f"Joined in-flight generation for: {prompt}")
+                    images = [image.copy() for image in images]
+
+                return images
             else:
                 print("No Together API key found. Please set the TOGETHER_API_KEY environment variable.")
                 # Return placeholder images if no API key is available
@@ -49,9 +155,9 @@ class ImageGenerator:
             # Return placeholder images for demonstration
             return [self._create_placeholder_image(width, height) for _ in range(num_images)]
 
-    def _generate_with_together_api(self, prompt, num_images=1, width=1024, height=768, steps=4):
+    def _generate_with_backend(self, prompt, num_images=1, width=1024, height=768, steps=4, seed=None, use_cache=True):
         """
-        Generate images using the Together API.
+        Generate images using the backend, serving cached results when available.
 
         Args:
             prompt (str): Text prompt for image generation
@@ -59,49 +165,118 @@ class ImageGenerator:
             width (int): Width of the generated images
             height (int): Height of the generated images
             steps (int): Number of denoising steps
+            seed (int, optional): Random seed, part of the cache key; without one
+                every request asks for new images, so the cache is skipped
+            use_cache (bool): Serve and store results in the generation cache
 
         Returns:
             list: List of generated PIL images
         """
         try:
-            print(f"Generating images with Together API: {prompt}")
+            cache = self.cache if use_cache and seed is not None else None
 
-            # Initialize the Together client
-            client = Together(api_key=TOGETHER_API_KEY)
+            # Look up each image slot separately so a request for fewer images
+            # can be served from an earlier, larger one
+            images = [None] * num_images
+            if cache is not None:
+                keys = [self._cache_key(prompt, width, height, steps, seed, i) for i in range(num_images)]
+                with span('cache_lookup'):
+                    images = [cache.get(key) for key in keys]
 
-            # Prepare the images list
-            images = []
-
-            # Generate the requested number of images
-            for i in range(num_images):
-                # Generate image with Together API
-                response = client.images.generate(
-                    prompt=prompt,
-                    model=TOGETHER_MODEL,
-                    width=width,
-                    height=height,
-                    steps=steps,
-                    n=1,
-                    response_format="b64_json",
-                    stop=[]
-                )
+            missing = [i for i, image in enumerate(images) if image is None]
+            if not missing:
+                print(f"Serving cached images for: {prompt}")
+                return images
 
-                # Decode and convert to PIL Image
-                image_data = base64.b64decode(response.data[0].b64_json)
-                image = Image.open(io.BytesIO(image_data))
-                images.append(image)
+            print(f"Generating images with {self.backend.name} backend: {prompt}")
+            generated = self._request_images(prompt, len(missing), width, height, steps)
 
-                # Add a small delay between requests to avoid rate limiting
-                if i < num_images - 1:
-                    time.sleep(0.5)
+            for i, image in zip(missing, generated):
+                images[i] = image
+                if cache is not None:
+                    with span('cache_store'):
+                        cache.put(keys[i], image)
 
             return images
 
         except Exception as e:
-            print(f"Error generating images with Together API: {e}")
+            print(f"Error generating images with {self.backend.name} backend: {e}")
             # Return placeholder images as fallback
             return [self._create_placeholder_image(width, height) for _ in range(num_images)]
 
+    def _cache_key(self, prompt, width, height, steps, seed, index):
+        """
+        Build the generation cache key for one image slot of a request.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated image
+            height (int): Height of the generated image
+            steps (int): Number of denoising steps
+            seed (int, optional): Random seed
+            index (int): Position of the image within the request
+
+        Returns:
+            str: Cache key
+        """
+        return ImageCache.make_key(self.backend.name, self.backend.model, prompt, width, height, steps, seed, index)
+
+    def _request_images(self, prompt, num_images, width, height, steps):
+        """
+        Request several images from the backend.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            num_images (int): Number of images to generate
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+
+        Returns:
+            list: List of generated PIL images
+        """
+        if self.batcher is not None:
+            # Submit in chunks the batcher can merge with other callers' requests
+            futures = []
+            for start in range(0, num_images, self.batcher.max_batch):
+                n = min(self.batcher.max_batch, num_images - start)
+                futures.append(self.batcher.submit(prompt, width, height, steps, n))
+
+            return [image for future in futures for image in future.result()]
+
+        # Generate the requested number of images, fanning out over a
+        # thread pool when more than one call may be in flight. Pacing is
+        # left to the shared rate limiter.
+        workers = min(self.max_in_flight, num_images)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Run each call in a copy of our context so its timing spans
+                # land in the caller's trace
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._request_image, prompt, width, height, steps)
+                    for _ in range(num_images)
+                ]
+                return [future.result() for future in futures]
+
+        return [self._request_image(prompt, width, height, steps) for _ in range(num_images)]
+
+    def _request_image(self, prompt, width, height, steps):
+        """
+        Request a single image from the backend.
+
+        The call goes through the shared rate limiter, which retries it on 429 responses.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated image
+            height (int): Height of the generated image
+            steps (int): Number of denoising steps
+
+        Returns:
+            PIL.Image: Generated image
+        """
+        return self.rate_limiter.call(self.backend.generate, prompt, width, height, steps, n=1)[0]
+
     def _create_placeholder_image(self, width, height):
         """
         Create a placeholder image for demonstration purposes.
@@ -113,18 +288,19 @@ class ImageGenerator:
         Returns:
             PIL.Image: A placeholder image
         """
-        # Create a gradient image as a placeholder
-        array = np.zeros((height, width, 3), dtype=np.uint8)
+        # Copy the cached gradient so callers are free to modify their image
+        return _placeholder_gradient(width, height).copy()
 
-        # Create a gradient effect
-        for y in range(height):
-            for x in range(width):
-                r = int(255 * (x / width))
-                g = int(255 * (y / height))
-                b = int(255 * ((x + y) / (width + height)))
-                array[y, x] = [r, g, b]
+    def close(self):
+        """
+        Close the backend's connections, and stop the batcher's threads if this
+        generator created its batcher.
 
-        return Image.fromarray(array)
+        Call this on shutdown; the shared Together client pool is also closed at interpreter exit.
+        """
+        if self._owns_batcher:
+            self.batcher.close()
+        self.backend.close()
 
     def save_image(self, image, image_path):
         """
@@ -0,0 +1,386 @@
+import math
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw
+from models.animation import is_animated, process_frames
+from models.color_lut import apply_color_ops
+from models.image_editor import ImageEditor
+from models.image_filter import ImageFilter
+from models.preview import get_preview_source
+
+# Filters that are pure point-wise color operations, as color_lut steps
+COLOR_FILTERS = {
+    'Sepia': lambda intensity: [('sepia', intensity)],
+    'Grayscale': lambda intensity: [('grayscale', intensity)],
+    'Vintage': lambda intensity: [('sepia', intensity), ('contrast', 0.8), ('brightness', 0.9)]
+}
+
+# Operations that change pixel positions and can share one resample
+GEOMETRIC_OPS = ('crop', 'rotate', 'resize')
+
+# Stage kinds that absorb adjacent operations of the same kind
+FUSED_STAGES = ('color', 'geometry')
+
+# Lossless transposes, as functions of the source size returning the matrix that
+# maps source coordinates to transposed coordinates
+TRANSPOSES = {
+    Image.Transpose.ROTATE_90: lambda w, h: np.array([[0.0, 1.0, 0.0], [-1.0, 0.0, w], [0.0, 0.0, 1.0]]),
+    Image.Transpose.ROTATE_180: lambda w, h: np.array([[-1.0, 0.0, w], [0.0, -1.0, h], [0.0, 0.0, 1.0]]),
+    Image.Transpose.ROTATE_270: lambda w, h: np.array([[0.0, -1.0, h], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]),
+    Image.Transpose.FLIP_LEFT_RIGHT: lambda w, h: np.array([[-1.0, 0.0, w], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]),
+    Image.Transpose.FLIP_TOP_BOTTOM: lambda w, h: np.array([[1.0, 0.0, 0.0], [0.0, -1.0, h], [0.0, 0.0, 1.0]]),
+    Image.Transpose.TRANSPOSE: lambda w, h: np.array([[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]),
+    Image.Transpose.TRANSVERSE: lambda w, h: np.array([[0.0, -1.0, h], [-1.0, 0.0, w], [0.0, 0.0, 1.0]])
+}
+
+class ImagePipeline:
+    def __init__(self, image_filter=None, image_editor=None):
+        """
+        Initialize a pipeline that runs a list of filter and edit operations
+        with as few full-resolution passes as possible.
+
+        Operations are dicts with a 'type' key plus the arguments of the
+        matching ImageFilter / ImageEditor method:
+            {'type': 'filter', 'filter_type': 'Vintage', 'intensity': 0.5}
+            {'type': 'adjust_colors', 'brightness': 1.2, 'contrast': 1.0, 'saturation': 1.1}
+            {'type': 'crop', 'left': 10, 'top': 10, 'right': 90, 'bottom': 90}
+            {'type': 'rotate', 'angle': 45}
+            {'type': 'resize', 'width': 512, 'height': 384}
+            {'type': 'remove_background', 'feather': 2}
+
+        Adjacent color operations are compiled into one LUT pass and adjacent
+        crop / rotate / resize operations into one resample. The order of the
+        operations is kept, so the result matches running them one by one up to
+        interpolation differences.
+
+        Args:
+            image_filter (ImageFilter, optional): Filter used for blur, sharpen and vignettes
+            image_editor (ImageEditor, optional): Editor used for background removal
+        """
+        self.image_filter = image_filter if image_filter is not None else ImageFilter()
+        self.image_editor = image_editor if image_editor is not None else ImageEditor()
+
+    def plan(self, operations):
+        """
+        Group operations into fused stages.
+
+        Args:
+            operations (list): Operation dicts, in order
+
+        Returns:
+            list: Stages, each (kind, payload), where kind is 'color', 'vignette',
+                'geometry', 'filter' or 'edit'
+        """
+        stages = []
+
+        def add(kind, item):
+            # Extend the previous stage if it is of the same fusable kind
+            if stages and stages[-1][0] == kind and kind in FUSED_STAGES:
+                stages[-1][1].extend(item)
+            else:
+                stages.append((kind, list(item) if kind in FUSED_STAGES else item))
+
+        for operation in operations:
+            op_type = operation.get('type')
+
+            if op_type == 'filter':
+                filter_type = operation.get('filter_type')
+                intensity = float(operation.get('intensity', 0.5))
+
+                if filter_type in COLOR_FILTERS:
+                    add('color', COLOR_FILTERS[filter_type](intensity))
+                    if filter_type == 'Vintage':
+                        add('vignette', intensity)
+                elif filter_type in ('Blur', 'Sharpen'):
+                    add('filter', (filter_type, intensity))
+                elif filter_type not in (None, 'None'):
+                    raise ValueError(f"Unknown filter: {filter_type}")
+            elif op_type == 'adjust_colors':
+                add('color', [
+                    ('brightness', operation.get('brightness', 1.0)),
+                    ('contrast', operation.get('contrast', 1.0)),
+                    ('saturation', operation.get('saturation', 1.0))
+                ])
+            elif op_type in GEOMETRIC_OPS:
+                add('geometry', [operation])
+            elif op_type == 'remove_background':
+                add('edit', operation)
+            else:
+                raise ValueError(f"Unknown operation: {op_type}")
+
+        return stages
+
+    def run(self, image, operations, preview_size=None, raise_errors=False):
+        """
+        Run a list of operations on an image.
+
+        Args:
+            image (PIL.Image): Input image, left unmodified
+            operations (list): Operation dicts, in order
+            preview_size (int, optional): When set, run the chain on a cached proxy whose
+                longest side is at most this many pixels instead of the full image
+            raise_errors (bool): Raise errors instead of returning the input image,
+                e.g. when the caller reports failures
+
+        Returns:
+            PIL.Image: Processed image
+        """
+        try:
+            # Animations run the whole chain on each frame; previews show the first frame only
+            if is_animated(image) and not preview_size:
+                return process_frames(image, lambda frame: self.run(frame, operations, raise_errors=raise_errors))
+
+            # Previews run on the cached proxy, with pixel sizes scaled to match
+            image, scale = get_preview_source(image, preview_size)
+            if scale != 1.0:
+                operations = [_scale_operation(operation, scale) for operation in operations]
+
+            result = image
+            for kind, payload in self.plan(operations):
+                if kind == 'color':
+                    result = apply_color_ops(result, payload)
+                elif kind == 'vignette':
+                    # Vignettes darken in place, so never touch the caller's image
+                    if result is image:
+                        result = result.copy()
+                    if result.mode not in ('RGB', 'RGBA'):
+                        result = result.convert('RGB')
+                    result = self.image_filter.apply_vignette(result, payload)
+                elif kind == 'geometry':
+                    result = self._resample(result, payload)
+                elif kind == 'edit':
+                    result = self.image_editor.remove_background(
+                        result, payload.get('feather', 0) * scale, payload.get('preset'), raise_errors=True)
+                else:
+                    filter_type, intensity = payload
+                    if filter_type == 'Blur':
+                        # The blur radius is in full-resolution pixels
+                        result = self.image_filter.blur_filter(result, intensity, scale)
+                    else:
+                        result = self.image_filter.apply_filter(result, filter_type, intensity, raise_errors=True)
+
+            return result.copy() if result is image else result
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error running image pipeline: {e}")
+            return image
+
+    def _resample(self, image, operations):
+        """
+        Run consecutive crop / rotate / resize operations as one resample.
+
+        Args:
+            image (PIL.Image): Input image
+            operations (list): Geometric operation dicts
+
+        Returns:
+            PIL.Image: Transformed image
+        """
+        clips = []
+        size, matrix = compose_geometry(image.size, operations, clips)
+        result = self._resample_matrix(image, size, matrix)
+
+        # Pixels a crop removed stay removed (black) when a later rotation brings
+        # them back into view
+        mask = _clip_mask(size, matrix, clips)
+        if mask is not None:
+            result = Image.composite(result, Image.new(result.mode, size), mask)
+
+        return result
+
+    def _resample_matrix(self, image, size, matrix):
+        """
+        Resample an image through an output-to-input matrix.
+
+        Args:
+            image (PIL.Image): Input image
+            size (tuple): Output size (width, height)
+            matrix (numpy.ndarray): 3x3 output-to-input matrix
+
+        Returns:
+            PIL.Image: Transformed image; samples outside the input are black
+        """
+        width, height = size
+
+        # Quarter turns and flips are lossless; do them first so the rest is a crop / resize
+        if not _is_axis_aligned(matrix):
+            for method, to_transposed in TRANSPOSES.items():
+                candidate = to_transposed(*image.size) @ matrix
+                if _is_axis_aligned(candidate):
+                    image, matrix = image.transpose(method), candidate
+                    break
+
+        linear = matrix[:2, :2]
+        if _is_axis_aligned(matrix):
+            # A crop box in source coordinates, scaled or not
+            box = (matrix[0, 2], matrix[1, 2],
+                   matrix[0, 2] + linear[0, 0] * width, matrix[1, 2] + linear[1, 1] * height)
+            if np.allclose(np.diag(linear), 1.0):
+                # Crop pads boxes reaching past the image with black
+                return image.crop(tuple(int(round(v)) for v in box))
+
+            # resize() only accepts boxes inside the image; rotations that add up to a
+            # quarter turn expand the canvas past it, so those take the affine path
+            eps = 1e-6
+            if box[0] >= -eps and box[1] >= -eps and box[2] <= image.width + eps and box[3] <= image.height + eps:
+                return image.resize(size, Image.LANCZOS, box=box)
+
+        # Bicubic sampling does not filter, so shrink by whole factors first
+        factor = int(math.sqrt(abs(np.linalg.det(linear))))
+        if factor >= 2:
+            image = image.reduce(factor)
+            matrix = np.diag([1.0 / factor, 1.0 / factor, 1.0]) @ matrix
+
+        return image.transform(size, Image.AFFINE, tuple(matrix[:2].ravel()), resample=Image.BICUBIC)
+
+def _scale_operation(operation, scale):
+    """
+    Scale the pixel sizes of an operation for a chain running on a proxy.
+
+    Args:
+        operation (dict): Operation dict
+        scale (float): Size of the proxy relative to the full-resolution image
+
+    Returns:
+        dict: The operation, or a scaled copy of it
+    """
+    if operation.get('type') != 'resize':
+        return operation
+
+    return dict(operation,
+                width=max(1, round(int(operation['width']) * scale)),
+                height=max(1, round(int(operation['height']) * scale)))
+
+def _is_axis_aligned(matrix):
+    """
+    Check whether an output-to-input matrix only scales and translates.
+
+    Args:
+        matrix (numpy.ndarray): 3x3 matrix
+
+    Returns:
+        bool: True if there is no rotation, shear or flip
+    """
+    return (abs(matrix[0, 1]) < 1e-12 and abs(matrix[1, 0]) < 1e-12
+            and matrix[0, 0] > 0 and matrix[1, 1] > 0)
+
+def rotation_matrix(size, angle):
+    """
+    Build the output-to-input matrix and output size of an expanding rotation,
+    following PIL's Image.rotate.
+
+    Args:
+        size (tuple): Input size (width, height)
+        angle (float): Counter-clockwise angle in degrees
+
+    Returns:
+        tuple: (3x3 numpy matrix, output size)
+    """
+    w, h = size
+    center_x, center_y = w / 2, h / 2
+
+    angle = -math.radians(angle)
+    cos_a, sin_a = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    matrix = np.array([
+        [cos_a, sin_a, 0.0],
+        [-sin_a, cos_a, 0.0],
+        [0.0, 0.0, 1.0]
+    ])
+
+    # Rotate about the center
+    matrix[:2, 2] = matrix[:2, :2] @ [-center_x, -center_y] + [center_x, center_y]
+
+    # Expand the canvas to the rotated bounding box
+    corners = matrix @ np.array([[0, w, w, 0], [0, 0, h, h], [1, 1, 1, 1]])
+    nw = math.ceil(corners[0].max()) - math.floor(corners[0].min())
+    nh = math.ceil(corners[1].max()) - math.floor(corners[1].min())
+    matrix[:2, 2] = matrix[:2, :2] @ [-(nw - w) / 2.0, -(nh - h) / 2.0] + matrix[:2, 2]
+
+    return matrix, (nw, nh)
+
+def _clip_mask(size, matrix, clips):
+    """
+    Build the mask of output pixels that lie inside every crop of a chain.
+
+    Args:
+        size (tuple): Output size (width, height)
+        matrix (numpy.ndarray): Output-to-input matrix of the chain
+        clips (list): (matrix, size) of each crop, from compose_geometry
+
+    Returns:
+        PIL.Image: 'L' mask, 255 inside, or None if no crop cuts into the output
+    """
+    width, height = size
+    output_corners = np.array([[0, width, width, 0], [0, 0, height, height], [1, 1, 1, 1]], dtype=float)
+    to_output = np.linalg.inv(matrix)
+
+    mask = None
+    for clip_matrix, (clip_width, clip_height) in clips:
+        # Output corners inside the crop box mean the crop covers the whole output
+        corners = np.linalg.solve(clip_matrix, matrix @ output_corners)
+        if (corners[0].min() >= -1e-6 and corners[1].min() >= -1e-6
+                and corners[0].max() <= clip_width + 1e-6 and corners[1].max() <= clip_height + 1e-6):
+            continue
+
+        box = np.array([[0, clip_width, clip_width, 0], [0, 0, clip_height, clip_height], [1, 1, 1, 1]], dtype=float)
+        polygon = to_output @ clip_matrix @ box
+
+        clip_mask = Image.new('L', size, 0)
+        ImageDraw.Draw(clip_mask).polygon([(x, y) for x, y in zip(polygon[0], polygon[1])], fill=255)
+        mask = clip_mask if mask is None else ImageChops.darker(mask, clip_mask)
+
+    return mask
+
+def compose_geometry(size, operations, clips=None):
+    """
+    Compose crop / rotate / resize operations into one output-to-input matrix.
+
+    Crop percentages and resize targets refer to the size of the image at
+    that point of the chain, like running ImageEditor methods one by one.
+
+    Args:
+        size (tuple): Input size (width, height)
+        operations (list): Geometric operation dicts
+        clips (list, optional): Receives (matrix, size) for each crop: the matrix
+            from the cropped image's coordinates to input coordinates, and its size
+
+    Returns:
+        tuple: (output size, 3x3 numpy matrix)
+    """
+    matrix = np.eye(3)
+
+    for operation in operations:
+        width, height = size
+        op_type = operation['type']
+
+        if op_type == 'crop':
+            left = int(width * operation.get('left', 0) / 100)
+            top = int(height * operation.get('top', 0) / 100)
+            right = int(width * operation.get('right', 100) / 100)
+            bottom = int(height * operation.get('bottom', 100) / 100)
+
+            # Invalid boxes leave the image unchanged, like ImageEditor.crop
+            if left >= right or top >= bottom:
+                continue
+
+            step = np.array([[1.0, 0.0, left], [0.0, 1.0, top], [0.0, 0.0, 1.0]])
+            size = (right - left, bottom - top)
+        elif op_type == 'rotate':
+            angle = float(operation.get('angle', 0))
+            if angle % 360 == 0:
+                continue
+
+            step, size = rotation_matrix(size, angle)
+        else:
+            new_size = (int(operation['width']), int(operation['height']))
+            if new_size == size:
+                continue
+
+            step = np.diag([width / new_size[0], height / new_size[1], 1.0])
+            size = new_size
+
+        matrix = matrix @ step
+        if op_type == 'crop' and clips is not None:
+            clips.append((matrix, size))
+
+    return size, matrix
@@ -0,0 +1,696 @@
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+from utils.config import JOB_WORKERS, JOB_MAX_PENDING, JOB_RETENTION_SECONDS, JOB_LEASE_SECONDS
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class MemoryJobStore:
+    def __init__(self, retention=JOB_RETENTION_SECONDS):
+        """
+        Initialize an in-process job store.
+
+        Args:
+            retention (float): Seconds to keep finished jobs before pruning them
+        """
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pending = queue.Queue()
+
+    def add(self, job_id, params):
+        """
+        Add a queued job.
+
+        Args:
+            job_id (str): Job ID
+            params (dict): JSON-serializable job parameters
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': QUEUED,
+                'params': params,
+                'images': [],
+                'result': None,
+                'error': None,
+                'cancel_requested': False,
+                'locked_in': False,
+                'created_at': now,
+                'updated_at': now
+            }
+        self._pending.put(job_id)
+
+    def claim(self, timeout=0.5):
+        """
+        Take the oldest queued job and mark it as running.
+
+        Args:
+            timeout (float): Seconds to wait for a job
+
+        Returns:
+            tuple: (job_id, params), or None if no job became available
+        """
+        try:
+            job_id = self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != QUEUED:
+                return None
+
+            job['status'] = RUNNING
+            job['updated_at'] = time.time()
+            return job_id, job['params']
+
+    def get(self, job_id):
+        """
+        Get a snapshot of a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            dict: Job record, or None if the job does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+
+            job = dict(job)
+            job['images'] = list(job['images'])
+            return job
+
+    def add_image(self, job_id, image):
+        """
+        Record one finished image of a running job.
+
+        Args:
+            job_id (str): Job ID
+            image (str): Image URL
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['images'].append(image)
+                job['updated_at'] = time.time()
+
+    def finish(self, job_id, status, result=None, error=None):
+        """
+        Mark a job as finished.
+
+        Args:
+            job_id (str): Job ID
+            status (str): Final status
+            result (dict, optional): Job result
+            error (str, optional): Error message
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['status'] = status
+                job['result'] = result
+                job['error'] = error
+                job['updated_at'] = time.time()
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job, or ask a running job to stop.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job exists, had not finished yet and was not locked in
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATES or job['locked_in']:
+                return False
+
+            if job['status'] == QUEUED:
+                job['status'] = CANCELLED
+            job['cancel_requested'] = True
+            job['updated_at'] = time.time()
+            return True
+
+    def lock_in(self, job_id):
+        """
+        Mark a running job as past the point where it can be cancelled.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: False if cancellation was already requested
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['cancel_requested']:
+                return False
+
+            job['locked_in'] = True
+            return True
+
+    def cancel_requested(self, job_id):
+        """
+        Check whether cancellation was requested for a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job should stop
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job is None or job['cancel_requested']
+
+    def renew(self, job_ids):
+        """
+        Extend the claim on running jobs. Jobs of an in-process store cannot
+        outlive their worker, so there is nothing to extend.
+
+        Args:
+            job_ids (list): IDs of jobs the caller is running
+        """
+
+    def pending_count(self):
+        """
+        Get the number of queued and running jobs.
+
+        Returns:
+            int: Number of unfinished jobs
+        """
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] not in FINISHED_STATES)
+
+    def _prune(self, now):
+        """
+        Drop finished jobs older than the retention period. Caller must hold the lock.
+
+        Args:
+            now (float): Current time
+        """
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in FINISHED_STATES and now - job['updated_at'] > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+class SQLiteJobStore:
+    def __init__(self, path, retention=JOB_RETENTION_SECONDS, poll_interval=0.2, lease=JOB_LEASE_SECONDS):
+        """
+        Initialize a job store backed by a SQLite database.
+
+        Several processes pointing at the same database share one queue; each
+        job is claimed by exactly one worker. A claim is a lease that the
+        worker's queue keeps renewing. When a process dies with jobs running,
+        their leases run out and the next claim requeues them, or fails them
+        if they were locked in and may have been charged already.
+
+        Args:
+            path (str): Path to the SQLite database file
+            retention (float): Seconds to keep finished jobs before pruning them
+            poll_interval (float): Seconds between polls for new jobs
+            lease (float): Seconds a claim lasts without being renewed
+        """
+        self.path = path
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.lease = max(1.0, float(lease))
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, "
+                "images TEXT NOT NULL, result TEXT, error TEXT, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, locked_in INTEGER NOT NULL DEFAULT 0, "
+                "lease_until REAL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self):
+        """
+        Open a new autocommit connection to the database, closed when the with-block exits.
+
+        Returns:
+            contextlib.closing: Context manager yielding a sqlite3.Connection
+        """
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def add(self, job_id, params):
+        """
+        Add a queued job.
+
+        Args:
+            job_id (str): Job ID
+            params (dict): JSON-serializable job parameters
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                FINISHED_STATES + (now - self.retention,)
+            )
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, images, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), "[]", now, now)
+            )
+
+    def claim(self, timeout=0.5):
+        """
+        Take the oldest queued job and mark it as running.
+
+        Args:
+            timeout (float): Seconds to wait for a job
+
+        Returns:
+            tuple: (job_id, params), or None if no job became available
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._connect() as conn:
+                # BEGIN IMMEDIATE serializes claims across processes
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    self._expire_leases(conn, now)
+
+                    row = conn.execute(
+                        "SELECT id, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                        (QUEUED,)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                            (RUNNING, now + self.lease, now, row[0])
+                        )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            if row is not None:
+                return row[0], json.loads(row[1])
+
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _expire_leases(self, conn, now):
+        """
+        Take back running jobs whose lease ran out. Caller holds a write transaction.
+
+        Jobs that had not been locked in are queued again (or cancelled, if that
+        was requested); locked-in jobs may already have been charged, so they fail.
+
+        Args:
+            conn (sqlite3.Connection): Connection in a write transaction
+            now (float): Current time
+        """
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+            "WHERE status = ? AND locked_in = 1 AND lease_until < ?",
+            (FAILED, "Job worker stopped", now, RUNNING, now)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested = 1 THEN ? ELSE ? END, "
+            "lease_until = NULL, updated_at = ? WHERE status = ? AND lease_until < ?",
+            (CANCELLED, QUEUED, now, RUNNING, now)
+        )
+
+    def renew(self, job_ids):
+        """
+        Extend the lease on running jobs.
+
+        Args:
+            job_ids (list): IDs of jobs the caller is running
+        """
+        if not job_ids:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE status = ? AND id IN ({', '.join('?' * len(job_ids))})",
+                (now + self.lease, RUNNING, *job_ids)
+            )
+
+    def get(self, job_id):
+        """
+        Get a snapshot of a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            dict: Job record, or None if the job does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, params, images, result, error, cancel_requested, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'id': row[0],
+            'status': row[1],
+            'params': json.loads(row[2]),
+            'images': json.loads(row[3]),
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'cancel_requested': bool(row[6]),
+            'created_at': row[7],
+            'updated_at': row[8]
+        }
+
+    def add_image(self, job_id, image):
+        """
+        Record one finished image of a running job.
+
+        Args:
+            job_id (str): Job ID
+            image (str): Image URL
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET images = json_insert(images, '$[#]', ?), updated_at = ? WHERE id = ?",
+                (image, time.time(), job_id)
+            )
+
+    def finish(self, job_id, status, result=None, error=None):
+        """
+        Mark a job as finished.
+
+        Args:
+            job_id (str): Job ID
+            status (str): Final status
+            result (dict, optional): Job result
+            error (str, optional): Error message
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job, or ask a running job to stop.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job exists, had not finished yet and was not locked in
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN status = ? THEN ? ELSE status END, "
+                "cancel_requested = 1, updated_at = ? WHERE id = ? AND status IN (?, ?) AND locked_in = 0",
+                (QUEUED, CANCELLED, now, job_id, QUEUED, RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def lock_in(self, job_id):
+        """
+        Mark a running job as past the point where it can be cancelled.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: False if cancellation was already requested
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET locked_in = 1 WHERE id = ? AND cancel_requested = 0",
+                (job_id,)
+            )
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_id):
+        """
+        Check whether cancellation was requested for a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job should stop
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def pending_count(self):
+        """
+        Get the number of queued and running jobs.
+
+        Returns:
+            int: Number of unfinished jobs
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()
+        return row[0]
+
+class Job:
+    def __init__(self, store, job_id):
+        """
+        Initialize the handle a job handler uses to report progress.
+
+        Args:
+            store: Job store holding the job
+            job_id (str): Job ID
+        """
+        self.store = store
+        self.id = job_id
+
+    def cancelled(self):
+        """
+        Check whether the job has been asked to stop.
+
+        Returns:
+            bool: True if the handler should stop early
+        """
+        return self.store.cancel_requested(self.id)
+
+    def lock_in(self):
+        """
+        Stop accepting cancellation, e.g. before work that is charged for.
+
+        Returns:
+            bool: False if the job was cancelled before it could be locked in;
+                the handler should stop then
+        """
+        return self.store.lock_in(self.id)
+
+    def add_image(self, image):
+        """
+        Publish one finished image before the whole job completes.
+
+        Args:
+            image (str): Image URL
+        """
+        self.store.add_image(self.id, image)
+
+class JobQueue:
+    def __init__(self, handler, store=None, num_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING):
+        """
+        Initialize a job queue executed by a bounded pool of worker threads.
+
+        The threads start with the first submitted job, or with start(). Merely
+        importing a module that creates a queue (as spawned worker processes do
+        with the main script) starts nothing.
+
+        Args:
+            handler (callable): Called as handler(params, job) for each job; returns a
+                JSON-serializable result or raises on failure
+            store: Job store (MemoryJobStore or SQLiteJobStore). Defaults to an in-process store.
+            num_workers (int): Number of worker threads in this process
+            max_pending (int): Maximum number of queued and running jobs
+        """
+        self.handler = handler
+        self.store = store if store is not None else MemoryJobStore()
+        self.num_workers = max(1, int(num_workers))
+        self.max_pending = max(1, int(max_pending))
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers = []
+        self._running = set()
+
+    def submit(self, params):
+        """
+        Enqueue a job.
+
+        Args:
+            params (dict): JSON-serializable job parameters
+
+        Returns:
+            str: Job ID, or None if the queue is full
+        """
+        self.start()
+
+        if self.store.pending_count() >= self.max_pending:
+            return None
+
+        job_id = str(uuid.uuid4())
+        self.store.add(job_id, params)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Get the public view of a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            dict: Job status, partial images, result and error, or None if not found
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'images': job['images'],
+            'result': job['result'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at']
+        }
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job was queued, or running and not locked in yet
+        """
+        return self.store.cancel(job_id)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker threads after their current job.
+
+        Args:
+            wait (bool): Block until the workers have exited
+        """
+        self._stop.set()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def start(self):
+        """
+        Start the worker threads, if they are not running yet.
+
+        Call this in server processes that share a store with others, so they
+        run jobs before submitting any themselves.
+        """
+        with self._lock:
+            if self._workers:
+                return
+
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+            lease = getattr(self.store, 'lease', None)
+            if lease:
+                renewer = threading.Thread(target=self._renew, args=(lease / 3,), name="job-lease-renewer", daemon=True)
+                renewer.start()
+                self._workers.append(renewer)
+
+    def _renew(self, interval):
+        """
+        Renewer loop: keep extending the leases of the jobs this queue is running.
+
+        Args:
+            interval (float): Seconds between renewals
+        """
+        while not self._stop.wait(interval):
+            with self._lock:
+                job_ids = list(self._running)
+            try:
+                self.store.renew(job_ids)
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    def _work(self):
+        """
+        Worker loop: claim jobs and run the handler until shutdown.
+        """
+        while not self._stop.is_set():
+            try:
+                claimed = self.store.claim()
+            except Exception as e:
+                print(f"Error claiming job: {e}")
+                time.sleep(1)
+                continue
+
+            if claimed is None:
+                continue
+
+            job_id, params = claimed
+            job = Job(self.store, job_id)
+
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self._run_job(job, params)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _run_job(self, job, params):
+        """
+        Run the handler for a claimed job and record the outcome.
+
+        Args:
+            job (Job): Claimed job
+            params (dict): Job parameters
+        """
+        try:
+            result = self.handler(params, job)
+        except Exception as e:
+            if job.cancelled():
+                self.store.finish(job.id, CANCELLED)
+            else:
+                print(f"Error running job {job.id}: {e}")
+                self.store.finish(job.id, FAILED, error=str(e))
+            return
+
+        status = CANCELLED if job.cancelled() else SUCCEEDED
+        self.store.finish(job.id, status, result=result)
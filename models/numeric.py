@@ -0,0 +1,80 @@
+import numpy as np
+
+# Working dtype of NumPy image math: float32 carries far more precision than the
+# final rounding to 8 bits needs, at half the memory of float64
+WORK_DTYPE = np.float32
+
+def to_work(array, out=None):
+    """
+    Convert 8-bit pixels to the working dtype.
+
+    Args:
+        array (numpy.ndarray): uint8 pixels
+        out (numpy.ndarray, optional): Preallocated WORK_DTYPE buffer of the same shape
+
+    Returns:
+        numpy.ndarray: WORK_DTYPE copy of the pixels
+    """
+    if out is None:
+        return np.array(array, dtype=WORK_DTYPE)
+
+    np.copyto(out, array, casting='unsafe')
+    return out
+
+def round_clip(work):
+    """
+    Round working values to whole levels and clamp them to 0-255, in place.
+
+    Args:
+        work (numpy.ndarray): WORK_DTYPE values
+
+    Returns:
+        numpy.ndarray: The same array
+    """
+    np.rint(work, out=work)
+    np.clip(work, 0, 255, out=work)
+    return work
+
+def to_uint8(work, out=None):
+    """
+    Convert working values back to 8-bit pixels, rounding and clamping in place.
+
+    Args:
+        work (numpy.ndarray): WORK_DTYPE values; overwritten
+        out (numpy.ndarray, optional): Preallocated uint8 buffer of the same shape
+
+    Returns:
+        numpy.ndarray: uint8 pixels
+    """
+    round_clip(work)
+
+    if out is None:
+        return work.astype(np.uint8)
+
+    np.copyto(out, work, casting='unsafe')
+    return out
+
+def lerp(a, b, t):
+    """
+    Blend a towards b by t in place: a + (b - a) * t.
+
+    Args:
+        a (numpy.ndarray): WORK_DTYPE values; receives the result
+        b (numpy.ndarray): WORK_DTYPE values, broadcastable to a; used as scratch
+            space and overwritten unless it has to be broadcast
+        t (float): Blend factor
+
+    Returns:
+        numpy.ndarray: a
+    """
+    if b.shape == a.shape:
+        b -= a
+        b *= t
+        a += b
+    else:
+        # Blend the other way around so the larger array needs no scratch copy
+        a -= b
+        a *= 1.0 - t
+        a += b
+
+    return a
@@ -0,0 +1,148 @@
+import weakref
+import threading
+from collections import OrderedDict
+from PIL import Image
+from utils.config import PREVIEW_MAX_SIZE, PREVIEW_CACHE_ITEMS
+
+class ProxyCache:
+    def __init__(self, max_items=PREVIEW_CACHE_ITEMS):
+        """
+        Initialize an LRU cache of downscaled preview proxies.
+
+        Proxies are what interactive previews run on: a filter or edit on a
+        512 px proxy costs a fraction of the same work on the full image.
+
+        Args:
+            max_items (int): Maximum number of proxies kept
+        """
+        self.max_items = max(1, int(max_items))
+
+        self._lock = threading.Lock()
+        self._proxies = OrderedDict()
+
+    def get(self, image, max_size=PREVIEW_MAX_SIZE, key=None):
+        """
+        Get the proxy of an image, creating it on first use.
+
+        Args:
+            image (PIL.Image): Full-resolution image
+            max_size (int): Longest side of the proxy in pixels
+            key (hashable, optional): Identifies the image content, e.g. its path
+                and modification time. Defaults to the image object itself.
+
+        Returns:
+            tuple: (proxy PIL image, proxy-to-full scale factor)
+        """
+        if key is None:
+            # Keyed on the object; the weak reference guards against reused ids
+            ref = weakref.ref(image)
+            return self._get(('object', id(image)), max_size, lambda: image, ref)
+
+        return self._get(key, max_size, lambda: image, None)
+
+    def get_or_load(self, key, max_size, load):
+        """
+        Get the proxy for a key, loading the full image only on a miss.
+
+        Args:
+            key (hashable): Identifies the image content
+            max_size (int): Longest side of the proxy in pixels
+            load (callable): Returns the full-resolution image
+
+        Returns:
+            tuple: (proxy PIL image, proxy-to-full scale factor)
+        """
+        return self._get(key, max_size, load, None)
+
+    def clear(self):
+        """
+        Drop all proxies.
+        """
+        with self._lock:
+            self._proxies.clear()
+
+    def _get(self, key, max_size, load, ref):
+        """
+        Look up or build a proxy.
+
+        Args:
+            key (hashable): Cache key of the image
+            max_size (int): Longest side of the proxy in pixels
+            load (callable): Returns the full-resolution image
+            ref (weakref.ref, optional): Reference the cached entry must match
+
+        Returns:
+            tuple: (proxy PIL image, proxy-to-full scale factor)
+        """
+        key = (key, max_size)
+
+        with self._lock:
+            entry = self._proxies.get(key)
+            if entry is not None and (ref is None or entry[0]() is ref()):
+                self._proxies.move_to_end(key)
+                return entry[1], entry[2]
+
+        proxy, scale = make_proxy(load(), max_size)
+
+        with self._lock:
+            self._proxies[key] = (ref, proxy, scale)
+            self._proxies.move_to_end(key)
+            while len(self._proxies) > self.max_items:
+                self._proxies.popitem(last=False)
+
+        return proxy, scale
+
+def make_proxy(image, max_size=PREVIEW_MAX_SIZE):
+    """
+    Downscale an image so its longest side is at most max_size.
+
+    Args:
+        image (PIL.Image): Full-resolution image
+        max_size (int): Longest side of the proxy in pixels
+
+    Returns:
+        tuple: (proxy PIL image, proxy-to-full scale factor)
+    """
+    scale = min(1.0, max_size / max(image.size))
+    if scale >= 1.0:
+        return image.copy(), 1.0
+
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+
+    # reducing_gap lets PIL shrink by whole factors before the final resample
+    proxy = image.resize(size, Image.BICUBIC, reducing_gap=2.0)
+    return proxy, proxy.width / image.width
+
+_shared_proxy_cache = None
+_shared_proxy_cache_lock = threading.Lock()
+
+def get_proxy_cache():
+    """
+    Get the process-wide preview proxy cache.
+
+    Returns:
+        ProxyCache: Shared proxy cache
+    """
+    global _shared_proxy_cache
+
+    with _shared_proxy_cache_lock:
+        if _shared_proxy_cache is None:
+            _shared_proxy_cache = ProxyCache()
+
+        return _shared_proxy_cache
+
+def get_preview_source(image, preview_size):
+    """
+    Get the image a preview should run on.
+
+    Args:
+        image (PIL.Image): Full-resolution image
+        preview_size (int): Longest side of the preview, or None for full resolution
+
+    Returns:
+        tuple: (image to process, scale factor relative to the full image)
+    """
+    if not preview_size:
+        return image, 1.0
+
+    return get_proxy_cache().get(image, preview_size)
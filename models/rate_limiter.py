@@ -0,0 +1,266 @@
+import time
+import random
+import threading
+import http.client
+from email.utils import parsedate_to_datetime
+from utils.timing import span
+from utils.config import TOGETHER_RATE_LIMIT_RPS, TOGETHER_RATE_LIMIT_BURST, TOGETHER_MAX_RETRIES
+
+class RateLimiter:
+    def __init__(self, rate=TOGETHER_RATE_LIMIT_RPS, burst=TOGETHER_RATE_LIMIT_BURST, max_retries=TOGETHER_MAX_RETRIES,
+                 base_delay=1.0, max_delay=30.0):
+        """
+        Initialize an adaptive token-bucket rate limiter.
+
+        The bucket refills at the current rate up to `burst` tokens. A 429 response
+        halves the current rate and pauses the bucket (for Retry-After when the
+        server sends it); every success raises the rate back towards the
+        configured maximum. Server errors and dropped connections are retried
+        with the same backoff but leave the rate alone.
+
+        Args:
+            rate (float): Maximum sustained requests per second
+            burst (int): Maximum number of requests that may be sent back to back
+            max_retries (int): How many times a rate-limited or failed call is retried
+            base_delay (float): Initial backoff delay in seconds
+            max_delay (float): Upper bound for a single backoff delay in seconds
+        """
+        self.max_rate = max(0.01, float(rate))
+        self.min_rate = self.max_rate / 16
+        self.burst = max(1, int(burst))
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._rate = self.max_rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    @property
+    def rate(self):
+        """
+        Get the current (adapted) request rate.
+
+        Returns:
+            float: Requests per second
+        """
+        with self._lock:
+            return self._rate
+
+    def acquire(self):
+        """
+        Block until the bucket allows one more request.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self._rate
+
+            time.sleep(wait)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call a function under the rate limit, retrying it on 429 responses,
+        server errors and connection errors with jittered exponential backoff.
+
+        Args:
+            func (callable): Function issuing one upstream request
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's return value
+        """
+        attempt = 0
+        while True:
+            with span('rate_limit'):
+                self.acquire()
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if not (rate_limited or is_transient_error(e)) or attempt >= self.max_retries:
+                    raise
+
+                if rate_limited:
+                    retry_after = get_retry_after(e)
+                    self.on_rate_limited(retry_after)
+                    delay = self.backoff_delay(attempt, retry_after)
+                    print(f"Rate limited by the API, retrying in {delay:.1f}s")
+                else:
+                    delay = self.backoff_delay(attempt)
+                    print(f"API request failed ({e}), retrying in {delay:.1f}s")
+
+                with span('backoff'):
+                    time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.on_success()
+            return result
+
+    def on_success(self):
+        """
+        Additively increase the rate after a successful request.
+        """
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.max_rate / 10)
+
+    def on_rate_limited(self, retry_after=None):
+        """
+        Multiplicatively decrease the rate and pause the bucket after a 429.
+
+        Args:
+            retry_after (float, optional): Seconds the server asked us to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            self._rate = max(self.min_rate, self._rate / 2)
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Compute the delay before the next retry.
+
+        Args:
+            attempt (int): Zero-based retry attempt
+            retry_after (float, optional): Seconds the server asked us to wait
+
+        Returns:
+            float: Delay in seconds
+        """
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            delay += retry_after
+
+        return delay
+
+    def _refill(self, now):
+        """
+        Add the tokens accumulated since the last update. Caller must hold the lock.
+
+        Args:
+            now (float): Current monotonic time
+        """
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+# Error classes of the Together SDK (and its HTTP libraries) for failures worth retrying
+TRANSIENT_ERROR_NAMES = ("APIConnectionError", "APITimeoutError", "Timeout", "ServiceUnavailableError",
+                         "InternalServerError")
+
+def _status_code(error):
+    """
+    Get the HTTP status of an API error.
+
+    Args:
+        error (Exception): Error raised by the API client
+
+    Returns:
+        int: Status code, or None if the error carries none
+    """
+    for status in (getattr(error, "status_code", None), getattr(error, "http_status", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status
+
+    return None
+
+def is_rate_limit_error(error):
+    """
+    Check whether an API error is a 429 (Too Many Requests) response.
+
+    Args:
+        error (Exception): Error raised by the API client
+
+    Returns:
+        bool: True if the request was rate limited
+    """
+    if type(error).__name__ == "RateLimitError":
+        return True
+
+    return _status_code(error) == 429
+
+def is_transient_error(error):
+    """
+    Check whether an API error is a server error or a failed connection,
+    which a later attempt may not run into.
+
+    Args:
+        error (Exception): Error raised by the API client
+
+    Returns:
+        bool: True if the request is worth retrying
+    """
+    if type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError, http.client.HTTPException)):
+        return True
+
+    status = _status_code(error)
+    return status is not None and (status >= 500 or status == 408)
+
+def get_retry_after(error):
+    """
+    Read the Retry-After header of a rate-limited response.
+
+    Args:
+        error (Exception): Error raised by the API client
+
+    Returns:
+        float: Seconds to wait, or None if the server did not say
+    """
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # Retry-After may also be an HTTP date
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """
+    Get the process-wide Together rate limiter.
+
+    Returns:
+        RateLimiter: Shared rate limiter
+    """
+    global _shared_limiter
+
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+
+        return _shared_limiter
@@ -0,0 +1,180 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from models.generation_backend import get_backend
+from models.rate_limiter import get_rate_limiter
+from utils.timing import Trace, current_trace, use_trace
+from utils.config import GENERATION_BATCH_WINDOW_MS, GENERATION_BATCH_MAX_IMAGES, GENERATION_MAX_IN_FLIGHT
+
+class _Batch:
+    def __init__(self):
+        """
+        Initialize a batch of compatible pending requests.
+        """
+        self.requests = []
+        self.size = 0
+        self.timer = None
+
+class RequestBatcher:
+    def __init__(self, backend, rate_limiter, window=GENERATION_BATCH_WINDOW_MS / 1000.0,
+                 max_batch=GENERATION_BATCH_MAX_IMAGES, max_in_flight=GENERATION_MAX_IN_FLIGHT):
+        """
+        Initialize a micro-batcher that merges compatible generation requests.
+
+        Requests for the same (prompt, width, height, steps) that arrive within
+        `window` seconds of each other, from any caller, are sent upstream as a
+        single call with a larger `n`. Each caller then receives its own slice
+        of the results.
+
+        Args:
+            backend (GenerationBackend): Backend that serves the merged calls
+            rate_limiter (RateLimiter): Rate limiter applied to each upstream call
+            window (float): Seconds to wait for more compatible requests
+            max_batch (int): Maximum number of images per upstream call
+            max_in_flight (int): Maximum number of upstream calls running at once
+        """
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.window = max(0.0, window)
+        self.max_batch = max(1, int(max_batch))
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_in_flight)), thread_name_prefix="generation-batch")
+        self._stats = {'requests': 0, 'batches': 0, 'images': 0}
+
+    def submit(self, prompt, width, height, steps, n=1):
+        """
+        Queue a request to be merged with compatible ones.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+            n (int): Number of images, at most max_batch
+
+        Returns:
+            concurrent.futures.Future: Resolves to a list of n PIL images
+        """
+        future = Future()
+        key = (prompt, width, height, steps)
+
+        with self._lock:
+            self._stats['requests'] += 1
+
+            batch = self._pending.get(key)
+            if batch is not None and batch.size + n > self.max_batch:
+                # Not enough room left; send what we have and start over
+                self._dispatch(key)
+                batch = None
+
+            if batch is None:
+                batch = _Batch()
+                batch.timer = threading.Timer(self.window, self._flush, args=(key, batch))
+                batch.timer.daemon = True
+                self._pending[key] = batch
+                batch.timer.start()
+
+            batch.requests.append((n, future, current_trace()))
+            batch.size += n
+
+            if batch.size >= self.max_batch:
+                self._dispatch(key)
+
+        return future
+
+    def stats(self):
+        """
+        Get counters showing how much merging took place.
+
+        Returns:
+            dict: Number of submitted requests, upstream batches and images
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        """
+        Send all pending batches and stop accepting upstream work once they finish.
+        """
+        with self._lock:
+            for key in list(self._pending):
+                self._dispatch(key)
+
+        self._executor.shutdown(wait=False)
+
+    def _flush(self, key, batch):
+        """
+        Send a batch when its window expires, unless it was already sent.
+
+        Args:
+            key (tuple): Batch key
+            batch (_Batch): Batch started for the key
+        """
+        with self._lock:
+            if self._pending.get(key) is batch:
+                self._dispatch(key)
+
+    def _dispatch(self, key):
+        """
+        Remove a pending batch and run it upstream. Caller must hold the lock.
+
+        Args:
+            key (tuple): Batch key
+        """
+        batch = self._pending.pop(key)
+        batch.timer.cancel()
+
+        self._stats['batches'] += 1
+        self._stats['images'] += batch.size
+        self._executor.submit(self._run, key, batch)
+
+    def _run(self, key, batch):
+        """
+        Make the merged upstream call and route the images back to each caller.
+
+        Args:
+            key (tuple): Batch key (prompt, width, height, steps)
+            batch (_Batch): Batch to run
+        """
+        prompt, width, height, steps = key
+
+        # Time the shared call once and report it to every caller's trace
+        batch_trace = Trace()
+        try:
+            with use_trace(batch_trace):
+                images = self.rate_limiter.call(self.backend.generate, prompt, width, height, steps, n=batch.size)
+            if len(images) < batch.size:
+                raise RuntimeError(f"Expected {batch.size} images, got {len(images)}")
+        except Exception as e:
+            for _, future, _ in batch.requests:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for n, future, trace in batch.requests:
+            if trace is not None:
+                trace.merge(batch_trace)
+            future.set_result(images[offset:offset + n])
+            offset += n
+
+_shared_batcher = None
+_shared_batcher_lock = threading.Lock()
+
+def get_request_batcher():
+    """
+    Get the process-wide request batcher for the default backend.
+
+    Returns:
+        RequestBatcher: Shared batcher, or None if batching is disabled
+    """
+    global _shared_batcher
+
+    if GENERATION_BATCH_WINDOW_MS <= 0:
+        return None
+
+    with _shared_batcher_lock:
+        if _shared_batcher is None:
+            _shared_batcher = RequestBatcher(get_backend(), get_rate_limiter())
+
+        return _shared_batcher
@@ -0,0 +1,141 @@
+import math
+import cv2
+import numpy as np
+from utils.config import BACKGROUND_REMOVAL_PRESET
+
+# GrabCut iterations, as in the original full-resolution path
+GRABCUT_ITERATIONS = 5
+
+# Side of the full-resolution tiles the boundary band is refined in
+REFINE_TILE_SIZE = 256
+
+# Quality/speed presets for background removal:
+#   max_side: longest side GrabCut runs at (None segments at full resolution)
+#   band: half-width of the refined boundary band, in pixels of the downscaled copy
+#   refine_iterations: graph-cut passes over the band at full resolution (0 only upsamples)
+SEGMENTATION_PRESETS = {
+    'full': {'max_side': None, 'band': 0, 'refine_iterations': 0},
+    'quality': {'max_side': 640, 'band': 2, 'refine_iterations': 2},
+    'balanced': {'max_side': 512, 'band': 2, 'refine_iterations': 1},
+    'fast': {'max_side': 320, 'band': 0, 'refine_iterations': 0}
+}
+
+def grabcut_rect(width, height):
+    """
+    Get the initial foreground rectangle for an image: the central 80%.
+
+    Args:
+        width (int): Image width
+        height (int): Image height
+
+    Returns:
+        tuple: (x, y, width, height)
+    """
+    return (width // 10, height // 10, width * 8 // 10, height * 8 // 10)
+
+def segment_foreground(bgr, preset=None):
+    """
+    Segment the foreground of an image with GrabCut, coarse to fine.
+
+    With a downscaling preset, GrabCut runs on a copy whose longest side is
+    max_side, the mask is upsampled, and only a narrow band around the
+    foreground boundary is cut again at full resolution, using the color
+    models learned on the small copy.
+
+    Args:
+        bgr (numpy.ndarray): Image in OpenCV BGR layout
+        preset (str, optional): Name in SEGMENTATION_PRESETS (defaults to BACKGROUND_REMOVAL_PRESET)
+
+    Returns:
+        numpy.ndarray: GrabCut labels (cv2.GC_BGD, GC_FGD, GC_PR_BGD, GC_PR_FGD)
+            at full resolution; foreground labels have the low bit set
+    """
+    settings = SEGMENTATION_PRESETS[preset or BACKGROUND_REMOVAL_PRESET]
+    height, width = bgr.shape[:2]
+
+    max_side = settings['max_side']
+    if not max_side or max(width, height) <= max_side:
+        mask, _ = _grabcut(bgr, grabcut_rect(width, height))
+        return mask
+
+    # Segment a downscaled copy
+    scale = max_side / max(width, height)
+    small = cv2.resize(bgr, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    small_mask, models = _grabcut(small, grabcut_rect(small.shape[1], small.shape[0]))
+
+    # Upsample the foreground and snap it back to labels
+    foreground = np.bitwise_and(small_mask, 1)
+    foreground *= 255
+    foreground = cv2.resize(foreground, (width, height), interpolation=cv2.INTER_LINEAR)
+    mask = np.where(foreground >= 128, cv2.GC_FGD, cv2.GC_BGD).astype(np.uint8)
+
+    band = math.ceil(settings['band'] / scale)
+    if band > 0 and settings['refine_iterations'] > 0:
+        _refine_band(bgr, mask, band, models, settings['refine_iterations'])
+
+    return mask
+
+def _grabcut(bgr, rect):
+    """
+    Run GrabCut from a rectangle.
+
+    Args:
+        bgr (numpy.ndarray): Image in OpenCV BGR layout
+        rect (tuple): Initial foreground rectangle (x, y, width, height)
+
+    Returns:
+        tuple: (label mask, (background model, foreground model))
+    """
+    mask = np.zeros(bgr.shape[:2], np.uint8)
+    bgd_model = np.zeros((1, 65), np.float64)
+    fgd_model = np.zeros((1, 65), np.float64)
+
+    cv2.grabCut(bgr, mask, rect, bgd_model, fgd_model, GRABCUT_ITERATIONS, cv2.GC_INIT_WITH_RECT)
+
+    return mask, (bgd_model, fgd_model)
+
+def _refine_band(bgr, mask, band, models, iterations):
+    """
+    Re-cut the pixels near the foreground boundary at full resolution, in place.
+
+    Pixels farther than `band` from the boundary keep their upsampled label
+    as a fixed constraint; band pixels become probable foreground/background
+    and are cut again with the given color models, tile by tile, skipping
+    tiles without boundary.
+
+    Args:
+        bgr (numpy.ndarray): Full-resolution image in OpenCV BGR layout
+        mask (numpy.ndarray): Upsampled labels (GC_FGD / GC_BGD); updated in place
+        band (int): Half-width of the boundary band in pixels
+        models (tuple): (background model, foreground model) from the coarse pass
+        iterations (int): Graph-cut passes per tile
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * band + 1, 2 * band + 1))
+    in_band = cv2.dilate(mask, kernel) != cv2.erode(mask, kernel)
+    if not in_band.any():
+        return
+
+    # Band pixels keep their upsampled guess as a probable label (GC_PR_BGD = 2, GC_PR_FGD = 3)
+    np.add(mask, 2, out=mask, where=in_band)
+
+    rows = np.flatnonzero(in_band.any(axis=1))
+    cols = np.flatnonzero(in_band.any(axis=0))
+    height, width = mask.shape
+
+    for top in range(rows[0], rows[-1] + 1, REFINE_TILE_SIZE):
+        for left in range(cols[0], cols[-1] + 1, REFINE_TILE_SIZE):
+            # Tiles overlap by the band so cuts see context across tile edges
+            y0, x0 = max(0, top - band), max(0, left - band)
+            y1, x1 = min(height, top + REFINE_TILE_SIZE + band), min(width, left + REFINE_TILE_SIZE + band)
+            if not in_band[y0:y1, x0:x1].any():
+                continue
+
+            tile_mask = mask[y0:y1, x0:x1].copy()
+            bgd_model, fgd_model = (model.copy() for model in models)
+            cv2.grabCut(np.ascontiguousarray(bgr[y0:y1, x0:x1]), tile_mask, None, bgd_model, fgd_model,
+                        iterations, cv2.GC_EVAL_FREEZE_MODEL)
+
+            # Write back only the tile's own area
+            core = (slice(top - y0, top - y0 + min(REFINE_TILE_SIZE, height - top)),
+                    slice(left - x0, left - x0 + min(REFINE_TILE_SIZE, width - left)))
+            mask[top:top + REFINE_TILE_SIZE, left:left + REFINE_TILE_SIZE] = tile_mask[core]
@@ -0,0 +1,72 @@
+import threading
+
+class _Call:
+    def __init__(self):
+        """
+        Initialize an in-flight call record.
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Initialize the SingleFlight class.
+
+        Concurrent calls made with the same key are coalesced: the first caller
+        runs the function and everyone else waits for, and shares, its result.
+        """
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run a function once per key among concurrent callers.
+
+        Args:
+            key (str): Identity of the call
+            func (callable): Function to run
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            tuple: (result, shared) where shared is True if the result came from
+                a call started by another thread
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def in_flight(self):
+        """
+        Get the number of distinct calls currently running.
+
+        Returns:
+            int: Number of in-flight keys
+        """
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,116 @@
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from utils.config import TILE_MEMORY_BUDGET_MB, TILE_WORKERS
+
+# Tiles are never made smaller than this many pixels per side
+MIN_TILE_SIZE = 64
+
+def plan_tiles(size, max_pixels, halo=0):
+    """
+    Split an image into tiles whose halo-padded area stays within max_pixels.
+
+    Full-width strips are preferred; square tiles are used only when even a
+    thin strip would be too large.
+
+    Args:
+        size (tuple): Image size (width, height)
+        max_pixels (int): Maximum pixels of one tile including its halo
+        halo (int): Extra context in pixels needed on each side of a tile
+
+    Returns:
+        list: Core boxes (left, top, right, bottom) covering the image
+    """
+    width, height = size
+
+    strip_height = max_pixels // (width + 2 * halo) - 2 * halo
+    if strip_height >= MIN_TILE_SIZE:
+        tile_width, tile_height = width, strip_height
+    else:
+        side = max(MIN_TILE_SIZE, int(math.sqrt(max_pixels)) - 2 * halo)
+        tile_width, tile_height = side, side
+
+    return [
+        (left, top, min(left + tile_width, width), min(top + tile_height, height))
+        for top in range(0, height, tile_height)
+        for left in range(0, width, tile_width)
+    ]
+
+def process_tiled(image, func, halo=0, copies=2, budget_mb=TILE_MEMORY_BUDGET_MB, workers=TILE_WORKERS):
+    """
+    Run an image operation tile by tile under a peak-memory budget.
+
+    Each tile is cut out with `halo` pixels of surrounding context, processed
+    and trimmed back to its core before being pasted into the result, so
+    neighborhood operations such as blurs see the same pixels as on the whole
+    image. Images whose whole-image working set fits the budget are processed
+    in one piece.
+
+    Args:
+        image (PIL.Image): Input image
+        func (callable): Operation taking and returning a PIL image of the same size.
+            Must be point-wise or only read pixels within `halo` of each output pixel.
+        halo (int): Context in pixels the operation needs around each pixel
+        copies (int): Number of tile-sized buffers the operation allocates,
+            including its input and output
+        budget_mb (float): Peak working memory for all tiles in flight, in megabytes
+        workers (int): Number of tiles processed in parallel
+
+    Returns:
+        PIL.Image: Processed image
+    """
+    workers = max(1, int(workers))
+    bytes_per_pixel = len(image.getbands()) * copies
+    max_pixels = int(budget_mb * 1024 * 1024 / (bytes_per_pixel * workers))
+
+    width, height = image.size
+    if width * height <= max_pixels:
+        return func(image)
+
+    # Decode once up front so tiles can be cropped from several threads
+    image.load()
+    tiles = plan_tiles(image.size, max_pixels, halo)
+
+    def run(box):
+        left, top, right, bottom = box
+        outer = (max(0, left - halo), max(0, top - halo), min(width, right + halo), min(height, bottom + halo))
+        result = func(image.crop(outer))
+        if outer == box:
+            return box, result
+
+        # Trim the halo off again
+        return box, result.crop((left - outer[0], top - outer[1], right - outer[0], bottom - outer[1]))
+
+    processed = map(run, tiles) if workers == 1 else _bounded_map(run, tiles, workers)
+
+    result = None
+    for box, tile in processed:
+        if result is None:
+            result = Image.new(tile.mode, image.size)
+        result.paste(tile, box[:2])
+
+    return result
+
+def _bounded_map(func, items, workers):
+    """
+    Map a function over items on a thread pool, in order, with at most
+    `workers` calls in flight or finished but not yet consumed.
+
+    Args:
+        func (callable): Function to call
+        items (list): Arguments, one per call
+        workers (int): Number of threads
+
+    Yields:
+        Results of func, in the order of items
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-tile") as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,185 @@
+"""
+Local stand-in for the Together images endpoint.
+
+Serves POST /v1/images/generations with deterministic images, so the serving
+stack can be load-tested and benchmarked offline without spending API credits.
+Latency, error rate and 429 responses are configurable.
+
+Usage:
+    python standin_server.py --port 8008 --latency 1.5 --jitter 0.3 --rate-limit-rate 0.05
+
+Then run the app against it:
+    GENERATION_BACKEND=http GENERATION_BACKEND_URL=http://127.0.0.1:8008/v1 python web_app.py
+"""
+import io
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from PIL import Image
+
+@lru_cache(maxsize=64)
+def render_image(prompt, width, height, steps, index):
+    """
+    Render a deterministic image for a request.
+
+    The same (prompt, width, height, steps, index) always yields the same bytes.
+
+    Args:
+        prompt (str): Text prompt
+        width (int): Image width
+        height (int): Image height
+        steps (int): Number of denoising steps
+        index (int): Position of the image within the request
+
+    Returns:
+        str: Base64-encoded PNG
+    """
+    digest = hashlib.sha256(f"{prompt}|{width}|{height}|{steps}|{index}".encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+    # Smooth color field from a few random sinusoids, cheap to compute at any size
+    x = np.linspace(0, 1, width, dtype=np.float32)[np.newaxis, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    array = np.empty((height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        fx, fy, phase = rng.uniform(0.5, 4.0), rng.uniform(0.5, 4.0), rng.uniform(0, 2 * np.pi)
+        wave = np.sin(2 * np.pi * (fx * x + fy * y) + phase)
+        array[..., channel] = (127.5 + 127.5 * wave).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG", compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like the real API
+    protocol_version = "HTTP/1.1"
+
+    # Set by main()
+    options = None
+    rng = None
+    rng_lock = threading.Lock()
+    active = 0
+    active_lock = threading.Lock()
+
+    def do_POST(self):
+        """
+        Handle an images generation request.
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path.rstrip("/") != "/v1/images/generations":
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}"}})
+            return
+
+        try:
+            params = json.loads(body)
+            prompt = str(params['prompt'])
+            model = params.get('model', '')
+            width = int(params.get('width', 1024))
+            height = int(params.get('height', 768))
+            steps = int(params.get('steps', 4))
+            n = max(1, int(params.get('n', 1)))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': {'message': f"Invalid request: {e}"}})
+            return
+
+        options = self.options
+
+        # Draw the fault for this request from the seeded generator
+        with self.rng_lock:
+            roll = self.rng.random()
+            delay = max(0.0, options.latency + self.rng.uniform(-options.jitter, options.jitter))
+
+        with StandInHandler.active_lock:
+            overloaded = options.max_concurrency and StandInHandler.active >= options.max_concurrency
+            rate_limited = overloaded or roll < options.rate_limit_rate
+            if not rate_limited:
+                StandInHandler.active += 1
+
+        if rate_limited:
+            self._send_json(429, {'error': {'message': "Rate limit exceeded"}},
+                            headers={'Retry-After': str(options.retry_after)})
+            return
+
+        try:
+            time.sleep(delay + options.latency_per_image * (n - 1))
+
+            if roll < options.rate_limit_rate + options.error_rate:
+                self._send_json(500, {'error': {'message': "Injected server error"}})
+                return
+
+            self._send_json(200, {
+                'id': hashlib.sha1(body).hexdigest(),
+                'model': model,
+                'object': "list",
+                'data': [
+                    {'index': i, 'b64_json': render_image(prompt, width, height, steps, i)}
+                    for i in range(n)
+                ]
+            })
+        finally:
+            with StandInHandler.active_lock:
+                StandInHandler.active -= 1
+
+    def _send_json(self, status, payload, headers=None):
+        """
+        Send a JSON response.
+
+        Args:
+            status (int): HTTP status code
+            payload (dict): Response body
+            headers (dict, optional): Extra response headers
+        """
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """
+        Log requests only when running verbosely.
+        """
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Together images endpoint")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8008, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=1.0, help="Base response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform latency jitter in seconds (+/-)")
+    parser.add_argument("--latency-per-image", type=float, default=0.0, help="Extra latency per additional image when n > 1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Answer 429 above this many concurrent requests (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and fault injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    options = parser.parse_args()
+
+    StandInHandler.options = options
+    StandInHandler.rng = random.Random(options.seed)
+
+    server = ThreadingHTTPServer((options.host, options.port), StandInHandler)
+    print(f"Stand-in images API listening on http://{options.host}:{options.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
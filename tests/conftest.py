@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from PIL import Image
+from models.image_editor import ImageEditor
+
+def _gradient_image(size=(320, 240)):
+    """
+    Build a colorful test image with no black pixels.
+    """
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([40 + x * 200 // width, 40 + y * 200 // height, 40 + (x + y) * 100 // (width + height)], axis=-1)
+    return Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+def _run_sequentially(image, operations):
+    """
+    Run geometric operations one by one with ImageEditor.
+    """
+    editor = ImageEditor()
+    for operation in operations:
+        if operation['type'] == 'crop':
+            image = editor.crop(image, operation['left'], operation['top'], operation['right'], operation['bottom'])
+        elif operation['type'] == 'rotate':
+            image = editor.rotate(image, operation['angle'])
+        else:
+            image = editor.resize(image, operation['width'], operation['height'])
+    return image
+
+@pytest.fixture
+def image():
+    """
+    A 320x240 RGB gradient with no black pixels, so cleared areas stand out.
+    """
+    return _gradient_image()
+
+@pytest.fixture
+def run_sequentially():
+    """
+    Reference for fused geometry: apply crop / rotate / resize operations one by one.
+    """
+    return _run_sequentially
@@ -0,0 +1,23 @@
+import pytest
+from models.batch_processor import BatchProcessor
+
+@pytest.fixture
+def processor():
+    processor = BatchProcessor(max_workers=1)
+    yield processor
+    processor.close()
+
+def test_failures_are_reported_per_image(processor, tmp_path, image):
+    source = str(tmp_path / "source.png")
+    image.save(source)
+
+    good = str(tmp_path / "good.png")
+    bad = str(tmp_path / "bad.png")
+    results = processor.run([
+        (source, [{'type': 'rotate', 'angle': 90}], good),
+        (source, [{'type': 'crop', 'left': 'x', 'top': 0, 'right': 10, 'bottom': 10}], bad)
+    ])
+
+    assert results[0] == (good, None)
+    assert results[1][0] is None and results[1][1]
+    assert not (tmp_path / "bad.png").exists()
@@ -0,0 +1,16 @@
+import numpy as np
+from PIL import Image, ImageOps
+from models.image_filter import ImageFilter
+
+def test_grayscale_filter_matches_native_blend(image):
+    expected = Image.blend(image, ImageOps.grayscale(image).convert('RGB'), 0.4)
+
+    assert np.array_equal(np.asarray(ImageFilter().grayscale_filter(image, 0.4)), np.asarray(expected))
+
+def test_grayscale_filter_keeps_alpha(image):
+    image = image.convert('RGBA')
+    image.putalpha(128)
+
+    result = ImageFilter().grayscale_filter(image, 1.0)
+    assert result.mode == 'RGBA'
+    assert result.getchannel('A').getextrema() == (128, 128)
@@ -0,0 +1,8 @@
+import pytest
+from PIL import Image
+from models.compute_backends import ComputeBackends
+
+@pytest.mark.parametrize("mode, expected", [('RGB', 'opencv'), ('RGBA', 'pil'), ('L', 'pil'), ('P', 'pil')])
+def test_opencv_rotate_is_limited_to_rgb(mode, expected):
+    backends = ComputeBackends({'rotate:small': 'opencv'})
+    assert backends.choose('rotate', Image.new(mode, (10, 10))) == expected
@@ -0,0 +1,34 @@
+import numpy as np
+from models.edit_document import EditDocument
+
+CROP = {'type': 'crop', 'left': 10, 'top': 20, 'right': 90, 'bottom': 80}
+
+def test_render_matches_sequential_edits_after_crop_and_rotate(image, run_sequentially):
+    operations = [CROP, {'type': 'rotate', 'angle': 30}]
+
+    document = EditDocument(image)
+    for operation in operations:
+        document.add(operation)
+
+    expected = np.asarray(run_sequentially(image, operations), dtype=float)
+    rendered = np.asarray(document.render(), dtype=float)
+
+    assert rendered.shape == expected.shape
+    assert abs((rendered.sum(axis=-1) == 0).mean() - (expected.sum(axis=-1) == 0).mean()) < 0.02
+    assert np.abs(rendered - expected).mean() < 3.0
+
+def test_rendered_is_kept_until_the_edits_change(image):
+    document = EditDocument(image)
+    assert document.rendered() is image
+
+    document.add(CROP)
+    assert document.rendered() is None
+
+    render = document.render()
+    assert document.rendered() is render
+
+    document.add({'type': 'rotate', 'angle': 30})
+    assert document.rendered() is None
+
+    document.undo()
+    assert document.rendered() is render
@@ -0,0 +1,18 @@
+import pytest
+from models.edit_executor import EditExecutor
+
+BAD_CROP = [{'type': 'crop', 'left': 'x', 'top': 0, 'right': 10, 'bottom': 10}]
+
+@pytest.fixture
+def executor():
+    executor = EditExecutor(max_workers=1, timeout=30)
+    yield executor
+    executor.close()
+
+def test_run_returns_the_edited_image(executor, image):
+    result = executor.run(image, [{'type': 'rotate', 'angle': 90}])
+    assert result.size == (240, 320)
+
+def test_failing_chain_raises_instead_of_returning_the_input(executor, image):
+    with pytest.raises(RuntimeError):
+        executor.run(image, BAD_CROP)
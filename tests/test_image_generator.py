@@ -0,0 +1,48 @@
+import pytest
+from PIL import Image
+from models.generation_backend import GenerationBackend
+from models.image_generator import ImageGenerator
+from models.rate_limiter import RateLimiter
+from utils.image_cache import ImageCache
+
+class CountingBackend(GenerationBackend):
+    name = 'counting'
+
+    def __init__(self):
+        super().__init__('test-model')
+        self.calls = 0
+
+    def generate(self, prompt, width, height, steps, n=1):
+        self.calls += 1
+        return [Image.new('RGB', (width, height), (self.calls, 0, 0)) for _ in range(n)]
+
+def make_generator():
+    backend = CountingBackend()
+    generator = ImageGenerator(max_in_flight=1, backend=backend, cache=ImageCache(memory_items=8), rate_limiter=RateLimiter())
+    return generator, backend
+
+def test_seeded_requests_are_served_from_the_cache():
+    generator, backend = make_generator()
+
+    first = generator.generate("a cat", width=64, height=64, seed=7)
+    second = generator.generate("a cat", width=64, height=64, seed=7)
+
+    assert backend.calls == 1
+    assert first[0].tobytes() == second[0].tobytes()
+
+def test_requests_without_a_seed_skip_the_cache():
+    generator, backend = make_generator()
+
+    generator.generate("a cat", width=64, height=64)
+    generator.generate("a cat", width=64, height=64)
+
+    assert backend.calls == 2
+
+def test_close_shuts_down_a_batcher_the_generator_created(monkeypatch):
+    monkeypatch.setattr('models.image_generator.GENERATION_BATCH_WINDOW_MS', 10)
+    generator = ImageGenerator(backend=CountingBackend(), cache=ImageCache(memory_items=8), rate_limiter=RateLimiter())
+    generator.generate("a cat", width=64, height=64, seed=1)
+
+    generator.close()
+    with pytest.raises(RuntimeError):
+        generator.batcher._executor.submit(lambda: None)
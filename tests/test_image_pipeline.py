@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from models.color_lut import apply_color_ops
+from models.image_filter import ImageFilter
+from models.image_pipeline import ImagePipeline
+
+CROP = {'type': 'crop', 'left': 10, 'top': 20, 'right': 90, 'bottom': 80}
+
+@pytest.mark.parametrize("operations", [
+    [CROP, {'type': 'rotate', 'angle': 30}],
+    [{'type': 'rotate', 'angle': 20}, CROP, {'type': 'rotate', 'angle': -50}],
+    [{'type': 'rotate', 'angle': 30}] * 3 + [{'type': 'resize', 'width': 200, 'height': 160}],
+    [{'type': 'rotate', 'angle': 45}] * 2 + [{'type': 'resize', 'width': 200, 'height': 160}],
+    [CROP, {'type': 'rotate', 'angle': 90}, {'type': 'resize', 'width': 150, 'height': 150}]
+])
+def test_fused_geometry_matches_sequential_edits(operations, image, run_sequentially):
+
+    expected = np.asarray(run_sequentially(image, operations), dtype=float)
+    fused = np.asarray(ImagePipeline().run(image, operations), dtype=float)
+
+    assert fused.shape == expected.shape
+    # Same areas cleared by crops and rotations, same content elsewhere
+    assert abs((fused.sum(axis=-1) == 0).mean() - (expected.sum(axis=-1) == 0).mean()) < 0.02
+    assert np.abs(fused - expected).mean() < 3.0
+
+def test_run_returns_the_input_on_error_unless_asked_to_raise(image):
+    operations = [{'type': 'crop', 'left': 'x', 'top': 0, 'right': 10, 'bottom': 10}]
+
+    assert ImagePipeline().run(image, operations) is image
+    with pytest.raises(TypeError):
+        ImagePipeline().run(image, operations, raise_errors=True)
+
+def test_vintage_keeps_alpha_in_both_paths(image):
+    image = image.convert('RGBA')
+    image.putalpha(100)
+    operations = [{'type': 'filter', 'filter_type': 'Vintage', 'intensity': 0.8}]
+
+    direct = ImageFilter().apply_filter(image, 'Vintage', 0.8)
+    piped = ImagePipeline().run(image, operations, raise_errors=True)
+
+    for result in (direct, piped):
+        assert result.mode == 'RGBA'
+        assert result.getchannel('A').getextrema() == (100, 100)
+    assert np.abs(np.asarray(direct, dtype=float) - np.asarray(piped, dtype=float)).max() <= 1
+    # The corners are still darkened
+    toned = apply_color_ops(image, [('sepia', 0.8), ('contrast', 0.8), ('brightness', 0.9)])
+    assert np.asarray(direct)[0, 0, :3].sum() < np.asarray(toned)[0, 0, :3].sum()
@@ -0,0 +1,88 @@
+import threading
+import time
+import pytest
+from models.job_queue import JobQueue, MemoryJobStore, SQLiteJobStore, SUCCEEDED, FAILED, RUNNING, FINISHED_STATES
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), poll_interval=0.01)
+
+def wait_until_finished(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in FINISHED_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+def test_creating_a_queue_starts_no_threads(store):
+    before = threading.active_count()
+    JobQueue(lambda params, job: None, store=store, num_workers=2)
+    assert threading.active_count() == before
+
+def test_started_workers_run_jobs_added_to_the_store_directly(store):
+    queue = JobQueue(lambda params, job: params['value'] * 2, store=store, num_workers=1)
+    queue.start()
+    try:
+        store.add('external', {'value': 21})
+        job = wait_until_finished(queue, 'external')
+        assert job['status'] == SUCCEEDED
+        assert job['result'] == 42
+    finally:
+        queue.shutdown()
+
+def test_cancel_is_refused_once_the_job_is_locked_in(store):
+    locked_in = threading.Event()
+    release = threading.Event()
+
+    def handler(params, job):
+        assert job.lock_in()
+        locked_in.set()
+        release.wait(10)
+        return 'charged'
+
+    queue = JobQueue(handler, store=store, num_workers=1)
+    try:
+        job_id = queue.submit({})
+        assert locked_in.wait(10)
+        assert not queue.cancel(job_id)
+
+        release.set()
+        job = wait_until_finished(queue, job_id)
+        assert job['status'] == SUCCEEDED
+        assert job['result'] == 'charged'
+    finally:
+        release.set()
+        queue.shutdown()
+
+def test_lock_in_fails_after_cancel(store):
+    store.add('job', {})
+    assert store.cancel('job')
+    assert not store.lock_in('job')
+
+def test_expired_leases_are_requeued_or_failed(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), lease=1)
+    store.add('plain', {})
+    store.add('locked', {})
+    assert store.claim()[0] == 'plain'
+    assert store.claim()[0] == 'locked'
+    assert store.lock_in('locked')
+
+    # Nobody renews the leases, as if the claiming process had died
+    time.sleep(1.1)
+    assert store.claim(timeout=0) == ('plain', {})
+    assert store.get('locked')['status'] == FAILED
+
+def test_renewed_leases_are_kept(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), lease=1)
+    store.add('job', {})
+    store.claim()
+
+    time.sleep(0.6)
+    store.renew(['job'])
+    time.sleep(0.6)
+    assert store.claim(timeout=0) is None
+    assert store.get('job')['status'] == RUNNING
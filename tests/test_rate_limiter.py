@@ -0,0 +1,39 @@
+import pytest
+from models.generation_backend import BackendHTTPError
+from models.rate_limiter import RateLimiter
+
+def make_limiter():
+    return RateLimiter(rate=1000, burst=10, max_retries=2, base_delay=0.001, max_delay=0.01)
+
+def failing(errors):
+    """
+    Build a function that raises the given errors in turn, then succeeds.
+    """
+    errors = list(errors)
+
+    def func():
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+    return func
+
+@pytest.mark.parametrize("error", [
+    BackendHTTPError(429, "slow down"),
+    BackendHTTPError(503, "unavailable"),
+    ConnectionResetError("connection reset")
+])
+def test_transient_errors_are_retried(error):
+    assert make_limiter().call(failing([error, error])) == 'ok'
+
+def test_client_errors_are_not_retried():
+    with pytest.raises(BackendHTTPError):
+        make_limiter().call(failing([BackendHTTPError(400, "bad request")]))
+
+def test_retries_are_bounded():
+    with pytest.raises(BackendHTTPError):
+        make_limiter().call(failing([BackendHTTPError(500, "error")] * 3))
+
+def test_server_errors_leave_the_rate_alone():
+    limiter = make_limiter()
+    limiter.call(failing([BackendHTTPError(500, "error")]))
+    assert limiter.rate == limiter.max_rate
@@ -9,3 +9,79 @@ TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 
 # Together API model name
 TOGETHER_MODEL = "black-forest-labs/FLUX.1-schnell"
+
+# Image generation backend: "together" (Together API) or "http" (any server speaking
+# the Together images protocol, such as the local stand-in in standin_server.py)
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "together")
+GENERATION_BACKEND_URL = os.getenv("GENERATION_BACKEND_URL", "http://127.0.0.1:8008/v1")
+
+# Maximum number of image generation calls in flight for a single request
+GENERATION_MAX_IN_FLIGHT = int(os.getenv("GENERATION_MAX_IN_FLIGHT", "4"))
+
+# Maximum number of long-lived Together clients kept in the shared client pool
+TOGETHER_CLIENT_POOL_SIZE = int(os.getenv("TOGETHER_CLIENT_POOL_SIZE", "8"))
+
+# Generation result cache (memory LRU + size-bounded disk tier under the output directory)
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_MEMORY_ITEMS = int(os.getenv("GENERATION_CACHE_MEMORY_ITEMS", "64"))
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", os.path.join("outputs", "cache", "generations"))
+GENERATION_CACHE_DISK_MB = int(os.getenv("GENERATION_CACHE_DISK_MB", "512"))
+
+# Shared rate limit for Together API calls (token bucket) and retries on 429s, server and connection errors
+TOGETHER_RATE_LIMIT_RPS = float(os.getenv("TOGETHER_RATE_LIMIT_RPS", "2.0"))
+TOGETHER_RATE_LIMIT_BURST = int(os.getenv("TOGETHER_RATE_LIMIT_BURST", "4"))
+TOGETHER_MAX_RETRIES = int(os.getenv("TOGETHER_MAX_RETRIES", "3"))
+
+# Background job queue for /generate (in-process worker pool, optionally shared through SQLite)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Seconds a running job stays claimed without its worker renewing the claim
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB")
+
+# Cross-request micro-batching: compatible requests arriving within the window are
+# merged into one upstream call with a larger n (0 disables batching)
+GENERATION_BATCH_WINDOW_MS = float(os.getenv("GENERATION_BATCH_WINDOW_MS", "0"))
+GENERATION_BATCH_MAX_IMAGES = int(os.getenv("GENERATION_BATCH_MAX_IMAGES", "4"))
+
+# Interactive previews run on a cached proxy whose longest side is at most this many pixels
+PREVIEW_MAX_SIZE = int(os.getenv("PREVIEW_MAX_SIZE", "512"))
+PREVIEW_CACHE_ITEMS = int(os.getenv("PREVIEW_CACHE_ITEMS", "16"))
+
+# Filters on large images run tile by tile so their working memory stays within this budget;
+# tiles can be processed on several threads at once
+TILE_MEMORY_BUDGET_MB = float(os.getenv("TILE_MEMORY_BUDGET_MB", "128"))
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "1"))
+
+# Worker processes for batch filter/edit requests (0 = one per CPU core)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0"))
+
+# Backend (PIL, OpenCV or NumPy) per filter/edit operation and size class, as written by
+# benchmark_backends.py; PIL is used everywhere when the file does not exist
+COMPUTE_BACKENDS_FILE = os.getenv("COMPUTE_BACKENDS_FILE", "compute_backends.json")
+
+# Results of the Flask app's /apply_filter, keyed by source content hash, filter and intensity.
+# The disk tier must be inside static/ because results are served straight from it.
+FILTER_CACHE_MEMORY_ITEMS = int(os.getenv("FILTER_CACHE_MEMORY_ITEMS", "32"))
+FILTER_CACHE_DIR = os.getenv("FILTER_CACHE_DIR", os.path.join("static", "uploads", "filtered"))
+FILTER_CACHE_DISK_MB = int(os.getenv("FILTER_CACHE_DISK_MB", "256"))
+FILTER_INTENSITY_STEP = float(os.getenv("FILTER_INTENSITY_STEP", "0.05"))
+
+# Threads applying a filter or edit to the frames of an animated GIF (0 = one per CPU core)
+ANIMATION_WORKERS = int(os.getenv("ANIMATION_WORKERS", "0"))
+
+# Background removal quality/speed preset: full, quality, balanced or fast (see models/segmentation.py)
+BACKGROUND_REMOVAL_PRESET = os.getenv("BACKGROUND_REMOVAL_PRESET", "balanced")
+
+# Edit history: memory for full-resolution checkpoint renders per edit document, and
+# number of preview renders kept so stepping back and forth through history is instant
+EDIT_CHECKPOINT_MB = int(os.getenv("EDIT_CHECKPOINT_MB", "256"))
+EDIT_PREVIEW_ITEMS = int(os.getenv("EDIT_PREVIEW_ITEMS", "8"))
+
+# Worker processes for interactive filters and edits, which can be timed out and cancelled
+# (0 = one per CPU core), the maximum number of queued and running edits, and the default
+# number of seconds an edit may run (0 = no limit)
+EDIT_WORKERS = int(os.getenv("EDIT_WORKERS", "2"))
+EDIT_MAX_QUEUED = int(os.getenv("EDIT_MAX_QUEUED", "8"))
+EDIT_TIMEOUT_SECONDS = float(os.getenv("EDIT_TIMEOUT_SECONDS", "60"))
@@ -46,7 +46,8 @@ class FileHandler:
             elif format.lower() == "png":
                 image.save(file_path, format=format.upper())
             elif format.lower() == "gif":
-                image.save(file_path, format=format.upper())
+                # Keep every frame of animations
+                image.save(file_path, format=format.upper(), save_all=getattr(image, 'is_animated', False))
             else:
                 image.save(file_path)
             
@@ -98,7 +99,8 @@ class FileHandler:
             elif format.lower() == "png":
                 image.save(buffer, format=format.upper())
             elif format.lower() == "gif":
-                image.save(buffer, format=format.upper())
+                # Keep every frame of animations
+                image.save(buffer, format=format.upper(), save_all=getattr(image, 'is_animated', False))
             else:
                 image.save(buffer, format=format.upper())
             
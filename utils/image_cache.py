@@ -0,0 +1,321 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+class ImageCache:
+    def __init__(self, memory_items=64, disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        """
+        Initialize a two-tier (memory + disk) image cache.
+
+        The memory tier is an LRU bounded by item count. The optional disk tier
+        stores PNG files named after their key and is bounded by total size,
+        evicting the least recently used files first.
+
+        Args:
+            memory_items (int): Maximum number of images kept in memory
+            disk_dir (str, optional): Directory for the disk tier, or None to disable it
+            disk_max_bytes (int): Maximum total size of the disk tier in bytes
+        """
+        self.memory_items = max(0, int(memory_items))
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_bytes)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+        if self.disk_dir:
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Build a content-addressed cache key from the given parts.
+
+        Args:
+            *parts: JSON-serializable values identifying the cached content
+
+        Returns:
+            str: Hex digest key
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up an image by key.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            PIL.Image: A copy of the cached image, or None on a miss
+        """
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return image.copy()
+
+            on_disk = key in self._disk
+
+        if on_disk:
+            image = self._read_disk(key)
+            if image is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                    self._stats['disk_hits'] += 1
+                    self._remember(key, image)
+                return image.copy()
+
+        with self._lock:
+            self._stats['misses'] += 1
+
+        return None
+
+    def put(self, key, image, persist=True):
+        """
+        Store an image under the given key.
+
+        Args:
+            key (str): Cache key
+            image (PIL.Image): Image to store
+            persist (bool): Also write it to the disk tier; otherwise only the memory tier keeps it
+        """
+        image = image.copy()
+
+        with self._lock:
+            self._stats['stores'] += 1
+            self._remember(key, image)
+
+        if self.disk_dir and persist:
+            self._write_disk(key, image)
+
+    def get_path(self, key):
+        """
+        Get the disk tier file of a key and mark it as recently used.
+
+        Since files are named after their key, the path can be served or
+        linked to directly.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: Path to the PNG file, or None if the key is not on disk
+        """
+        if not self.disk_dir:
+            return None
+
+        with self._lock:
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+
+        path = self._disk_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._remove_disk(key)
+            return None
+        except Exception as e:
+            print(f"Error touching cached image: {e}")
+
+        return path
+
+    def stats(self):
+        """
+        Get hit/miss counters and tier sizes.
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+            stats['disk_items'] = len(self._disk)
+            stats['disk_bytes'] = self._disk_bytes
+
+        return stats
+
+    def clear(self):
+        """
+        Remove all entries from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            keys = list(self._disk)
+
+        for key in keys:
+            self._remove_disk(key)
+
+    def _remember(self, key, image):
+        """
+        Insert an image into the memory tier. Caller must hold the lock.
+
+        Args:
+            key (str): Cache key
+            image (PIL.Image): Image to store
+        """
+        if self.memory_items == 0:
+            return
+
+        self._memory[key] = image
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _disk_path(self, key):
+        """
+        Get the file path of a key in the disk tier.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: Path to the PNG file
+        """
+        return os.path.join(self.disk_dir, f"{key}.png")
+
+    def _load_disk_index(self):
+        """
+        Index files already present in the disk tier, oldest access first.
+        """
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+            entries = []
+            for name in os.listdir(self.disk_dir):
+                if not name.endswith(".png"):
+                    continue
+                stat = os.stat(os.path.join(self.disk_dir, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+
+            for key in self._evict_disk():
+                self._delete_file(key)
+        except Exception as e:
+            print(f"Error loading image cache index: {e}")
+
+    def _read_disk(self, key):
+        """
+        Read an image from the disk tier and mark it as recently used.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            PIL.Image: Loaded image, or None if it is missing or unreadable
+        """
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+                os.utime(path)
+
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+
+                return image.copy()
+        except Exception as e:
+            print(f"Error reading cached image: {e}")
+            self._remove_disk(key)
+            return None
+
+    def _write_disk(self, key, image):
+        """
+        Write an image to the disk tier and evict old files over the size limit.
+
+        Args:
+            key (str): Cache key
+            image (PIL.Image): Image to store
+        """
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+            # Write to a temporary file first so readers never see a partial PNG
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+
+            with self._lock:
+                self._disk_bytes += size - self._disk.get(key, 0)
+                self._disk[key] = size
+                self._disk.move_to_end(key)
+                evicted = self._evict_disk()
+
+            for old_key in evicted:
+                self._delete_file(old_key)
+        except Exception as e:
+            print(f"Error writing cached image: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict_disk(self):
+        """
+        Drop least recently used disk entries until the tier fits its size limit.
+        Caller must hold the lock and delete the returned files afterwards.
+
+        Returns:
+            list: Keys whose files should be deleted
+        """
+        evicted = []
+        while self._disk and self._disk_bytes > self.disk_max_bytes:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._stats['evictions'] += 1
+            evicted.append(key)
+
+        return evicted
+
+    def _remove_disk(self, key):
+        """
+        Remove a key from the disk tier.
+
+        Args:
+            key (str): Cache key
+        """
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+        self._delete_file(key)
+
+    def _delete_file(self, key):
+        """
+        Delete the file backing a disk entry, ignoring missing files.
+
+        Args:
+            key (str): Cache key
+        """
+        try:
+            os.remove(self._disk_path(key))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error deleting cached image: {e}")
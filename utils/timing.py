@@ -0,0 +1,210 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is open-ended
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Trace:
+    def __init__(self):
+        """
+        Initialize a trace collecting timed spans for one request.
+        """
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, phase, seconds):
+        """
+        Record a finished span.
+
+        Args:
+            phase (str): Phase name
+            seconds (float): Duration in seconds
+        """
+        with self._lock:
+            self.spans.append((phase, seconds))
+
+    def merge(self, other):
+        """
+        Copy all spans of another trace into this one.
+
+        Args:
+            other (Trace): Trace to merge
+        """
+        for phase, seconds in list(other.spans):
+            self.add(phase, seconds)
+
+    def summary(self):
+        """
+        Summarize the spans per phase.
+
+        Returns:
+            dict: Phase name -> count, total_ms and max_ms
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        summary = {}
+        for phase, seconds in spans:
+            entry = summary.setdefault(phase, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += seconds * 1000
+            entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+
+        for entry in summary.values():
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+
+        return summary
+
+@contextmanager
+def use_trace(trace):
+    """
+    Make a trace current for the with-block, so span() calls record into it.
+
+    Args:
+        trace (Trace): Trace to record into
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def current_trace():
+    """
+    Get the trace of the current context.
+
+    Returns:
+        Trace: Current trace, or None if nothing is being traced
+    """
+    return _current_trace.get()
+
+@contextmanager
+def span(phase):
+    """
+    Time the with-block as a phase of the current trace. Does nothing when
+    no trace is current.
+
+    Args:
+        phase (str): Phase name
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(phase, time.perf_counter() - start)
+
+class LatencyHistogram:
+    def __init__(self):
+        """
+        Initialize a fixed-bucket latency histogram.
+        """
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        """
+        Add one sample.
+
+        Args:
+            ms (float): Duration in milliseconds
+        """
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        """
+        Estimate a percentile as the upper bound of the bucket that contains it.
+
+        Args:
+            p (float): Percentile (0-100)
+
+        Returns:
+            float: Latency in milliseconds, or None if there are no samples
+        """
+        if not self.count:
+            return None
+
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max_ms
+
+        return self.max_ms
+
+    def to_dict(self):
+        """
+        Export the histogram.
+
+        Returns:
+            dict: Sample count, mean, max, p50/p90/p99 and bucket counts
+        """
+        buckets = {}
+        for i, count in enumerate(self.counts):
+            label = f"le_{BUCKET_BOUNDS_MS[i]}ms" if i < len(BUCKET_BOUNDS_MS) else "inf"
+            buckets[label] = count
+
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'buckets': buckets
+        }
+
+class LatencyStats:
+    def __init__(self):
+        """
+        Initialize per-phase latency histograms.
+        """
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, trace):
+        """
+        Add every span of a finished trace to the histogram of its phase.
+
+        Args:
+            trace (Trace): Finished trace
+        """
+        with self._lock:
+            for phase, seconds in list(trace.spans):
+                histogram = self._histograms.get(phase)
+                if histogram is None:
+                    histogram = self._histograms[phase] = LatencyHistogram()
+                histogram.record(seconds * 1000)
+
+    def snapshot(self):
+        """
+        Export all histograms.
+
+        Returns:
+            dict: Phase name -> histogram data
+        """
+        with self._lock:
+            return {phase: histogram.to_dict() for phase, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        """
+        Drop all recorded samples.
+        """
+        with self._lock:
+            self._histograms = {}
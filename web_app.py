@@ -1,9 +1,24 @@
 import os
-from PIL import Image, ImageFilter, ImageEnhance, ImageOps
+from PIL import Image, ImageEnhance, ImageOps
+from PIL import ImageFilter as PILImageFilter
 import io
+import base64
 from flask import Flask, render_template, request, jsonify, send_file, url_for
 import uuid
+import hashlib
+from concurrent.futures import CancelledError
 from models.image_generator import ImageGenerator
+from models.job_queue import JobQueue, SQLiteJobStore, FINISHED_STATES
+from models.preview import get_proxy_cache
+from models.image_pipeline import ImagePipeline
+from models.batch_processor import get_batch_processor
+from models.edit_executor import get_edit_executor, QueueFull
+from utils.image_cache import ImageCache
+from utils.timing import LatencyStats, Trace, span, use_trace
+from utils.config import (
+    JOB_QUEUE_DB, PREVIEW_MAX_SIZE, EDIT_TIMEOUT_SECONDS,
+    FILTER_CACHE_MEMORY_ITEMS, FILTER_CACHE_DIR, FILTER_CACHE_DISK_MB, FILTER_INTENSITY_STEP
+)
 
 class ImageFilter:
     def __init__(self):
@@ -12,7 +27,7 @@ class ImageFilter:
         """
         pass
 
-    def apply_filter(self, image, filter_type, intensity=0.5):
+    def apply_filter(self, image, filter_type, intensity=0.5, scale=1.0):
         """
         Apply a filter to the image.
 
@@ -20,6 +35,7 @@ class ImageFilter:
             image (PIL.Image): Input image
             filter_type (str): Type of filter to apply
             intensity (float): Intensity of the filter (0.0 to 1.0)
+            scale (float): Size of the image relative to the full-resolution original
 
         Returns:
             PIL.Image: Filtered image
@@ -30,7 +46,7 @@ class ImageFilter:
             elif filter_type == "Grayscale":
                 return self.grayscale_filter(image, intensity)
             elif filter_type == "Blur":
-                return self.blur_filter(image, intensity)
+                return self.blur_filter(image, intensity, scale)
             elif filter_type == "Sharpen":
                 return self.sharpen_filter(image, intensity)
             else:
@@ -77,13 +93,15 @@ class ImageFilter:
         # Blend with original based on intensity
         return Image.blend(image, grayscale_image, intensity)
 
-    def blur_filter(self, image, intensity=0.5):
+    def blur_filter(self, image, intensity=0.5, scale=1.0):
         """
         Apply a blur filter to the image.
 
         Args:
             image (PIL.Image): Input image
             intensity (float): Intensity of the filter (0.0 to 1.0)
+            scale (float): Size of the image relative to the full-resolution original,
+                so previews blur by the same visual amount
 
         Returns:
             PIL.Image: Filtered image
@@ -94,7 +112,7 @@ class ImageFilter:
             radius = 1
 
         # Apply Gaussian blur
-        blurred_image = image.filter(ImageFilter.GaussianBlur(radius=radius))
+        blurred_image = image.filter(PILImageFilter.GaussianBlur(radius=radius * scale))
 
         return blurred_image
 
@@ -115,6 +133,35 @@ class ImageFilter:
 
         return sharpened_image
 
+def quantize_intensity(intensity, step=FILTER_INTENSITY_STEP):
+    """
+    Round a filter intensity to the filter cache's step.
+
+    Args:
+        intensity (float): Intensity of the filter (0.0 to 1.0)
+        step (float): Quantization step (0 keeps two decimals)
+
+    Returns:
+        float: Quantized intensity
+    """
+    if step <= 0:
+        return round(float(intensity), 2)
+
+    return round(round(float(intensity) / step) * step, 4)
+
+def static_url(path):
+    """
+    Get the URL of a file inside the static folder.
+
+    Args:
+        path (str): File path
+
+    Returns:
+        str: URL of the file
+    """
+    filename = os.path.relpath(os.path.abspath(path), app.static_folder)
+    return url_for('static', filename=filename.replace(os.sep, '/'))
+
 class LeonardoAI:
     def __init__(self):
         """
@@ -124,10 +171,56 @@ class LeonardoAI:
         self.image_filter = ImageFilter()
         self.generated_images = {}
         self.user_tokens = 150  # Default token balance
+        self.latency_stats = LatencyStats()
+
+        # Filter results (and decoded sources) keyed by source content, filter and intensity
+        self.filter_cache = ImageCache(
+            memory_items=FILTER_CACHE_MEMORY_ITEMS,
+            disk_dir=FILTER_CACHE_DIR,
+            disk_max_bytes=FILTER_CACHE_DISK_MB * 1024 * 1024
+        )
+
+    def generate_images(self, prompt, num_images=1, width=1024, height=768, steps=4, guidance_scale=7.5, seed=None, model="FLUX 1.1", use_cache=True,
+                        on_image=None, is_cancelled=None, debug=False):
+        """
+        Generate images and manage token usage, timing each phase of the request.
+
+        Args:
+            prompt (str): Text prompt for image generation
+            num_images (int): Number of images to generate
+            width (int): Width of the generated images
+            height (int): Height of the generated images
+            steps (int): Number of denoising steps
+            guidance_scale (float): Guidance scale for the model
+            seed (int, optional): Random seed for reproducibility
+            model (str): Model name to use for generation
+            use_cache (bool): Serve and store results in the generation cache
+            on_image (callable, optional): Called with each image URL as soon as it is saved
+            is_cancelled (callable, optional): Returns True when the caller no longer wants the result;
+                checked once, before the images are saved and charged
+            debug (bool): Include the per-phase timings of this request in the result
 
-    def generate_images(self, prompt, num_images=1, width=1024, height=768, steps=4, guidance_scale=7.5, seed=None, model="FLUX 1.1"):
+        Returns:
+            dict: Generation results including session ID and image URLs
+        """
+        trace = Trace()
+        with use_trace(trace):
+            with span('total'):
+                result = self._generate_images(
+                    prompt, num_images, width, height, steps, guidance_scale, seed, model, use_cache,
+                    on_image, is_cancelled
+                )
+
+        self.latency_stats.record(trace)
+        if debug:
+            result['timings'] = trace.summary()
+
+        return result
+
+    def _generate_images(self, prompt, num_images, width, height, steps, guidance_scale, seed, model, use_cache,
+                         on_image, is_cancelled):
         """
-        Generate images and manage token usage.
+        Generate and save images and manage token usage.
 
         Args:
             prompt (str): Text prompt for image generation
@@ -138,6 +231,10 @@ class LeonardoAI:
             guidance_scale (float): Guidance scale for the model
             seed (int, optional): Random seed for reproducibility
             model (str): Model name to use for generation
+            use_cache (bool): Serve and store results in the generation cache
+            on_image (callable, optional): Called with each image URL as soon as it is saved
+            is_cancelled (callable, optional): Returns True when the caller no longer wants the result;
+                checked once, before the images are saved and charged
 
         Returns:
             dict: Generation results including session ID and image URLs
@@ -153,15 +250,24 @@ class LeonardoAI:
             }
 
         # Generate images - model parameter is not used by the API but stored for reference
-        images = self.image_generator.generate(
-            prompt=prompt,
-            num_images=num_images,
-            width=width,
-            height=height,
-            steps=steps,
-            guidance_scale=guidance_scale,
-            seed=seed
-        )
+        with span('generate'):
+            images = self.image_generator.generate(
+                prompt=prompt,
+                num_images=num_images,
+                width=width,
+                height=height,
+                steps=steps,
+                guidance_scale=guidance_scale,
+                seed=seed,
+                use_cache=use_cache
+            )
+
+        # Skip saving (and charging for) images nobody is waiting for anymore
+        if is_cancelled is not None and is_cancelled():
+            return {
+                'success': False,
+                'error': 'Generation cancelled'
+            }
 
         # Create a unique session ID for this generation
         session_id = str(uuid.uuid4())
@@ -172,23 +278,27 @@ class LeonardoAI:
             # Save to disk
             filename = f"{session_id}_{i}.png"
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            img.save(filepath)
-
-            # Add to memory storage
-            if session_id not in self.generated_images:
-                self.generated_images[session_id] = []
-            self.generated_images[session_id].append({
-                'id': i,
-                'path': filepath,
-                'url': url_for('static', filename=f'uploads/{filename}'),
-                'prompt': prompt,
-                'model': model,
-                'width': width,
-                'height': height
-            })
-
-            # Add URL to response
-            image_urls.append(url_for('static', filename=f'uploads/{filename}'))
+            with span('save'):
+                img.save(filepath)
+
+            with span('url'):
+                # Add to memory storage
+                if session_id not in self.generated_images:
+                    self.generated_images[session_id] = []
+                self.generated_images[session_id].append({
+                    'id': i,
+                    'path': filepath,
+                    'url': url_for('static', filename=f'uploads/{filename}'),
+                    'prompt': prompt,
+                    'model': model,
+                    'width': width,
+                    'height': height
+                })
+
+                # Add URL to response
+                image_urls.append(url_for('static', filename=f'uploads/{filename}'))
+            if on_image is not None:
+                on_image(image_urls[-1])
 
         # Deduct tokens
         self.user_tokens -= token_cost
@@ -200,7 +310,7 @@ class LeonardoAI:
             'remaining_tokens': self.user_tokens
         }
 
-    def apply_filter(self, session_id, image_id, filter_type, intensity=0.5):
+    def apply_filter(self, session_id, image_id, filter_type, intensity=0.5, preview_size=None):
         """
         Apply a filter to a generated image.
 
@@ -209,6 +319,8 @@ class LeonardoAI:
             image_id (int): Image ID
             filter_type (str): Type of filter to apply
             intensity (float): Intensity of the filter (0.0 to 1.0)
+            preview_size (int, optional): When set, filter a cached proxy whose longest side
+                is at most this many pixels and return it inline without saving anything
 
         Returns:
             dict: Filter results
@@ -220,30 +332,295 @@ class LeonardoAI:
                 'error': 'Image not found'
             }
 
-        # Get the image
-        image_path = self.generated_images[session_id][image_id]['path']
-        image = Image.open(image_path)
+        record = self.generated_images[session_id][image_id]
+
+        # Nearby slider positions share one cached result
+        intensity = quantize_intensity(intensity)
+
+        if preview_size:
+            return self._preview_filter(record, filter_type, intensity, preview_size)
 
-        # Apply filter
         if filter_type != 'None':
-            filtered_image = self.image_filter.apply_filter(image, filter_type, intensity)
+            filtered_filepath = self._render_filter(session_id, image_id, filter_type, intensity)
+            filtered_url = static_url(filtered_filepath)
         else:
-            filtered_image = image
+            # No filter: the original is the result
+            filtered_filepath, filtered_url = record['path'], record['url']
+
+        # Update memory storage
+        record['filtered_path'] = filtered_filepath
+        record['filtered_url'] = filtered_url
+        record['filter'] = (filter_type, intensity)
+
+        return {
+            'success': True,
+            'filtered_image': filtered_url
+        }
+
+    def get_filtered_path(self, session_id, image_id):
+        """
+        Get the file of an image's filtered version, rendering it again if the
+        filter cache has evicted it since.
+
+        Args:
+            session_id (str): Session ID
+            image_id (int): Image ID
+
+        Returns:
+            str: Path of the filtered image, or None if no filter was applied
+        """
+        record = self.generated_images[session_id][image_id]
+        if 'filtered_path' not in record:
+            return None
+
+        if not os.path.exists(record['filtered_path']) and 'filter' in record:
+            self.apply_filter(session_id, image_id, *record['filter'])
+
+        return record['filtered_path']
 
-        # Save filtered image
-        filtered_filename = f"{session_id}_{image_id}_filtered.png"
-        filtered_filepath = os.path.join(app.config['UPLOAD_FOLDER'], filtered_filename)
-        filtered_image.save(filtered_filepath)
+    def apply_batch(self, image_refs, operations):
+        """
+        Apply a filter or edit chain to several generated images at once.
+
+        The images are processed in parallel on the shared worker process pool,
+        and each result becomes the image's filtered version, as with apply_filter.
+
+        Args:
+            image_refs (list): (session_id, image_id) tuples; duplicates are processed once
+            operations (list): ImagePipeline operation dicts, e.g.
+                [{'type': 'filter', 'filter_type': 'Sepia', 'intensity': 0.5}]
+
+        Returns:
+            dict: Batch results with one entry per image
+        """
+        try:
+            # Reject unknown operations before any work is scheduled
+            ImagePipeline().plan(operations)
+        except (ValueError, TypeError, AttributeError) as e:
+            return {
+                'success': False,
+                'error': f'Invalid operations: {e}'
+            }
+
+        for session_id, image_id in image_refs:
+            if session_id not in self.generated_images or not 0 <= image_id < len(self.generated_images[session_id]):
+                return {
+                    'success': False,
+                    'error': f'Image not found: {session_id}/{image_id}'
+                }
+
+        # Each image is processed once; duplicates would write the same output file concurrently
+        image_refs = list(dict.fromkeys(image_refs))
+
+        tasks = []
+        for session_id, image_id in image_refs:
+            filtered_filename = f"{session_id}_{image_id}_filtered.png"
+            filtered_filepath = os.path.join(app.config['UPLOAD_FOLDER'], filtered_filename)
+            tasks.append((self.generated_images[session_id][image_id]['path'], operations, filtered_filepath))
+
+        results = []
+        for (session_id, image_id), (filtered_filepath, error) in zip(image_refs, get_batch_processor().run(tasks)):
+            if error is not None:
+                results.append({'session_id': session_id, 'image_id': image_id, 'success': False, 'error': error})
+                continue
+
+            filtered_url = url_for('static', filename=f'uploads/{os.path.basename(filtered_filepath)}')
+
+            # Update memory storage
+            self.generated_images[session_id][image_id]['filtered_path'] = filtered_filepath
+            self.generated_images[session_id][image_id]['filtered_url'] = filtered_url
+            self.generated_images[session_id][image_id].pop('filter', None)
+
+            results.append({'session_id': session_id, 'image_id': image_id, 'success': True, 'filtered_image': filtered_url})
+
+        return {
+            'success': all(result['success'] for result in results),
+            'results': results
+        }
+
+    def apply_edit(self, session_id, image_id, operations, timeout=None):
+        """
+        Apply a filter or edit chain to one generated image in a worker process.
+
+        The edit can be stopped: it times out, and a newer edit of the same
+        image supersedes it. The result becomes the image's filtered version,
+        as with apply_batch.
+
+        Args:
+            session_id (str): Session ID
+            image_id (int): Image ID
+            operations (list): ImagePipeline operation dicts, e.g.
+                [{'type': 'remove_background', 'feather': 2}]
+            timeout (float, optional): Seconds the edit may run (defaults to EDIT_TIMEOUT_SECONDS)
+
+        Returns:
+            dict: Edit results
+
+        Raises:
+            QueueFull: If too many edits are queued or running
+            TimeoutError: If the edit ran longer than its timeout
+            concurrent.futures.CancelledError: If a newer edit of the image superseded it
+        """
+        if session_id not in self.generated_images or not 0 <= image_id < len(self.generated_images[session_id]):
+            return {
+                'success': False,
+                'error': 'Image not found'
+            }
+
+        try:
+            # Reject unknown operations before any work is scheduled
+            ImagePipeline().plan(operations)
+        except (ValueError, TypeError, AttributeError) as e:
+            return {
+                'success': False,
+                'error': f'Invalid operations: {e}'
+            }
+
+        record = self.generated_images[session_id][image_id]
+        edited_image = get_edit_executor().run(
+            self._load_source(record), operations, key=('edit', session_id, image_id), timeout=timeout)
+
+        edited_filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{image_id}_filtered.png")
+        edited_image.save(edited_filepath, save_all=getattr(edited_image, 'is_animated', False))
+        edited_url = static_url(edited_filepath)
 
         # Update memory storage
-        self.generated_images[session_id][image_id]['filtered_path'] = filtered_filepath
-        self.generated_images[session_id][image_id]['filtered_url'] = url_for('static', filename=f'uploads/{filtered_filename}')
+        record['filtered_path'] = edited_filepath
+        record['filtered_url'] = edited_url
+        record.pop('filter', None)
 
         return {
             'success': True,
-            'filtered_image': url_for('static', filename=f'uploads/{filtered_filename}')
+            'filtered_image': edited_url
         }
 
+    def _render_filter(self, session_id, image_id, filter_type, intensity):
+        """
+        Get the full-resolution filtered file of an image from the filter cache,
+        rendering it on a miss.
+
+        Args:
+            session_id (str): Session ID
+            image_id (int): Image ID
+            filter_type (str): Type of filter to apply
+            intensity (float): Quantized intensity of the filter
+
+        Returns:
+            str: Path of the filtered image, named after its cache key
+        """
+        record = self.generated_images[session_id][image_id]
+        key = ImageCache.make_key('filter', self._content_hash(record), filter_type, intensity)
+
+        filtered_filepath = self.filter_cache.get_path(key)
+        if filtered_filepath is not None:
+            return filtered_filepath
+
+        # Evicted from disk but maybe still in memory; otherwise render it
+        filtered_image = self.filter_cache.get(key)
+        if filtered_image is None:
+            filtered_image = self.image_filter.apply_filter(self._load_source(record), filter_type, intensity)
+        self.filter_cache.put(key, filtered_image)
+
+        filtered_filepath = self.filter_cache.get_path(key)
+        if filtered_filepath is None:
+            # Disk tier disabled or not writable: save next to the original
+            filtered_filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{image_id}_filtered.png")
+            filtered_image.save(filtered_filepath)
+
+        return filtered_filepath
+
+    def _load_source(self, record):
+        """
+        Get the decoded original of an image, keeping it in the filter cache's
+        memory tier so toggling filters doesn't re-read the PNG.
+
+        Args:
+            record (dict): Stored image entry
+
+        Returns:
+            PIL.Image: Original image
+        """
+        key = ImageCache.make_key('source', self._content_hash(record))
+
+        image = self.filter_cache.get(key)
+        if image is None:
+            with Image.open(record['path']) as source:
+                source.load()
+                image = source.copy()
+            self.filter_cache.put(key, image, persist=False)
+
+        return image
+
+    def _content_hash(self, record):
+        """
+        Get the SHA-256 of an image's original file, computed once per image.
+
+        Args:
+            record (dict): Stored image entry
+
+        Returns:
+            str: Hex digest
+        """
+        if 'content_hash' not in record:
+            digest = hashlib.sha256()
+            with open(record['path'], 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            record['content_hash'] = digest.hexdigest()
+
+        return record['content_hash']
+
+    def _preview_filter(self, record, filter_type, intensity, preview_size):
+        """
+        Filter the cached low-resolution proxy of an image for interactive previews.
+
+        Args:
+            record (dict): Stored image entry
+            filter_type (str): Type of filter to apply
+            intensity (float): Quantized intensity of the filter
+            preview_size (int): Longest side of the proxy in pixels
+
+        Returns:
+            dict: Preview results with the image as a data URL
+        """
+        key = ImageCache.make_key('preview', self._content_hash(record), filter_type, intensity, preview_size)
+
+        preview = self.filter_cache.get(key)
+        if preview is None:
+            # The full image is only decoded the first time this file is previewed
+            image_path = record['path']
+            proxy_key = (image_path, os.path.getmtime(image_path))
+            proxy, scale = get_proxy_cache().get_or_load(proxy_key, preview_size, lambda: Image.open(image_path))
+
+            if filter_type != 'None':
+                preview = self.image_filter.apply_filter(proxy, filter_type, intensity, scale)
+            else:
+                preview = proxy
+
+            # Previews are cheap to redo, so they stay out of the disk tier
+            self.filter_cache.put(key, preview, persist=False)
+
+        output = io.BytesIO()
+        preview.convert('RGB').save(output, format='JPEG', quality=85)
+
+        return {
+            'success': True,
+            'preview': True,
+            'filtered_image': 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii')
+        }
+
+    def get_latency_stats(self):
+        """
+        Get latency histograms for each phase of /generate requests.
+
+        Phases: total, generate, cache_lookup, cache_store, rate_limit, backoff,
+        api, decode, open, save and url.
+
+        Returns:
+            dict: Phase name -> histogram data
+        """
+        return self.latency_stats.snapshot()
+
     def get_token_balance(self):
         """
         Get the current token balance.
@@ -264,6 +641,40 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Initialize Leonardo AI
 leonardo_ai = LeonardoAI()
 
+def run_generation_job(params, job):
+    """
+    Run a queued /generate request on a job worker thread.
+
+    Args:
+        params (dict): Keyword arguments for LeonardoAI.generate_images
+        job (Job): Handle used to publish images and check for cancellation
+
+    Returns:
+        dict: Generation results
+    """
+    # Workers have no incoming request, so build one for url_for
+    with app.test_request_context():
+        # The cancellation check before saving also locks the job in: once its
+        # images are being saved and charged, a cancel is refused
+        result = leonardo_ai.generate_images(
+            on_image=job.add_image,
+            is_cancelled=lambda: not job.lock_in(),
+            **params
+        )
+
+    if not result['success']:
+        raise RuntimeError(result['error'])
+
+    return result
+
+# Initialize the generation job queue, shared through SQLite when configured. Its
+# workers start with the first async /generate, or below when run as a server:
+# edit and batch worker processes re-import this module and must not run jobs.
+generation_jobs = JobQueue(
+    run_generation_job,
+    store=SQLiteJobStore(JOB_QUEUE_DB) if JOB_QUEUE_DB else None
+)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -278,6 +689,8 @@ def generate_images():
     steps = int(request.form.get('steps', 4))
     guidance_scale = float(request.form.get('guidance_scale', 7.5))
     seed = request.form.get('seed', '-1')
+    use_cache = request.form.get('use_cache', 'true').lower() != 'false'
+    debug = request.form.get('debug', 'false').lower() == 'true'
 
     # Handle model selection with fallbacks
     model = request.form.get('model', '')
@@ -308,20 +721,72 @@ def generate_images():
     print(f"Advanced settings: Steps={steps}, Guidance Scale={guidance_scale}, Seed={seed}")
     print(f"Prompt: {prompt}")
 
+    params = {
+        'prompt': prompt,
+        'num_images': num_images,
+        'width': width,
+        'height': height,
+        'steps': steps,
+        'guidance_scale': guidance_scale,
+        'seed': seed,
+        'model': api_model,  # Use the mapped model name
+        'use_cache': use_cache,
+        'debug': debug
+    }
+
+    # In job mode, enqueue the generation and return right away
+    if request.form.get('async', 'false').lower() == 'true':
+        job_id = generation_jobs.submit(params)
+        if job_id is None:
+            return jsonify({
+                'success': False,
+                'error': 'Too many generations in progress. Please try again shortly.'
+            }), 503
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
+
     # Generate images
-    result = leonardo_ai.generate_images(
-        prompt=prompt,
-        num_images=num_images,
-        width=width,
-        height=height,
-        steps=steps,
-        guidance_scale=guidance_scale,
-        seed=seed,
-        model=api_model  # Use the mapped model name
-    )
+    result = leonardo_ai.generate_images(**params)
 
     return jsonify(result)
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status, finished images and result of a generation job."""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    return jsonify({'success': True, **job})
+
+@app.route('/jobs/<job_id>/images/<int:index>', methods=['GET'])
+def get_job_image(job_id, index):
+    """Get one finished image of a generation job."""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    if index >= len(job['images']):
+        return jsonify({'success': False, 'status': job['status'], 'error': 'Image not ready'}), 404
+
+    return jsonify({'success': True, 'status': job['status'], 'image': job['images'][index]})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running generation job."""
+    if not generation_jobs.cancel(job_id):
+        job = generation_jobs.get(job_id)
+        if job is not None and job['status'] not in FINISHED_STATES:
+            # Its images are already being saved and charged
+            return jsonify({'success': False, 'error': 'Job is saving its images and can no longer be cancelled'}), 409
+        return jsonify({'success': False, 'error': 'Job not found or already finished'}), 404
+
+    return jsonify({'success': True, 'job_id': job_id, 'status': generation_jobs.get(job_id)['status']})
+
 @app.route('/apply_filter', methods=['POST'])
 def apply_filter():
     # Get parameters from form
@@ -330,8 +795,78 @@ def apply_filter():
     filter_type = request.form.get('filter_type', 'None')
     intensity = float(request.form.get('intensity', 0.5))
 
+    # Previews filter a cached low-resolution proxy; the final apply renders at full resolution
+    preview = request.form.get('preview', 'false').lower() == 'true'
+    preview_size = int(request.form.get('preview_size', PREVIEW_MAX_SIZE)) if preview else None
+
     # Apply filter
-    result = leonardo_ai.apply_filter(session_id, image_id, filter_type, intensity)
+    result = leonardo_ai.apply_filter(session_id, image_id, filter_type, intensity, preview_size)
+
+    return jsonify(result)
+
+@app.route('/apply_batch', methods=['POST'])
+def apply_batch():
+    # JSON body: operations plus either a session_id (all of its images) or a list of images
+    data = request.get_json(silent=True) or {}
+
+    operations = data.get('operations')
+    if operations is None and data.get('filter_type'):
+        operations = [{'type': 'filter', 'filter_type': data['filter_type'], 'intensity': float(data.get('intensity', 0.5))}]
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'error': 'No operations given'}), 400
+
+    if 'images' in data:
+        try:
+            image_refs = [(str(ref['session_id']), int(ref['image_id'])) for ref in data['images']]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'images must be a list of {session_id, image_id}'}), 400
+    else:
+        session_id = data.get('session_id', '')
+        image_refs = [(session_id, i) for i in range(len(leonardo_ai.generated_images.get(session_id, [])))]
+
+    if not image_refs:
+        return jsonify({'success': False, 'error': 'No images found'}), 404
+
+    result = leonardo_ai.apply_batch(image_refs, operations)
+    if 'results' not in result:
+        return jsonify(result), 400
+
+    return jsonify(result)
+
+@app.route('/apply_edit', methods=['POST'])
+def apply_edit():
+    # JSON body: session_id, image_id, operations and an optional timeout in seconds
+    data = request.get_json(silent=True) or {}
+
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'error': 'No operations given'}), 400
+
+    try:
+        image_id = int(data.get('image_id', 0))
+        timeout = float(data['timeout']) if data.get('timeout') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'image_id and timeout must be numbers'}), 400
+
+    # Clients may shorten the time limit, not lift it
+    if timeout is not None and timeout <= 0:
+        return jsonify({'success': False, 'error': 'timeout must be positive'}), 400
+    if timeout is not None and EDIT_TIMEOUT_SECONDS:
+        timeout = min(timeout, EDIT_TIMEOUT_SECONDS)
+
+    try:
+        result = leonardo_ai.apply_edit(str(data.get('session_id', '')), image_id, operations, timeout)
+    except QueueFull:
+        return jsonify({'success': False, 'error': 'Too many edits in progress, try again shortly'}), 503
+    except TimeoutError as e:
+        return jsonify({'success': False, 'error': str(e)}), 504
+    except CancelledError:
+        return jsonify({'success': False, 'error': 'Superseded by a newer edit of this image'}), 409
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    if not result['success']:
+        return jsonify(result), 404 if result['error'] == 'Image not found' else 400
 
     return jsonify(result)
 
@@ -347,7 +882,7 @@ def download_image():
 
     # Get the image path
     if use_filtered and 'filtered_path' in leonardo_ai.generated_images[session_id][image_id]:
-        image_path = leonardo_ai.generated_images[session_id][image_id]['filtered_path']
+        image_path = leonardo_ai.get_filtered_path(session_id, image_id)
     else:
         image_path = leonardo_ai.generated_images[session_id][image_id]['path']
 
@@ -367,7 +902,8 @@ def download_image():
     elif format_str == 'png':
         image.save(output, format='PNG')
     elif format_str == 'gif':
-        image.save(output, format='GIF')
+        # Keep every frame of animations
+        image.save(output, format='GIF', save_all=getattr(image, 'is_animated', False))
     else:
         image.save(output, format='PNG')
 
@@ -383,6 +919,14 @@ def download_image():
         download_name=filename
     )
 
+@app.route('/latency_stats', methods=['GET'])
+def get_latency_stats():
+    """Get per-phase latency histograms of /generate requests."""
+    return jsonify({
+        'success': True,
+        'latency_stats': leonardo_ai.get_latency_stats()
+    })
+
 @app.route('/token_balance', methods=['GET'])
 def get_token_balance():
     """Get the current token balance."""
@@ -396,6 +940,12 @@ if __name__ == '__main__':
     # Use port 5000 to avoid conflicts with other services
     port = 5000
     print(f"Starting server on http://localhost:{port}")
+
+    # Run jobs queued by other processes sharing JOB_QUEUE_DB right away. With
+    # debug=True this script also runs as the reloader's parent, which only
+    # watches files, so only the serving child (WERKZEUG_RUN_MAIN) starts workers.
+    if JOB_QUEUE_DB and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        generation_jobs.start()
     try:
         app.run(debug=True, host='0.0.0.0', port=port)
     except OSError as e: